@@ -0,0 +1,18 @@
+# File: acquisition_service/main.py
+# Python gRPC Server for Content Acquisition & Seeding
+#
+# Run from grpc_services/:  PYTHONPATH=.. python -m acquisition_service.main
+
+from phx_common import bootstrap
+
+# --- Configuration ---
+_LISTEN_PORT = '[::]:50059'
+_SERVICE_NAME = 'acquisition.AcquisitionService'
+
+# --- Server Setup ---
+def serve():
+    # The acquisition and Sora client stubs are only imported by the warmup
+    bootstrap.serve("Content Acquisition", _LISTEN_PORT, "acquisition_service.servicer", service_names=[_SERVICE_NAME])
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,130 @@
+# File: acquisition_service/servicer.py
+# Content Acquisition & Seeding implementation (loaded by main.py on warmup)
+
+import os
+import time
+import logging
+import random
+
+import grpc
+import acquisition_service.acquisition_pb2 as acq_pb2
+import acquisition_service.acquisition_pb2_grpc as acq_pb2_grpc
+# Import the Sora Service client (assuming it's running on 50055)
+import sora_service.sora_pb2 as sora_pb2
+import sora_service.sora_pb2_grpc as sora_pb2_grpc
+
+from phx_common.calls import Caller, CallRejected
+from phx_common.channels import lb_channel
+
+# Read here rather than imported from main: under `python -m` main is __main__,
+# and importing it again would run a second copy of the entry module
+SORA_SERVICE_ADDRESS = os.getenv('SORA_SERVICE_ADDRESS', 'localhost:50055')
+_SORA_HEALTH_SERVICE = 'sora.SoraService'
+
+# Sora rejects over-quota submissions with RESOURCE_EXHAUSTED and a retry-after-ms hint
+_MAX_THROTTLE_WAIT_SECONDS = 300.0
+
+# Per-prompt lines, sampled by PHX_LOG_SAMPLE (see phx_common/logs.py)
+_hot_log = logging.getLogger('acquisition.hot')
+
+def _retry_after(error: grpc.RpcError) -> float:
+    for key, value in error.trailing_metadata() or ():
+        if key == 'retry-after-ms':
+            return int(value) / 1000.0
+    return 1.0
+
+# --- Content Acquisition Implementation ---
+class AcquisitionService(acq_pb2_grpc.AcquisitionServiceServicer):
+    """
+    Handles the full content seeding pipeline: Scrape -> Analyze -> Generate -> Seed.
+    """
+    def ScrapeAndGenerate(self, request, context):
+        logging.info(f"Received Scrape & Generate Request for {request.count} videos on topic: {request.trend_topic}")
+
+        # --- 1. Scrape and Analyze (Simulated) ---
+        # In a real system, this would involve:
+        # a) Web scraping trending topics/keywords.
+        # b) NLP analysis to generate high-quality video prompts.
+        
+        prompts = self._generate_prompts(request.trend_topic, request.count)
+        
+        # --- 2. Trigger Sora AI Generation ---
+        # Each prompt is bounded by our own deadline; one failed prompt no longer
+        # fails the batch, but an open circuit or a spent deadline stops it early.
+        videos_seeded = 0
+        failed = 0
+        for i, prompt in enumerate(prompts):
+            # Call the Sora AI Service
+            sora_request = sora_pb2.GenerateVideoRequest(
+                user_id=request.founder_user_id,
+                prompt=prompt,
+                duration_seconds=random.randint(5, 15),
+                style="cinematic"
+            )
+            try:
+                sora_response = self._generate_throttled(_sora_stub, sora_request, context)
+            except CallRejected as e:
+                logging.warning(f"Stopping Sora generation after {videos_seeded} videos: {e.details()}")
+                failed += len(prompts) - i
+                break
+            except grpc.RpcError as e:
+                logging.error(f"Sora generation failed for prompt {prompt[:20]}...: {e.code()} {e.details()}")
+                failed += 1
+                continue
+
+            # --- 3. Seed to FYP (Simulated) ---
+            # In a real system, the Sora service would complete the video and then
+            # trigger the BullMQ job (via the Node.js API) to seed the content.
+            # For this simulation, we assume the job is successfully created.
+            # Duplicate prompts come back COMPLETED from Sora's generation cache
+            if sora_response.status in ("PENDING", "COMPLETED"):
+                videos_seeded += 1
+                _hot_log.info(f"Successfully triggered Sora job {sora_response.job_id} for prompt: {prompt[:20]}...")
+
+        if failed and not videos_seeded:
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details("Sora Service is unavailable.")
+            return acq_pb2.AcquisitionResponse(status="FAILED", videos_seeded=0)
+
+        return acq_pb2.AcquisitionResponse(
+            job_id=f"ACQ-JOB-{time.time()}",
+            status="PARTIAL" if failed else "SEEDED",
+            videos_seeded=videos_seeded
+        )
+
+    def _generate_throttled(self, sora_stub, sora_request, context):
+        """Calls GenerateVideo, backing off as told while the seeder is over its Sora quota."""
+        waited = 0.0
+        while True:
+            try:
+                # Not hedged: each Sora replica has its own job cache and scheduler, so a
+                # duplicate on another replica would start a second GPU job and spend its tokens
+                return _sora.call(sora_stub.GenerateVideo, sora_request, context=context, idempotent=False)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED or waited >= _MAX_THROTTLE_WAIT_SECONDS:
+                    raise
+                # Never sleep past our own caller's deadline
+                delay = min(_retry_after(e), max(_sora.time_left(context), 0.0))
+                waited += delay
+                time.sleep(delay)
+
+    def _generate_prompts(self, topic: str, count: int) -> list[str]:
+        """Simulates the generation of high-quality video prompts."""
+        base_prompts = [
+            f"A cinematic shot of a {topic} in a futuristic city.",
+            f"A hyper-realistic animation of a {topic} solving a complex coding problem.",
+            f"A short, viral clip about the best 'rizz' lines for a {topic}."
+        ]
+        return [f"{p} - {i}" for i, p in enumerate(base_prompts * (count // len(base_prompts) + 1))][:count]
+
+# One long-lived channel balanced across every healthy Sora replica
+_sora_stub = None
+# Deadline propagation, hedging and circuit breaking for Sora calls (SORA_*/PHX_* env)
+_sora = Caller.from_env("sora")
+
+def register(server):
+    acq_pb2_grpc.add_AcquisitionServiceServicer_to_server(AcquisitionService(), server)
+
+def warmup():
+    global _sora_stub
+    _sora_stub = sora_pb2_grpc.SoraServiceStub(lb_channel(SORA_SERVICE_ADDRESS, _SORA_HEALTH_SERVICE))
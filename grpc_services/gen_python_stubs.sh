@@ -0,0 +1,14 @@
+#!/bin/bash
+# Generates the Python gRPC stubs for the Python services in place
+# (sora_service/sora_pb2.py, sora_service/sora_pb2_grpc.py, ...).
+# Requires: pip install -r requirements.txt
+
+set -e
+cd "$(dirname "$0")"
+
+for proto in sora_service/sora.proto moderation_service/moderation.proto \
+             marketplace_service/marketplace.proto acquisition_service/acquisition.proto \
+             trending_service/trending.proto; do
+    python -m grpc_tools.protoc -I . --python_out=. --grpc_python_out=. "$proto"
+    echo "✅ Generated stubs for $proto"
+done
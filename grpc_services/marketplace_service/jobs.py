@@ -0,0 +1,251 @@
+# File: marketplace_service/jobs.py
+# Idempotent, resumable marketplace population jobs
+
+"""
+A population job is keyed by (creator_user_id, idempotency_key). Starting
+it again with the same key returns the existing job, so a client retry after
+a timeout attaches to the job already running instead of creating products
+twice.
+
+The job's products are split into chunks that a bounded worker pool
+generates in parallel. Each chunk commits in one transaction: its products,
+a chunk marker and the job's progress. Product ids are derived from the job
+id and the product's position (uuid5), so:
+
+* a restart resumes with the chunks that have no marker yet;
+* a chunk retried, or run twice by two replicas resuming the same job,
+  inserts nothing new (``on conflict do nothing``) and does not count twice.
+
+Kept free of grpc; the Postgres store only needs a phx_common.db.Database.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Namespace for job ids derived from (creator, idempotency key)
+_JOB_NAMESPACE = uuid.UUID("6f1c2b9e-4d0a-5c3e-9a51-7e2f8b6d4c10")
+
+RUNNING, COMPLETED, FAILED = "RUNNING", "COMPLETED", "FAILED"
+
+
+@dataclass
+class Job:
+    job_id: str
+    idempotency_key: str
+    creator_user_id: str
+    category: str
+    count: int
+    completed: int = 0
+    state: str = RUNNING
+    message: str = ""
+
+
+def job_id_for(creator_user_id: str, idempotency_key: str) -> str:
+    return str(uuid.uuid5(_JOB_NAMESPACE, f"{creator_user_id}\x1f{idempotency_key}"))
+
+
+def product_id_for(job_id: str, index: int) -> str:
+    return str(uuid.uuid5(uuid.UUID(job_id), str(index)))
+
+# ============================================================================
+# Stores
+# ============================================================================
+
+class MemoryJobStore:
+    """Process-local store for running without Postgres (writes are simulated)"""
+
+    def __init__(self, write_seconds_per_product: float = 0.005):
+        self.write_seconds_per_product = write_seconds_per_product
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._chunks: Dict[str, Set[int]] = {}
+        self.products: Set[str] = set()
+
+    def create(self, job: Job) -> Tuple[Job, bool]:
+        with self._lock:
+            existing = self._jobs.get(job.job_id)
+            if existing is not None:
+                return replace(existing), False
+            self._jobs[job.job_id] = replace(job)
+            self._chunks[job.job_id] = set()
+            return replace(job), True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return replace(job) if job else None
+
+    def done_chunks(self, job_id: str) -> Set[int]:
+        with self._lock:
+            return set(self._chunks.get(job_id, ()))
+
+    def commit_chunk(self, job: Job, chunk: int, rows: List[tuple]) -> bool:
+        time.sleep(self.write_seconds_per_product * len(rows))
+        with self._lock:
+            if chunk in self._chunks[job.job_id]:
+                return False
+            self._chunks[job.job_id].add(chunk)
+            self.products.update(row[0] for row in rows)
+            self._jobs[job.job_id].completed += len(rows)
+            return True
+
+    def set_state(self, job_id: str, state: str, message: str = ""):
+        with self._lock:
+            self._jobs[job_id].state = state
+            self._jobs[job_id].message = message
+
+    def unfinished(self) -> List[Job]:
+        with self._lock:
+            return [replace(j) for j in self._jobs.values() if j.state == RUNNING]
+
+
+_JOB_COLUMNS = "job_id, idempotency_key, creator_user_id, category, count, completed, state, message"
+
+CREATE_JOB = f"""insert into marketplace_population_jobs({_JOB_COLUMNS})
+                 values (%s, %s, %s, %s, %s, 0, 'RUNNING', '')
+                 on conflict do nothing returning job_id"""
+SELECT_JOB = f"select {_JOB_COLUMNS} from marketplace_population_jobs where job_id = %s"
+SELECT_CHUNKS = "select chunk from marketplace_population_chunks where job_id = %s"
+MARK_CHUNK = """insert into marketplace_population_chunks(job_id, chunk) values (%s, %s)
+                on conflict do nothing"""
+INSERT_PRODUCT = """insert into marketplace_products(id, creator_user_id, category, job_id)
+                    values (%s, %s, %s, %s) on conflict (id) do nothing"""
+ADVANCE_JOB = """update marketplace_population_jobs set completed = completed + %s, updated_at = now()
+                 where job_id = %s"""
+SET_STATE = """update marketplace_population_jobs set state = %s, message = %s, updated_at = now()
+               where job_id = %s"""
+SELECT_UNFINISHED = f"select {_JOB_COLUMNS} from marketplace_population_jobs where state = 'RUNNING'"
+
+
+class PostgresJobStore:
+    def __init__(self, db):
+        self.db = db
+
+    def create(self, job: Job) -> Tuple[Job, bool]:
+        created = self.db.fetchone(CREATE_JOB, (job.job_id, job.idempotency_key, job.creator_user_id,
+                                                job.category, job.count))
+        return self.get(job.job_id), created is not None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self.db.fetchone(SELECT_JOB, (job_id,), retries=1)
+        return Job(str(row[0]), *row[1:]) if row else None
+
+    def done_chunks(self, job_id: str) -> Set[int]:
+        return {r[0] for r in self.db.execute(SELECT_CHUNKS, (job_id,), retries=1)}
+
+    def commit_chunk(self, job: Job, chunk: int, rows: List[tuple]) -> bool:
+        with self.db.transaction() as conn:
+            # The marker row takes the lock: a second runner of this chunk waits, then skips
+            if conn.execute(MARK_CHUNK, (job.job_id, chunk), prepare=True).rowcount == 0:
+                return False
+            with conn.cursor() as cur:
+                cur.executemany(INSERT_PRODUCT, rows)
+            conn.execute(ADVANCE_JOB, (len(rows), job.job_id), prepare=True)
+            return True
+
+    def set_state(self, job_id: str, state: str, message: str = ""):
+        # Sets absolute values, so running it twice is harmless
+        self.db.execute(SET_STATE, (state, message, job_id), retries=1)
+
+    def unfinished(self) -> List[Job]:
+        return [Job(str(r[0]), *r[1:]) for r in self.db.execute(SELECT_UNFINISHED, retries=1)]
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+class PopulationRunner:
+    """
+    Runs jobs in the background: a driver thread per active job feeds its
+    missing chunks to one shared pool of ``workers`` generator threads.
+    """
+
+    def __init__(self, store, generate: Callable[[Job, int], tuple], workers: int = 4, chunk_size: int = 50,
+                 chunk_attempts: int = 3):
+        self.store = store
+        self.generate = generate
+        self.chunk_size = chunk_size
+        self.chunk_attempts = chunk_attempts
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="marketplace-gen")
+        # At most two queued chunks per worker, however many jobs are running
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._lock = threading.Lock()
+        self._active: Set[str] = set()
+
+    def submit(self, creator_user_id: str, idempotency_key: str, category: str, count: int) -> Tuple[Job, bool]:
+        """
+        Creates the job, or returns the existing one for this key. A failed job
+        is restarted from its last checkpoint; a running one that this process
+        is not driving (e.g. after a restart) is picked up.
+        """
+        job_id = job_id_for(creator_user_id, idempotency_key)
+        job, created = self.store.create(Job(job_id, idempotency_key, creator_user_id, category, count))
+        if not created and (job.category != category or job.count != count):
+            raise ValueError(f"idempotency key {idempotency_key!r} was already used for "
+                             f"{job.count} {job.category} products")
+        if job.state == FAILED:
+            self.store.set_state(job.job_id, RUNNING)
+            job.state, job.message = RUNNING, ""
+        if job.state == RUNNING:
+            self.start(job)
+        return job, created
+
+    def start(self, job: Job):
+        with self._lock:
+            if job.job_id in self._active:
+                return
+            self._active.add(job.job_id)
+        threading.Thread(target=self._drive, args=(job,), name=f"population-{job.job_id[:8]}", daemon=True).start()
+
+    def resume_all(self) -> int:
+        jobs = self.store.unfinished()
+        for job in jobs:
+            self.start(job)
+        return len(jobs)
+
+    def _drive(self, job: Job):
+        try:
+            done = self.store.done_chunks(job.job_id)
+            chunks = [c for c in range(-(-job.count // self.chunk_size)) if c not in done]
+            if done:
+                logging.info(f"Resuming population job {job.job_id}: {len(done)} chunks already committed")
+            futures = []
+            for chunk in chunks:
+                self._slots.acquire()
+                future = self._pool.submit(self._run_chunk, job, chunk)
+                future.add_done_callback(lambda _: self._slots.release())
+                futures.append(future)
+            errors = [e for e in (f.exception() for f in futures) if e is not None]
+            if errors:
+                self.store.set_state(job.job_id, FAILED, f"{len(errors)} chunks failed: {errors[0]}")
+                logging.error(f"Population job {job.job_id} failed: {errors[0]}")
+            else:
+                self.store.set_state(job.job_id, COMPLETED, f"Populated {job.count} {job.category} products")
+                logging.info(f"Population job {job.job_id} completed ({job.count} products)")
+        except Exception as e:
+            logging.exception(f"Population job {job.job_id} stopped")
+            try:
+                self.store.set_state(job.job_id, FAILED, str(e))
+            except Exception:
+                pass  # still RUNNING in the store; resumed on the next start
+        finally:
+            with self._lock:
+                self._active.discard(job.job_id)
+
+    def _run_chunk(self, job: Job, chunk: int):
+        start = chunk * self.chunk_size
+        rows = [self.generate(job, i) for i in range(start, min(start + self.chunk_size, job.count))]
+        for attempt in range(self.chunk_attempts):
+            try:
+                self.store.commit_chunk(job, chunk, rows)
+                return
+            except Exception as e:
+                if attempt + 1 >= self.chunk_attempts:
+                    raise
+                logging.warning(f"Population job {job.job_id} chunk {chunk} failed ({e}); retrying")
+                time.sleep(0.5 * 2 ** attempt)
@@ -0,0 +1,17 @@
+# File: marketplace_service/main.py
+# Python gRPC Server for Marketplace Population Service
+#
+# Run from grpc_services/:  PYTHONPATH=.. python -m marketplace_service.main
+
+from phx_common import bootstrap
+
+# --- Configuration ---
+_LISTEN_PORT = '[::]:50061'
+_SERVICE_NAME = 'marketplace.MarketplaceService'
+
+# --- Server Setup ---
+def serve():
+    bootstrap.serve("Marketplace", _LISTEN_PORT, "marketplace_service.servicer", service_names=[_SERVICE_NAME])
+
+if __name__ == '__main__':
+    serve()
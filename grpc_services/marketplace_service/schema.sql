@@ -0,0 +1,29 @@
+-- Marketplace population tables (applied by marketplace_service on warmup)
+create table if not exists marketplace_products(
+  id uuid primary key,
+  creator_user_id text not null,
+  category text not null,
+  created_at timestamptz default now()
+);
+create index if not exists marketplace_products_creator_idx on marketplace_products(creator_user_id);
+alter table marketplace_products add column if not exists job_id uuid;
+
+-- Population jobs: one row per (creator, idempotency key), checkpointed per chunk
+create table if not exists marketplace_population_jobs(
+  job_id uuid primary key,
+  idempotency_key text not null,
+  creator_user_id text not null,
+  category text not null,
+  count integer not null,
+  completed integer not null default 0,
+  state text not null default 'RUNNING',
+  message text not null default '',
+  created_at timestamptz default now(),
+  updated_at timestamptz default now(),
+  unique (creator_user_id, idempotency_key)
+);
+create table if not exists marketplace_population_chunks(
+  job_id uuid not null references marketplace_population_jobs(job_id) on delete cascade,
+  chunk integer not null,
+  primary key (job_id, chunk)
+);
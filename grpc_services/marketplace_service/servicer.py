@@ -0,0 +1,118 @@
+# File: marketplace_service/servicer.py
+# Marketplace Population implementation (loaded by main.py on warmup)
+
+import os
+import time
+import logging
+import uuid
+
+import grpc
+import marketplace_service.marketplace_pb2 as mp_pb2
+import marketplace_service.marketplace_pb2_grpc as mp_pb2_grpc
+from marketplace_service import jobs
+from phx_common.db import Database
+
+_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+# --- Configuration ---
+# Background population: generator threads shared by all jobs, products per checkpoint
+POPULATION_WORKERS = int(os.getenv('MARKETPLACE_WORKERS', '4'))
+POPULATION_CHUNK_SIZE = int(os.getenv('MARKETPLACE_CHUNK_SIZE', '50'))
+# Simulated per-product generation time (descriptions, images, pricing)
+SIM_GENERATE_SECONDS = float(os.getenv('MARKETPLACE_SIM_GENERATE_MS', '0')) / 1000.0
+# Per-product lines, sampled by PHX_LOG_SAMPLE (see phx_common/logs.py)
+_hot_log = logging.getLogger('marketplace.hot')
+
+INSERT_PRODUCT = """insert into marketplace_products(id, creator_user_id, category)
+                    values (%s, %s, %s) on conflict (id) do nothing"""
+
+# Shared pool, opened on warmup; None when POSTGRES_URL is unset (simulated writes)
+_db = None
+_runner = None
+
+def _generate_product(job, index):
+    # In a real system: AI-generated description, images and pricing for this slot.
+    # The id depends only on the job and the position, so a rerun yields the same row.
+    if SIM_GENERATE_SECONDS:
+        time.sleep(SIM_GENERATE_SECONDS)
+    return (jobs.product_id_for(job.job_id, index), job.creator_user_id, job.category, job.job_id)
+
+def _job_status(job):
+    return mp_pb2.PopulationJobStatus(job_id=job.job_id, state=job.state, count=job.count,
+                                      completed=job.completed, message=job.message)
+
+# --- Marketplace Population Implementation ---
+class MarketplaceService(mp_pb2_grpc.MarketplaceServiceServicer):
+    """
+    The Marketplace Service automates the creation and listing of digital products.
+    """
+    def PopulateDigitalProducts(self, request, context):
+        logging.info(f"Received Population Request for {request.count} products in category: {request.product_category}")
+
+        product_ids = []
+        for i in range(request.count):
+            product_id = str(uuid.uuid4())
+            product_ids.append(product_id)
+            
+            # --- 1. Product Generation Logic (Simulated) ---
+            # In a real system, this would involve:
+            # a) AI generating product descriptions, images, and pricing.
+            # b) Storing the product in the database.
+            
+            _hot_log.info(f"Generated product {i+1}/{request.count} (ID: {product_id}) for user {request.creator_user_id}")
+            if _db is None:
+                time.sleep(0.005) # Simulate database write
+
+        # --- 2. Persist in one pipelined round trip ---
+        if _db is not None:
+            _db.executemany(INSERT_PRODUCT, [(pid, request.creator_user_id, request.product_category) for pid in product_ids])
+
+        return mp_pb2.PopulationResponse(
+            success=True,
+            message=f"Successfully populated {request.count} products in the {request.product_category} category.",
+            product_ids=product_ids
+        )
+
+    def StartPopulationJob(self, request, context):
+        if not request.idempotency_key or request.count <= 0:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "idempotency_key and a positive count are required")
+        try:
+            job, created = _runner.submit(request.creator_user_id, request.idempotency_key,
+                                          request.product_category, request.count)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(e))
+        logging.info(f"{'Started' if created else 'Reattached to'} population job {job.job_id} "
+                     f"({job.completed}/{job.count} {job.category}) for user {request.creator_user_id}")
+        return _job_status(job)
+
+    def GetPopulationJob(self, request, context):
+        # Job ids are UUIDs; anything else would fail the uuid column cast in Postgres
+        try:
+            job_id = str(uuid.UUID(request.job_id))
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid population job id {request.job_id!r}")
+        job = _runner.store.get(job_id)
+        if job is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"No population job {request.job_id}")
+        return _job_status(job)
+
+def register(server):
+    mp_pb2_grpc.add_MarketplaceServiceServicer_to_server(MarketplaceService(), server)
+
+def warmup():
+    global _db, _runner
+    _db = Database.from_env("marketplace")
+    if _db is None:
+        logging.info("POSTGRES_URL not set; marketplace writes are simulated")
+        store = jobs.MemoryJobStore()
+    else:
+        with open(_SCHEMA_PATH) as f:
+            # The schema is all "if not exists", so it can be re-run
+            _db.execute(f.read(), prepare=False, retries=1)
+        store = jobs.PostgresJobStore(_db)
+    _runner = jobs.PopulationRunner(store, _generate_product, workers=POPULATION_WORKERS,
+                                    chunk_size=POPULATION_CHUNK_SIZE)
+    # Jobs interrupted by the last shutdown continue from their last committed chunk
+    resumed = _runner.resume_all()
+    if resumed:
+        logging.info(f"Resumed {resumed} unfinished population jobs")
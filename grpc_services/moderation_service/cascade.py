@@ -0,0 +1,253 @@
+# File: moderation_service/cascade.py
+# Staged moderation: cheap checks first, the video model only when still unsure
+
+"""
+Each stage scores an item's policy risk in [0, 1] and may decide it:
+
+* risk >= ``block``  -> unsafe, stop here
+* risk <= ``allow``  -> safe, stop here
+* otherwise          -> ambiguous, go to the next (more expensive) stage
+
+The default cascade is caption/metadata rules (free), then a thumbnail/
+keyframe model (a few ms), then the full video model (~20ms), which always
+decides. By default the caption rules only block: a clean caption says
+nothing about the video, so allowing needs at least the frame model.
+With a media index, a known-media stage between the frame and the video
+model settles re-uploads of already judged videos by their frame hashes
+(phash.py, hashindex.py). The hashes are computed off the request path
+from the moment the request arrives; the stage waits up to
+MODERATION_PHASH_WAIT_MS for them and otherwise passes the item on.
+
+The frame and video models are placeholders until real ones are wired in.
+By default they reproduce the single-stage service's decisions: only the
+"exclusive" + "onlyfans" caption rule blocks. MODERATION_SIM_UNSAFE makes
+them treat that share of uploads as unsafe content, so the block paths can
+be exercised.
+
+Per-stage counters show how much traffic exits where and the mean latency.
+
+Kept free of grpc so it can be exercised directly (load-testing/moderation_cascade_bench.py).
+
+Environment (thresholds; a stage never allows when allow < 0):
+    MODERATION_CAPTION_BLOCK   0.9
+    MODERATION_CAPTION_ALLOW   -1
+    MODERATION_FRAME_BLOCK     0.85
+    MODERATION_FRAME_ALLOW     0.2
+    MODERATION_VIDEO_BLOCK     0.5
+    MODERATION_EXTRA_TERMS     "1" scores the RISKY_TERMS captions too (off)
+    MODERATION_SIM_UNSAFE      share of uploads the placeholder models treat as unsafe (0)
+    MODERATION_PHASH_WAIT_MS   how long the known-media stage waits for frame hashes (30)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+# (policy_name, confidence_score, severity) - converted to proto Violations by the servicer
+Finding = Tuple[str, float, str]
+
+
+@dataclass
+class Verdict:
+    is_safe: bool = False
+    risk: float = 0.0
+    stage: str = ""
+    findings: List[Finding] = field(default_factory=list)
+    seconds: float = 0.0
+    # Scratch space for stages (e.g. frame hashes) that the caller may use afterwards
+    notes: Dict[str, object] = field(default_factory=dict)
+
+# ============================================================================
+# Stages
+# ============================================================================
+
+# Caption terms and the risk each one implies on its own. Off by default: they
+# block captions the single-stage service allowed (e.g. "nude" + "nsfw")
+EXTRA_TERMS = os.getenv("MODERATION_EXTRA_TERMS", "0") == "1"
+RISKY_TERMS = {
+    "onlyfans": 0.6, "exclusive": 0.3, "nsfw": 0.7, "18+": 0.6, "nude": 0.8, "spicy": 0.3,
+    "link in bio": 0.3, "dm me": 0.3, "uncensored": 0.5,
+}
+
+
+def caption_rules(item, verdict: Verdict) -> float:
+    """Keyword rules over the caption; adds the non-blocking spam finding"""
+    caption = item.caption.lower()
+    if len(caption) < 5:
+        verdict.findings.append(("Low Quality/Spam Policy", 0.80, "MEDIUM"))
+    risk = 0.0
+    if EXTRA_TERMS:
+        for term, weight in RISKY_TERMS.items():
+            if term in caption:
+                # Independent signals: 1 - prod(1 - w)
+                risk = 1 - (1 - risk) * (1 - weight)
+    if "exclusive" in caption and "onlyfans" in caption:
+        risk = max(risk, 0.95)
+    return risk
+
+
+SIM_UNSAFE = float(os.getenv("MODERATION_SIM_UNSAFE", "0"))
+
+
+def _content_risk(item, unsafe: float) -> Tuple[float, float]:
+    # Stand-in for the pixels: a stable per-video "true" risk and the noise a
+    # frame-level model adds to it. The benign share stays below 0.45, so with
+    # the default thresholds neither model blocks it (risk + noise <= 0.6).
+    digest = hashlib.blake2b(f"{item.video_id}|{item.video_url}".encode("utf-8"), digest_size=8).digest()
+    u = int.from_bytes(digest[:4], "big") / 2 ** 32
+    noise = int.from_bytes(digest[4:], "big") / 2 ** 32 - 0.5
+    benign = 1.0 - unsafe
+    if u < benign:
+        return 0.45 * (u / benign) ** 4, noise * 0.3
+    return 0.5 + 0.5 * (u - benign) / unsafe, noise * 0.3
+
+
+class SimulatedFrameModel:
+    """Thumbnail/keyframe classifier placeholder: cheap and noisy"""
+
+    def __init__(self, seconds: float = 0.003, unsafe: float = SIM_UNSAFE):
+        self.seconds = seconds
+        self.unsafe = unsafe
+
+    def __call__(self, item, verdict: Verdict) -> float:
+        time.sleep(self.seconds)
+        risk, noise = _content_risk(item, self.unsafe)
+        return min(max(risk + noise, 0.0), 1.0)
+
+
+class SimulatedVideoModel:
+    """Full video model placeholder: the previous fixed inference cost, accurate"""
+
+    def __init__(self, seconds: float = 0.02, unsafe: float = SIM_UNSAFE):
+        self.seconds = seconds
+        self.unsafe = unsafe
+
+    def __call__(self, item, verdict: Verdict) -> float:
+        time.sleep(self.seconds)
+        return _content_risk(item, self.unsafe)[0]
+
+
+# Hashing the default 8 frames of a local clip takes ~25-30ms (see
+# load-testing/phash_index_bench.py) and starts when the request arrives, so by
+# then it is usually done; an item whose hashes aren't ready pays at most this
+# much on top of the video model. Remote media fetched by ffmpeg is rarely ready
+# and falls through to the video model. At 0 the stage is effectively a no-op:
+# hashing that started a few ms earlier is almost never done, so it only feeds
+# the index.
+PHASH_WAIT_MS = float(os.getenv("MODERATION_PHASH_WAIT_MS", "30"))
+
+
+class KnownMedia:
+    """
+    Looks the upload's frame hashes up in a MediaIndex of earlier verdicts:
+    a re-upload of known-bad media is blocked (risk 1), of known-good media
+    allowed (risk 0), anything else passes on (0.5).
+
+    The hashes come from a future the caller started before the cascade and
+    passed in ``notes["hashing"]``; the stage waits at most ``wait`` seconds
+    for it and passes on when the hashes aren't ready.
+    """
+
+    def __init__(self, index, wait: float = PHASH_WAIT_MS / 1000):
+        self.index = index
+        self.wait = wait
+
+    def __call__(self, item, verdict: Verdict) -> float:
+        future = verdict.notes.get("hashing")
+        try:
+            hashes = future.result(timeout=self.wait) if future is not None else []
+        except Exception:
+            # Not ready, cancelled or failed: the hashes are only a shortcut, the models decide
+            return 0.5
+        match = self.index.match(hashes)
+        if match is None:
+            return 0.5
+        verdict.notes["match"] = match
+        return 0.0 if match.is_safe else 1.0
+
+
+@dataclass
+class Stage:
+    name: str
+    # (item, verdict so far) -> risk
+    score: Callable[[object, Verdict], float]
+    block: float
+    allow: float = -1.0
+    policy: str = "Adult Content Policy"
+
+# ============================================================================
+# Cascade
+# ============================================================================
+
+class Cascade:
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("a cascade needs at least one stage")
+        self.stages = stages
+        self._lock = threading.Lock()
+        self._counts = {s.name: {"entered": 0, "blocked": 0, "allowed": 0, "seconds": 0.0} for s in stages}
+        self._items = 0
+        self._seconds = 0.0
+
+    def run(self, item, notes: Dict[str, object] = None) -> Verdict:
+        verdict = Verdict(notes=dict(notes or {}))
+        start = time.perf_counter()
+        timings = []
+        for i, stage in enumerate(self.stages):
+            t0 = time.perf_counter()
+            risk = stage.score(item, verdict)
+            timings.append(time.perf_counter() - t0)
+            last = i == len(self.stages) - 1
+            if risk >= stage.block:
+                verdict.findings.append((stage.policy, round(risk, 2), "HIGH"))
+                outcome = "blocked"
+                break
+            if risk <= stage.allow or last:
+                outcome = "allowed"
+                break
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            for s, seconds in zip(self.stages, timings):
+                counts = self._counts[s.name]
+                counts["entered"] += 1
+                counts["seconds"] += seconds
+            self._counts[stage.name][outcome] += 1
+            self._items += 1
+            self._seconds += elapsed
+        verdict.is_safe, verdict.risk, verdict.stage, verdict.seconds = outcome == "allowed", risk, stage.name, elapsed
+        return verdict
+
+    def snapshot(self) -> dict:
+        """Per stage: share of all items it saw and decided, and its mean cost"""
+        with self._lock:
+            items = self._items or 1
+            stages = {
+                name: {
+                    **c,
+                    "reached": c["entered"] / items,
+                    "exited": (c["blocked"] + c["allowed"]) / items,
+                    "mean_ms": c["seconds"] / c["entered"] * 1000 if c["entered"] else 0.0,
+                }
+                for name, c in self._counts.items()
+            }
+            return {"items": self._items, "mean_ms": self._seconds / items * 1000, "stages": stages}
+
+
+def from_env(frame_seconds: float = 0.003, video_seconds: float = 0.02, known_media: KnownMedia = None,
+             sim_unsafe: float = SIM_UNSAFE) -> Cascade:
+    def env(key, default):
+        return float(os.getenv(f"MODERATION_{key}", default))
+
+    stages = [
+        Stage("caption", caption_rules, block=env("CAPTION_BLOCK", "0.9"), allow=env("CAPTION_ALLOW", "-1")),
+        Stage("frame", SimulatedFrameModel(frame_seconds, sim_unsafe), block=env("FRAME_BLOCK", "0.85"),
+              allow=env("FRAME_ALLOW", "0.2")),
+    ]
+    if known_media is not None:
+        stages.append(Stage("known_media", known_media, block=1.0, allow=0.0, policy="Known Violating Media"))
+    return Cascade(stages + [
+        Stage("video", SimulatedVideoModel(video_seconds, sim_unsafe), block=env("VIDEO_BLOCK", "0.5")),
+    ])
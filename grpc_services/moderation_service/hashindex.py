@@ -0,0 +1,344 @@
+# File: moderation_service/hashindex.py
+# Hamming-distance index of frame hashes with the verdicts they came from
+
+"""
+``MultiIndexHash`` finds every stored 64-bit hash within ``max_distance``
+bits of a query without scanning them all. Each hash is split into four
+16-bit substrings, each with its own table. If two hashes differ in at most
+d bits, at least one substring differs in at most d // 4 bits (pigeonhole).
+A lookup therefore probes each table at the query's substring and at every
+substring within d // 4 flipped bits. It then checks the full distance of
+the few candidates found. At 1M hashes a table bucket holds ~15 entries.
+
+``MediaIndex`` keeps the verdict of every indexed video. A query video
+matches a prior one when enough of its sampled frames are near frames of
+that video.
+
+``max_videos`` caps how many videos it holds; the oldest are evicted.
+
+Persistence: ``save()`` writes a snapshot (header JSON + the raw hash and
+owner arrays) atomically. The server appends what it learns to a journal.
+``load()`` reads the snapshot and replays every journal next to it. A
+server index folds its journal into the snapshot as it goes (see
+``MediaIndex``); with no server running, journals can also be folded
+offline (optionally keeping the newest N videos):
+
+    python -m moderation_service.hashindex compact /var/lib/phx/moderation.phx [N]
+"""
+
+import glob
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, List, Optional
+
+# Default cap on indexed videos (MODERATION_PHASH_MAX_VIDEOS); ~8 frames each
+MAX_VIDEOS = 100_000
+# Journal records between checkpoints of an index without a cap
+CHECKPOINT_RECORDS = 50_000
+
+_MAGIC = b"PHXMIH1\n"
+_BANDS = 4
+_BAND_BITS = 16
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+# ============================================================================
+# Multi-Index Hashing
+# ============================================================================
+
+def _flip_masks(bits: int, radius: int) -> List[int]:
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks.extend(sum(1 << b for b in combo) for combo in combinations(range(bits), r))
+    return masks
+
+
+class MultiIndexHash:
+    def __init__(self, max_distance: int = 7):
+        self.max_distance = max_distance
+        self._masks = _flip_masks(_BAND_BITS, max_distance // _BANDS)
+        self.hashes = array("Q")
+        self.owners = array("I")
+        self._tables: List[Dict[int, array]] = [{} for _ in range(_BANDS)]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, h: int, owner: int):
+        entry = len(self.hashes)
+        self.hashes.append(h)
+        self.owners.append(owner)
+        for band, table in enumerate(self._tables):
+            key = (h >> (band * _BAND_BITS)) & _BAND_MASK
+            bucket = table.get(key)
+            if bucket is None:
+                bucket = table[key] = array("I")
+            bucket.append(entry)
+
+    def search(self, h: int) -> List[tuple]:
+        """(owner, distance) for every stored hash within max_distance of ``h``"""
+        seen = set()
+        found = []
+        hashes, owners = self.hashes, self.owners
+        for band, table in enumerate(self._tables):
+            key = (h >> (band * _BAND_BITS)) & _BAND_MASK
+            for mask in self._masks:
+                bucket = table.get(key ^ mask)
+                if not bucket:
+                    continue
+                for entry in bucket:
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    distance = (hashes[entry] ^ h).bit_count()
+                    if distance <= self.max_distance:
+                        found.append((owners[entry], distance))
+        return found
+
+# ============================================================================
+# Media Verdicts
+# ============================================================================
+
+@dataclass
+class Match:
+    video_id: str
+    is_safe: bool
+    policy: str
+    frames: int          # query frames with a near match in this video
+    distance: float      # mean Hamming distance of those frames
+
+
+class _Generation:
+    """The videos indexed since the last rotation"""
+
+    def __init__(self, max_distance: int):
+        self.mih = MultiIndexHash(max_distance)
+        self.videos: List[list] = []           # [video_id, is_safe, policy]
+        self.by_id: Dict[str, int] = {}
+
+
+class MediaIndex:
+    """
+    With ``max_videos``, memory is bounded by keeping two generations of at
+    most ``max_videos // 2`` videos each: when the newer one fills up, the
+    older one is dropped whole and a new one started, so the index always
+    holds the most recent half to all of ``max_videos`` videos.
+
+    With both a ``snapshot_path`` and a ``journal_path`` (see ``load()``),
+    the journal is folded into the snapshot every generation's worth of
+    records (``CHECKPOINT_RECORDS`` without a cap), so disk use and load
+    time stay bounded too.
+    """
+
+    def __init__(self, max_distance: int = 7, min_fraction: float = 0.5, journal_path: str = None,
+                 max_videos: int = 0, snapshot_path: str = None):
+        self.max_distance = max_distance
+        self.min_fraction = min_fraction
+        self.max_videos = max_videos
+        self._generation_size = max(max_videos // 2, 1) if max_videos else 0
+        self._generations = [_Generation(max_distance)]
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._snapshot_path = snapshot_path
+        self._journal_path = journal_path
+        self._journal = open(journal_path, "a", encoding="utf-8") if journal_path else None
+        self._journaled = 0
+        self._folded: List[str] = []
+        self._checkpoint_every = self._generation_size or CHECKPOINT_RECORDS
+
+    def __len__(self):
+        return sum(len(g.mih) for g in self._generations)
+
+    @property
+    def videos(self) -> int:
+        return sum(len(g.videos) for g in self._generations)
+
+    def match(self, hashes: List[int]) -> Optional[Match]:
+        """The prior video sharing the most near-duplicate frames, if enough of them"""
+        if not hashes:
+            return None
+        votes: Dict[tuple, list] = {}
+        with self._lock:
+            generations = self._generations
+            for h in hashes:
+                best: Dict[tuple, int] = {}
+                for g, gen in enumerate(generations):
+                    for owner, distance in gen.mih.search(h):
+                        if distance < best.get((g, owner), 65):
+                            best[(g, owner)] = distance
+                for key, distance in best.items():
+                    votes.setdefault(key, []).append(distance)
+            if not votes:
+                return None
+            (g, owner), distances = max(votes.items(), key=lambda kv: (len(kv[1]), -sum(kv[1])))
+            if len(distances) < max(1, self.min_fraction * len(hashes)):
+                return None
+            video_id, is_safe, policy = generations[g].videos[owner]
+        return Match(video_id, is_safe, policy, len(distances), sum(distances) / len(distances))
+
+    def remember(self, video_id: str, hashes: List[int], is_safe: bool, policy: str = "", journal: bool = True):
+        """Indexes a decided video's frames; a later verdict for the same id replaces the earlier one"""
+        if not hashes:
+            return
+        with self._lock:
+            for gen in self._generations:
+                owner = gen.by_id.get(video_id)
+                if owner is not None:
+                    gen.videos[owner][1:] = [is_safe, policy]
+                    break
+            else:
+                gen = self._generations[-1]
+                if self._generation_size and len(gen.videos) >= self._generation_size:
+                    gen = _Generation(self.max_distance)
+                    self._generations = [self._generations[-1], gen]
+                owner = gen.by_id[video_id] = len(gen.videos)
+                gen.videos.append([video_id, is_safe, policy])
+                for h in hashes:
+                    gen.mih.add(h, owner)
+            if journal and self._journal:
+                self._journal.write(json.dumps({"id": video_id, "safe": is_safe, "policy": policy,
+                                                "hashes": [f"{h:016x}" for h in hashes]}) + "\n")
+                self._journal.flush()
+                self._journaled += 1
+            due = self._snapshot_path and self._journaled >= self._checkpoint_every
+        # In the background: remember() may run on a request thread, and lookups
+        # only wait for the in-memory copy, not the write
+        if due and self._checkpoint_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_checkpoint, name="media-index-checkpoint", daemon=True).start()
+
+    def _background_checkpoint(self):
+        try:
+            self._checkpoint()
+        except OSError as e:
+            logging.warning(f"Media index checkpoint to {self._snapshot_path} failed: {e}")
+        finally:
+            self._checkpoint_lock.release()
+
+    def frame_hashes(self) -> array:
+        """Every stored frame hash, oldest first"""
+        with self._lock:
+            out = array("Q")
+            for gen in self._generations:
+                out.extend(gen.mih.hashes)
+            return out
+
+    # --- Persistence ---
+
+    def _state(self) -> tuple:
+        # Caller holds the lock; verdict lists are copied as remember() updates them in place
+        videos, hashes, owners = [], array("Q"), array("I")
+        for gen in self._generations:
+            hashes.extend(gen.mih.hashes)
+            owners.extend(owner + len(videos) for owner in gen.mih.owners)
+            videos.extend(list(v) for v in gen.videos)
+        return videos, hashes, owners
+
+    def _write(self, path: str, videos: list, hashes: array, owners: array):
+        header = json.dumps({"byteorder": sys.byteorder, "max_distance": self.max_distance,
+                             "count": len(hashes), "videos": videos}).encode("utf-8")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            hashes.tofile(f)
+            owners.tofile(f)
+        os.replace(tmp, path)
+
+    def save(self, path: str):
+        with self._lock:
+            self._write(path, *self._state())
+
+    def _checkpoint(self, folded=()):
+        """
+        Writes the snapshot and deletes the journal records it now holds.
+        The live journal is moved aside first and only deleted once the
+        snapshot is in place, so a crash in between loses nothing.
+        """
+        with self._lock:
+            state = self._state()
+            # Journals set aside by a checkpoint that failed are still to be folded
+            self._folded.extend(folded)
+            if self._journal:
+                self._journal.close()
+                aside = f"{self._journal_path}.{time.time_ns()}.old"
+                os.replace(self._journal_path, aside)
+                self._folded.append(aside)
+                self._journal = open(self._journal_path, "a", encoding="utf-8")
+            self._journaled = 0
+            folded = list(self._folded)
+        self._write(self._snapshot_path, *state)
+        with self._lock:
+            del self._folded[:len(folded)]
+        for journal in folded:
+            try:
+                os.remove(journal)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, path: str, journal_path: str = None, **kwargs) -> "MediaIndex":
+        """
+        Snapshot at ``path`` (if any) plus every ``path``.journal* file, newest
+        videos kept. With ``journal_path`` the index keeps the snapshot up to
+        date itself: the journals are folded into it right away and then
+        periodically, so only one server may use ``path`` at a time.
+        """
+        index = cls(journal_path=journal_path, snapshot_path=path if journal_path else None, **kwargs)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise ValueError(f"not a media index: {path}")
+                (size,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(size))
+                hashes, owners = array("Q"), array("I")
+                hashes.fromfile(f, header["count"])
+                owners.fromfile(f, header["count"])
+            if header["byteorder"] != sys.byteorder:
+                hashes.byteswap()
+                owners.byteswap()
+            videos = header["videos"]
+            frames: List[List[int]] = [[] for _ in videos]
+            for h, owner in zip(hashes, owners):
+                frames[owner].append(h)
+            # Older videos would only be evicted again
+            first = max(len(videos) - index.max_videos, 0) if index.max_videos else 0
+            for (video_id, is_safe, policy), video_hashes in zip(videos[first:], frames[first:]):
+                index.remember(video_id, video_hashes, is_safe, policy, journal=False)
+        journals = sorted(glob.glob(f"{glob.escape(path)}.journal*"))
+        for journal in journals:
+            with open(journal, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    index.remember(rec["id"], [int(h, 16) for h in rec["hashes"]], rec["safe"], rec["policy"],
+                                   journal=False)
+        if journal_path and any(os.path.getsize(j) for j in journals):
+            with index._checkpoint_lock:
+                index._checkpoint(folded=[j for j in journals if j != journal_path])
+        return index
+
+
+def compact(path: str, max_videos: int = 0):
+    """Folds the journals into a new snapshot of at most ``max_videos`` videos; run while no server is writing them"""
+    journals = glob.glob(f"{glob.escape(path)}.journal*")
+    index = MediaIndex.load(path, max_videos=max_videos)
+    index.save(path)
+    for journal in journals:
+        os.remove(journal)
+    print(f"{path}: {len(index)} frame hashes, {index.videos} videos ({len(journals)} journals folded)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "compact":
+        sys.exit("usage: python -m moderation_service.hashindex compact INDEX_PATH [MAX_VIDEOS]")
+    compact(sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 0)
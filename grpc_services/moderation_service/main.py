@@ -0,0 +1,29 @@
+# File: moderation_service/main.py
+# Python gRPC Server for the AI Content Moderation Service
+#
+# Run from grpc_services/:  PYTHONPATH=.. python -m moderation_service.main
+
+import os
+
+from phx_common import bootstrap
+
+# --- Configuration ---
+_LISTEN_PORT = '[::]:50057'
+_SERVICE_NAME = 'moderation.ModerationService'
+# Scoring is CPU-bound: one server process per core, each with its own GIL.
+# The known-media index (MODERATION_PHASH) lives in process memory, so with it on a
+# single process serves every request; otherwise a re-upload would only be found by
+# the process that saw the original.
+_PHASH = os.getenv('MODERATION_PHASH', '0') != '0'
+_PROCESSES = 1 if _PHASH else int(os.getenv('MODERATION_PROCESSES', os.cpu_count() or 1))
+
+# --- Server Setup ---
+def serve():
+    if _PHASH:
+        # PHX_PROCESSES would override processes= in bootstrap.serve
+        os.environ['PHX_PROCESSES'] = '1'
+    bootstrap.serve("Moderation", _LISTEN_PORT, "moderation_service.servicer", service_names=[_SERVICE_NAME],
+                    processes=_PROCESSES)
+
+if __name__ == '__main__':
+    serve()
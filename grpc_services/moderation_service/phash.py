@@ -0,0 +1,197 @@
+# File: moderation_service/phash.py
+# Perceptual hashes of sampled video frames
+
+"""
+A video is fingerprinted by the 64-bit DCT perceptual hash (pHash) of a few
+sampled frames. Re-encoding, rescaling, small crops and brightness changes
+move a frame's hash by a few bits, so a Hamming-distance lookup
+(hashindex.py) finds re-uploads that a byte hash would miss.
+
+Frames come from:
+
+* uncompressed YUV4MPEG2 (.y4m) files, read with mmap: only the luma rows
+  that the 32x32 thumbnail samples are touched, for evenly spaced frames;
+* other local files and http(s) URLs, through ffmpeg: it decodes at the
+  sampling rate, scales to 32x32 grey and streams the raw thumbnails over a
+  pipe, so the video is never held in memory.
+
+Sources are untrusted upload URLs. ``resolve_source`` only accepts http(s)
+URLs on an allowed host, and local files under the media root; ffmpeg is
+further limited to those protocols and to video container formats, so a
+URL can't make it read other files or reach other services.
+
+Without ffmpeg on PATH only .y4m files can be hashed.
+"""
+
+import logging
+import math
+import mmap
+import os
+import shutil
+import subprocess
+import threading
+from typing import Iterator, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+SIZE = 32
+# Flat frames (black intros, fades) hash to noise and would match everything
+MIN_VARIANCE = 25.0
+# The 8 lowest DCT-II basis rows over 32 samples
+_COS = [[math.cos((2 * x + 1) * u * math.pi / (2 * SIZE)) for x in range(SIZE)] for u in range(8)]
+# What ffmpeg may open: the protocols of a resolved source, and video containers only
+# (playlists such as HLS/concat could point it anywhere)
+_LOCAL_PROTOCOLS = "file"
+_REMOTE_PROTOCOLS = "http,https,tcp,tls"
+_FORMATS = "mov,mp4,m4a,3gp,3g2,mj2,matroska,webm,avi,flv,mpegts,yuv4mpegpipe"
+
+# ============================================================================
+# Hashing
+# ============================================================================
+
+def phash(pixels: bytes) -> Optional[int]:
+    """64-bit pHash of a 32x32 grey thumbnail (row-major), or None for a flat frame"""
+    n = SIZE * SIZE
+    mean = sum(pixels) / n
+    if sum((p - mean) ** 2 for p in pixels) / n < MIN_VARIANCE:
+        return None
+    # Separable 2D DCT, keeping only the top-left 8x8 (lowest frequencies)
+    rows = [[sum(c * p for c, p in zip(basis, pixels[y * SIZE:(y + 1) * SIZE])) for basis in _COS]
+            for y in range(SIZE)]
+    coeffs = [sum(basis[y] * rows[y][u] for y in range(SIZE)) for basis in _COS for u in range(8)]
+    # The DC term only says how bright the frame is
+    median = sorted(coeffs[1:])[31]
+    h = 0
+    for i in range(1, 64):
+        if coeffs[i] > median:
+            h |= 1 << i
+    return h
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+# ============================================================================
+# Frame Sources
+# ============================================================================
+
+def resolve_source(source: str, media_root: str = None, hosts: Sequence[str] = ()) -> Optional[str]:
+    """
+    The URL or real local path to read ``source`` from, or None when it is not allowed:
+    http(s) only on ``hosts`` ("*" = any host), files only under ``media_root``
+    """
+    parts = urlsplit(source)
+    if parts.scheme in ("http", "https"):
+        host = (parts.hostname or "").lower()
+        return source if host and ("*" in hosts or host in hosts) else None
+    if parts.scheme not in ("", "file") or not media_root:
+        return None
+    path = os.path.realpath(parts.path if parts.scheme else source)
+    root = os.path.realpath(media_root)
+    return path if os.path.commonpath([path, root]) == root else None
+
+
+def _thumbnail(plane, offset: int, width: int, height: int, rows_per_cell: int = 4) -> bytes:
+    """Box-samples a width x height 8-bit plane at ``offset`` down to 32x32"""
+    out = bytearray(SIZE * SIZE)
+    xs = [x * width // SIZE for x in range(SIZE + 1)]
+    for cy in range(SIZE):
+        y0, y1 = cy * height // SIZE, max((cy + 1) * height // SIZE, cy * height // SIZE + 1)
+        step = max((y1 - y0) // rows_per_cell, 1)
+        sample_rows = range(y0, y1, step)
+        sums = [0] * SIZE
+        for y in sample_rows:
+            line = plane[offset + y * width:offset + (y + 1) * width]
+            for cx in range(SIZE):
+                sums[cx] += sum(line[xs[cx]:xs[cx + 1]])
+        for cx in range(SIZE):
+            count = len(sample_rows) * max(xs[cx + 1] - xs[cx], 1)
+            out[cy * SIZE + cx] = min(sums[cx] // count, 255)
+    return bytes(out)
+
+
+_Y4M_FRAME_FACTOR = {"420": 1.5, "422": 2.0, "444": 3.0, "mono": 1.0}
+
+
+def y4m_frames(path: str, count: int) -> Iterator[bytes]:
+    """32x32 luma thumbnails of ``count`` evenly spaced frames of a .y4m file"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = mm.find(b"\n")
+        header = mm[:end].split()
+        if end < 0 or not header or header[0] != b"YUV4MPEG2":
+            raise ValueError(f"not a YUV4MPEG2 file: {path}")
+        params = {tok[:1]: tok[1:].decode(errors="replace") for tok in header[1:]}
+        if b"W" not in params or b"H" not in params:
+            raise ValueError(f"no frame size in the YUV4MPEG2 header of {path}")
+        width, height = int(params[b"W"]), int(params[b"H"])
+        if width <= 0 or height <= 0:
+            raise ValueError(f"bad frame size {width}x{height} in {path}")
+        chroma = params.get(b"C", "420")
+        factor = next((v for k, v in _Y4M_FRAME_FACTOR.items() if chroma.startswith(k)), 1.5)
+        frame_bytes = int(width * height * factor)
+        first = end + 1
+        frame_header = mm.find(b"\n", first) + 1 - first
+        if mm[first:first + 5] != b"FRAME":
+            raise ValueError(f"no frames in {path}")
+        # Frame headers are almost always a bare "FRAME\n"; checked per sampled frame
+        stride = frame_header + frame_bytes
+        total = (len(mm) - first) // stride
+        picks = sorted({(k * total) // count + total // (2 * count) for k in range(count)}) if total else []
+        for i in picks:
+            start = first + i * stride
+            if mm[start:start + 5] != b"FRAME":
+                logging.warning(f"Irregular frame headers in {path}; stopping after frame {i}")
+                return
+            yield _thumbnail(mm, start + frame_header, width, height)
+
+
+def ffmpeg_frames(source: str, count: int, fps: float, timeout: float) -> Iterator[bytes]:
+    """32x32 grey thumbnails decoded by ffmpeg at ``fps``, streamed over a pipe"""
+    remote = source.startswith(("http://", "https://"))
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-protocol_whitelist", _REMOTE_PROTOCOLS if remote else _LOCAL_PROTOCOLS,
+        "-format_whitelist", _FORMATS,
+        "-i", source if remote else f"file:{source}",
+        "-vf", f"fps={fps},scale={SIZE}:{SIZE}:flags=area,format=gray",
+        "-frames:v", str(count), "-f", "rawvideo", "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # A stalled download or decode must not hold the request thread
+    watchdog = threading.Timer(timeout, proc.kill)
+    watchdog.start()
+    try:
+        frame = SIZE * SIZE
+        while True:
+            data = proc.stdout.read(frame)
+            if len(data) < frame:
+                break
+            yield data
+    finally:
+        watchdog.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def video_hashes(source: str, count: int = 8, fps: float = 0.5, timeout: float = 5.0,
+                 media_root: str = None, hosts: Sequence[str] = ()) -> List[int]:
+    """
+    pHashes of up to ``count`` sampled frames; empty when the media can't be
+    read or ``source`` is not allowed (see ``resolve_source``)
+    """
+    path = resolve_source(source, media_root, hosts)
+    if path is None:
+        logging.warning(f"Not hashing frames of {source}: not an allowed media location")
+        return []
+    try:
+        if path.endswith(".y4m") and os.path.isfile(path):
+            frames = y4m_frames(path, count)
+        elif shutil.which("ffmpeg"):
+            frames = ffmpeg_frames(path, count, fps, timeout)
+        else:
+            return []
+        return [h for h in map(phash, frames) if h is not None]
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        logging.warning(f"Could not hash frames of {source}: {e}")
+        return []
@@ -0,0 +1,127 @@
+# File: moderation_service/servicer.py
+# AI Content Moderation implementation (loaded by main.py on warmup)
+
+import os
+import time
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import moderation_service.moderation_pb2 as mod_pb2
+import moderation_service.moderation_pb2_grpc as mod_pb2_grpc
+from moderation_service import cascade, phash
+from moderation_service.hashindex import MAX_VIDEOS, MediaIndex
+
+# --- Configuration ---
+STATS_SECONDS = float(os.getenv('MODERATION_STATS_SECONDS', '60'))
+# Perceptual hashes of sampled frames, matched against earlier verdicts (off by default;
+# main.py runs a single server process while on, since the index lives in its memory)
+PHASH_ENABLED = os.getenv('MODERATION_PHASH', '0') != '0'
+PHASH_INDEX_PATH = os.getenv('MODERATION_PHASH_INDEX', '')
+PHASH_FRAMES = int(os.getenv('MODERATION_PHASH_FRAMES', '8'))
+PHASH_FPS = float(os.getenv('MODERATION_PHASH_FPS', '0.5'))
+PHASH_TIMEOUT = float(os.getenv('MODERATION_PHASH_TIMEOUT', '5'))
+PHASH_MAX_DISTANCE = int(os.getenv('MODERATION_PHASH_DISTANCE', '7'))
+PHASH_MAX_VIDEOS = int(os.getenv('MODERATION_PHASH_MAX_VIDEOS', str(MAX_VIDEOS)))
+# Where frames may be read from: local files under MEDIA_ROOT, http(s) on MEDIA_HOSTS
+PHASH_MEDIA_ROOT = os.getenv('MODERATION_MEDIA_ROOT', '')
+PHASH_MEDIA_HOSTS = tuple(h.strip().lower() for h in os.getenv('MODERATION_MEDIA_HOSTS', 'cdn.profithack.ai').split(',')
+                          if h.strip())
+# Hashing runs in the background; uploads beyond the backlog are not hashed
+PHASH_WORKERS = int(os.getenv('MODERATION_PHASH_WORKERS', '2'))
+PHASH_BACKLOG = int(os.getenv('MODERATION_PHASH_BACKLOG', '64'))
+# Per-request lines, sampled by PHX_LOG_SAMPLE (see phx_common/logs.py)
+_hot_log = logging.getLogger('moderation.hot')
+
+# Caption rules -> frame model -> known media -> video model, stopping at the
+# first confident stage. Built in warmup(), after the media index has loaded.
+_cascade = None
+_media_index = None
+_hash_pool = None
+_hash_slots = None
+
+def _report_stats():
+    while True:
+        time.sleep(STATS_SECONDS)
+        snap = _cascade.snapshot()
+        exits = " ".join(f"{name}={s['exited']:.1%}" for name, s in snap['stages'].items())
+        logging.info(f"Moderation cascade: items={snap['items']} mean={snap['mean_ms']:.1f}ms exits: {exits}")
+
+# --- AI Moderation Implementation ---
+class ModerationService(mod_pb2_grpc.ModerationServiceServicer):
+    """
+    The Moderation Service implements AI-Powered Content Moderation and Quality Scoring.
+    """
+    def AnalyzeVideo(self, request, context):
+        _hot_log.info(f"Received Analysis Request for video: {request.video_id} (User: {request.user_id})")
+
+        # --- 1. Quality Score Model (Placeholder) ---
+        # Simulates a model checking for low-resolution, poor lighting, etc.
+        quality_score = random.uniform(0.7, 0.99)
+
+        # --- 2. Policy Violation Cascade ---
+        # A HIGH-severity caption match exits before any model runs, and only items
+        # the frame model is unsure about go on. Of those, re-uploads of media judged
+        # before are settled by their frame hashes (hashed in the background since
+        # the request arrived); the rest pay for the full video model.
+        hashing = _start_hashing(request)
+        verdict = _cascade.run(request, notes={"hashing": hashing} if hashing else None)
+        if hashing is not None:
+            hashing.add_done_callback(lambda f: _remember(request, verdict, f))
+        if quality_score < 0.5 and not any(f[0] == "Low Quality/Spam Policy" for f in verdict.findings):
+            verdict.findings.append(("Low Quality/Spam Policy", 0.80, "MEDIUM"))
+        _hot_log.info(f"Video {request.video_id} decided by {verdict.stage} stage "
+                     f"(risk {verdict.risk:.2f}, {verdict.seconds * 1000:.1f}ms)")
+
+        return mod_pb2.AnalyzeVideoResponse(
+            is_safe=verdict.is_safe,
+            quality_score=quality_score,
+            violations=[mod_pb2.Violation(policy_name=policy, confidence_score=confidence, severity=severity)
+                        for policy, confidence, severity in verdict.findings]
+        )
+
+def _hash_frames(source: str):
+    return phash.video_hashes(source, count=PHASH_FRAMES, fps=PHASH_FPS, timeout=PHASH_TIMEOUT,
+                              media_root=PHASH_MEDIA_ROOT, hosts=PHASH_MEDIA_HOSTS)
+
+def _start_hashing(request):
+    """Future of the upload's frame hashes, or None (no index, no URL, backlog full)"""
+    if _hash_pool is None or not request.video_url or not _hash_slots.acquire(blocking=False):
+        return None
+    future = _hash_pool.submit(_hash_frames, request.video_url)
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future
+
+def _remember(request, verdict, hashing):
+    # Only model verdicts are indexed: a caption block says nothing about the pixels,
+    # and a known-media hit is already in the index
+    if verdict.stage not in ("frame", "video") or hashing.cancelled() or hashing.exception():
+        return
+    hashes = hashing.result()
+    if hashes:
+        policy = next((f[0] for f in verdict.findings if f[2] == "HIGH"), "")
+        _media_index.remember(request.video_id, hashes, verdict.is_safe, policy)
+
+def register(server):
+    mod_pb2_grpc.add_ModerationServiceServicer_to_server(ModerationService(), server)
+
+def warmup():
+    global _cascade, _media_index, _hash_pool, _hash_slots
+    known_media = None
+    if PHASH_ENABLED:
+        if PHASH_INDEX_PATH:
+            # The server journals what it learns next to the snapshot and folds it in as it goes
+            journal = f"{PHASH_INDEX_PATH}.journal.{os.getenv('PHX_WORKER_INDEX', '0')}"
+            _media_index = MediaIndex.load(PHASH_INDEX_PATH, journal_path=journal, max_distance=PHASH_MAX_DISTANCE,
+                                           max_videos=PHASH_MAX_VIDEOS)
+        else:
+            _media_index = MediaIndex(max_distance=PHASH_MAX_DISTANCE, max_videos=PHASH_MAX_VIDEOS)
+        logging.info(f"Media index: {len(_media_index)} frame hashes from {_media_index.videos} videos")
+        _hash_pool = ThreadPoolExecutor(max_workers=PHASH_WORKERS, thread_name_prefix="moderation-phash")
+        _hash_slots = threading.BoundedSemaphore(PHASH_BACKLOG)
+        # Waits up to MODERATION_PHASH_WAIT_MS for the hashes (cascade.PHASH_WAIT_MS)
+        known_media = cascade.KnownMedia(_media_index)
+    _cascade = cascade.from_env(known_media=known_media)
+    if STATS_SECONDS > 0:
+        threading.Thread(target=_report_stats, name="moderation-stats", daemon=True).start()
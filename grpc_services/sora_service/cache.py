@@ -0,0 +1,131 @@
+# File: sora_service/cache.py
+# Content-addressed generation cache with request coalescing
+
+"""
+Identical (prompt, style, duration) requests map to one generation job.
+
+The key is a hash of the normalised request (case and whitespace folded), so
+a retry or a repeated seeding prompt lands on the same entry:
+
+* while the job is pending, duplicates get the same job id (singleflight -
+  only the first request is admitted and queued);
+* once it completes, duplicates get the finished job id and video URL;
+* if it fails, the entry is dropped so the next request tries again.
+
+Completed entries are evicted least-recently-used once they are older than
+``max_age`` or the cached videos exceed ``max_bytes``/``max_entries``.
+In-flight entries are never evicted.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+
+def request_key(prompt: str, style: str, duration_seconds: int) -> str:
+    normalised = "\x1f".join([" ".join(prompt.lower().split()), style.strip().lower(), str(duration_seconds)])
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Entry:
+    job_id: str
+    status: str = "PENDING"
+    video_url: str = ""
+    size_bytes: int = 0
+    created_at: float = 0.0
+    completed_at: float = 0.0
+
+
+class GenerationCache:
+    def __init__(self, max_age: float = 86400.0, max_bytes: int = 50 * 1024 ** 3, max_entries: int = 100000,
+                 clock: Callable[[], float] = time.time):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "inflight_hits": 0, "misses": 0, "evicted_age": 0, "evicted_size": 0, "failed": 0}
+
+    def get_or_start(self, key: str, start: Callable[[], str]) -> Tuple[Entry, str]:
+        """
+        Returns (entry, "hit" | "inflight" | "miss"). On a miss ``start()`` is
+        called under the lock and must return the new job id; if it raises,
+        nothing is cached.
+        """
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry.status == "COMPLETED" and now - entry.completed_at > self.max_age:
+                self._drop(key, entry)
+                self.stats["evicted_age"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                kind = "hit" if entry.status == "COMPLETED" else "inflight"
+                self.stats["hits" if kind == "hit" else "inflight_hits"] += 1
+                return entry, kind
+            entry = Entry(job_id=start(), created_at=now)
+            self._entries[key] = entry
+            self.stats["misses"] += 1
+            self._evict(now)
+            return entry, "miss"
+
+    def complete(self, key: str, video_url: str, size_bytes: int = 0):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.status = "COMPLETED"
+            entry.video_url = video_url
+            entry.size_bytes = size_bytes
+            entry.completed_at = self.clock()
+            self._bytes += size_bytes
+            self._evict(entry.completed_at)
+
+    def fail(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.stats["failed"] += 1
+
+    def _drop(self, key: str, entry: Entry):
+        del self._entries[key]
+        self._bytes -= entry.size_bytes
+
+    def _evict(self, now: float):
+        # Walks from the least recently used end and stops at the first entry
+        # that is neither expired nor needed to get back under the limits.
+        # Pending jobs are skipped: they are the singleflight.
+        entries, size = len(self._entries), self._bytes
+        victims = []
+        for key, entry in self._entries.items():
+            over = entries > self.max_entries or size > self.max_bytes
+            if entry.status != "COMPLETED":
+                if over:
+                    continue
+                break
+            expired = now - entry.completed_at > self.max_age
+            if not (expired or over):
+                break
+            victims.append((key, entry, expired))
+            entries -= 1
+            size -= entry.size_bytes
+        for key, entry, expired in victims:
+            self._drop(key, entry)
+            self.stats["evicted_age" if expired else "evicted_size"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["inflight_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": (self.stats["hits"] + self.stats["inflight_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
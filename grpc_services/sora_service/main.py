@@ -0,0 +1,22 @@
+# File: sora_service/main.py
+# Python gRPC Server for the Sora 2 AI Video Generation Engine
+#
+# Run from grpc_services/:  PYTHONPATH=.. python -m sora_service.main
+
+import os
+
+from phx_common import bootstrap
+
+# --- Configuration ---
+# SORA_LISTEN_ADDRESS lets several replicas run on one host
+_LISTEN_PORT = os.getenv('SORA_LISTEN_ADDRESS', '[::]:50055')
+_SERVICE_NAME = 'sora.SoraService'
+
+# --- Server Setup ---
+def serve():
+    # grpc, the generated stubs and the engine load after the port is open;
+    # the health service reports SERVING once they are ready.
+    bootstrap.serve("Sora", _LISTEN_PORT, "sora_service.servicer", service_names=[_SERVICE_NAME])
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,245 @@
+# File: sora_service/scheduler.py
+# Admission control and weighted fair queuing for Sora generation jobs
+
+"""
+Every GenerateVideo request passes admission first:
+
+* a per-user token bucket (rate and burst depend on the user's tier) caps how
+  fast one account can submit, and
+* per-user and global queue limits cap how much work can be waiting.
+
+A rejected request gets a retry-after hint. Admitted jobs wait in a weighted
+fair queue (start-time fair queuing over per-user flows, cost = requested
+seconds of video), and a fixed pool of engine slots takes jobs from it. A
+bulk seeder with thousands of queued jobs therefore only delays an
+interactive user's job by about one job per slot, not by its whole backlog.
+
+Kept free of grpc so it can be exercised directly (load-testing/sora_fairness_bench.py).
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+# ============================================================================
+# Tiers
+# ============================================================================
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    weight: float       # share of engine time relative to other backlogged flows
+    rate: float         # sustained submissions per second
+    burst: float        # bucket size
+    max_queued: int     # jobs waiting per user
+
+
+DEFAULT_TIERS = {
+    "interactive": Tier("interactive", weight=8.0, rate=0.5, burst=5, max_queued=20),
+    "pro": Tier("pro", weight=16.0, rate=2.0, burst=20, max_queued=100),
+    "bulk": Tier("bulk", weight=1.0, rate=20.0, burst=200, max_queued=5000),
+}
+
+
+def parse_tiers(spec: str, base: Dict[str, Tier] = DEFAULT_TIERS) -> Dict[str, Tier]:
+    """Overrides like "bulk:weight=2,rate=10;pro:burst=40" on top of ``base``"""
+    tiers = dict(base)
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        name, _, fields = part.partition(":")
+        current = tiers.get(name, Tier(name, 1.0, 1.0, 10, 50))
+        values = {k: float(v) for k, v in (f.split("=") for f in fields.split(",") if f)}
+        if "max_queued" in values:
+            values["max_queued"] = int(values["max_queued"])
+        tiers[name] = Tier(name, **{**current.__dict__, **values, "name": name})
+    return tiers
+
+# ============================================================================
+# Admission
+# ============================================================================
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0):
+        """(admitted, seconds until ``cost`` tokens will be available)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+# ============================================================================
+# Weighted Fair Queue
+# ============================================================================
+
+@dataclass(order=True)
+class Job:
+    finish: float
+    seq: int
+    start: float = field(compare=False)
+    job_id: str = field(compare=False)
+    user_id: str = field(compare=False)
+    tier: str = field(compare=False)
+    cost: float = field(compare=False)
+    payload: object = field(compare=False, default=None)
+    enqueued_at: float = field(compare=False, default=0.0)
+    dispatched_at: float = field(compare=False, default=0.0)
+
+
+_MAX_BUCKETS = 100000
+# Evicting down to this leaves headroom, so the O(n) prune runs once per ~10k new users
+_BUCKETS_AFTER_EVICT = _MAX_BUCKETS * 9 // 10
+# Finish tags kept before sweeping out the ones the virtual clock has passed
+_MIN_FINISH_SWEEP = 1024
+
+
+class FairScheduler:
+    def __init__(self, tiers: Dict[str, Tier] = DEFAULT_TIERS, slots: int = 4, max_queue: int = 20000,
+                 fair: bool = True, clock: Callable[[], float] = time.monotonic):
+        """``fair=False`` keeps admission control but serves one FIFO flow (for comparison)"""
+        self.tiers = tiers
+        self.fair = fair
+        self.slots = slots
+        self.max_queue = max_queue
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._finish_sweep_at = _MIN_FINISH_SWEEP
+        self._queued: Dict[str, int] = {}
+        self._flow_weight: Dict[str, float] = {}
+        # Least recently used first
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Mean engine seconds per job (EWMA), used for queue-full retry hints
+        self._service_time = 1.0
+        self.stats = {"admitted": 0, "rejected_rate": 0, "rejected_queue": 0, "dispatched": 0}
+
+    def submit(self, job_id: str, user_id: str, tier: str, cost: float = 1.0, payload=None) -> Job:
+        """Admits and enqueues a job, or raises Rejected with a retry-after hint"""
+        spec = self.tiers.get(tier) or self.tiers["interactive"]
+        cost = max(cost, 0.1)
+        with self._cond:
+            now = self.clock()
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= _MAX_BUCKETS:
+                    self._prune_buckets(now)
+                bucket = self._buckets[user_id] = TokenBucket(spec.rate, spec.burst, now)
+            else:
+                self._buckets.move_to_end(user_id)
+            queued = self._queued.get(user_id, 0)
+            if queued >= spec.max_queued or len(self._heap) >= self.max_queue:
+                self.stats["rejected_queue"] += 1
+                # Roughly how long until this user's share of the slots finishes one job
+                share = spec.weight / max(spec.weight, sum(self._flow_weight.values()))
+                raise Rejected("queue full", max(self._service_time / (self.slots * share), 0.1))
+            ok, retry_after = bucket.take(now)
+            if not ok:
+                self.stats["rejected_rate"] += 1
+                raise Rejected("rate limited", retry_after)
+            flow = user_id if self.fair else ""
+            start = max(self._virtual, self._last_finish.get(flow, 0.0))
+            finish = start + (cost / spec.weight if self.fair else cost)
+            self._last_finish[flow] = finish
+            job = Job(finish, next(self._seq), start, job_id, user_id, spec.name, cost, payload, enqueued_at=now)
+            heapq.heappush(self._heap, job)
+            self._queued[user_id] = queued + 1
+            self._flow_weight[user_id] = spec.weight
+            self.stats["admitted"] += 1
+            self._cond.notify()
+            return job
+
+    def _prune_buckets(self, now: float):
+        # A bucket that has refilled completely is the same as a new one
+        for user_id, b in list(self._buckets.items()):
+            if b.tokens + (now - b.updated) * b.rate >= b.burst:
+                del self._buckets[user_id]
+        # Still too many active ones (e.g. a flood of new user ids): drop the least
+        # recently used, which at worst hands that user a fresh burst
+        while len(self._buckets) > _BUCKETS_AFTER_EVICT:
+            self._buckets.popitem(last=False)
+
+    def next_job(self, timeout: Optional[float] = None) -> Optional[Job]:
+        """Blocks until a job is available; the one with the smallest finish tag wins"""
+        with self._cond:
+            if not self._heap and not self._cond.wait_for(lambda: self._heap, timeout):
+                return None
+            job = heapq.heappop(self._heap)
+            self._virtual = max(self._virtual, job.start)
+            left = self._queued[job.user_id] - 1
+            if left:
+                self._queued[job.user_id] = left
+            else:
+                del self._queued[job.user_id]
+                del self._flow_weight[job.user_id]
+                if not self._heap:
+                    # Idle: restart the virtual clock so tags stay small
+                    self._virtual = 0.0
+                    self._last_finish.clear()
+            if len(self._last_finish) >= self._finish_sweep_at:
+                self._sweep_finish()
+            job.dispatched_at = self.clock()
+            self.stats["dispatched"] += 1
+            return job
+
+    def _sweep_finish(self):
+        # A finish tag behind the virtual clock no longer affects the flow's next start tag
+        virtual = self._virtual
+        for flow, finish in list(self._last_finish.items()):
+            if finish <= virtual:
+                del self._last_finish[flow]
+        self._finish_sweep_at = max(_MIN_FINISH_SWEEP, 2 * len(self._last_finish))
+
+    def done(self, job: Job):
+        with self._cond:
+            elapsed = self.clock() - job.dispatched_at
+            self._service_time += 0.1 * (elapsed - self._service_time)
+
+    def run_slots(self, engine: Callable[[Job], None], name: str = "sora-slot"):
+        """Starts ``slots`` threads feeding jobs to ``engine(job)``"""
+        def loop():
+            while True:
+                job = self.next_job()
+                try:
+                    engine(job)
+                finally:
+                    self.done(job)
+        for i in range(self.slots):
+            threading.Thread(target=loop, name=f"{name}-{i}", daemon=True).start()
+
+    def queued(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def tracked_flows(self) -> int:
+        """Flows whose finish tag is still kept (bounded by the sweep)"""
+        with self._cond:
+            return len(self._last_finish)
+
+
+def from_env() -> FairScheduler:
+    return FairScheduler(
+        tiers=parse_tiers(os.getenv("SORA_TIERS", "")),
+        slots=int(os.getenv("SORA_SLOTS", "4")),
+        max_queue=int(os.getenv("SORA_MAX_QUEUE", "20000")),
+        fair=os.getenv("SORA_FAIR_QUEUING", "1") != "0",
+    )
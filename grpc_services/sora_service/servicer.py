@@ -0,0 +1,114 @@
+# File: sora_service/servicer.py
+# Sora 2 AI Video Generation Engine implementation (loaded by main.py on warmup)
+
+import os
+import time
+import logging
+import threading
+
+import grpc
+import sora_service.sora_pb2 as sora_pb2
+import sora_service.sora_pb2_grpc as sora_pb2_grpc
+from sora_service import scheduler
+from sora_service.cache import GenerationCache, request_key
+
+# --- Configuration ---
+# Accounts that seed content in bulk (e.g. the founder account used by ScrapeAndGenerate)
+BULK_USERS = frozenset(u.strip() for u in os.getenv('SORA_BULK_USERS', '').split(',') if u.strip())
+DEFAULT_TIER = os.getenv('SORA_DEFAULT_TIER', 'interactive')
+# Simulated engine time per requested second of video (0 = instant)
+SIM_SECONDS_PER_VIDEO_SECOND = float(os.getenv('SORA_SIM_SECONDS_PER_VIDEO_SECOND', '0'))
+# Set by the API gateway for paid plans; overrides the default tier
+TIER_METADATA_KEY = 'x-phx-tier'
+# Completed generations are reused for identical requests until evicted by age or size
+CACHE_MAX_AGE_SECONDS = float(os.getenv('SORA_CACHE_MAX_AGE_SECONDS', '86400'))
+CACHE_MAX_BYTES = int(os.getenv('SORA_CACHE_MAX_GB', '50')) * 1024 ** 3
+CACHE_STATS_SECONDS = float(os.getenv('SORA_CACHE_STATS_SECONDS', '60'))
+VIDEO_BASE_URL = os.getenv('SORA_VIDEO_BASE_URL', 'https://cdn.profithack.ai/sora')
+# Rough encoded size of a simulated video, for the cache size budget
+_SIM_BYTES_PER_VIDEO_SECOND = 1_500_000
+# Per-request lines, sampled by PHX_LOG_SAMPLE (see phx_common/logs.py)
+_hot_log = logging.getLogger('sora.hot')
+
+_scheduler = scheduler.from_env()
+_cache = GenerationCache(max_age=CACHE_MAX_AGE_SECONDS, max_bytes=CACHE_MAX_BYTES)
+
+def _tier_for(user_id: str, context) -> str:
+    if user_id in BULK_USERS:
+        return 'bulk'
+    for key, value in context.invocation_metadata() or ():
+        if key == TIER_METADATA_KEY and value in _scheduler.tiers and value != 'bulk':
+            return value
+    return DEFAULT_TIER
+
+def _run_engine(job):
+    # Stand-in for the GPU cluster call
+    wait = job.dispatched_at - job.enqueued_at
+    _hot_log.info(f"Dispatching {job.job_id} for {job.user_id} ({job.tier}) after {wait:.2f}s in queue")
+    try:
+        if SIM_SECONDS_PER_VIDEO_SECOND:
+            time.sleep(job.cost * SIM_SECONDS_PER_VIDEO_SECOND)
+        _cache.complete(job.payload, f"{VIDEO_BASE_URL}/{job.payload[:32]}.mp4",
+                        size_bytes=int(job.cost * _SIM_BYTES_PER_VIDEO_SECOND))
+    except Exception:
+        _cache.fail(job.payload)
+        raise
+
+def _report_cache_stats():
+    while True:
+        time.sleep(CACHE_STATS_SECONDS)
+        stats = _cache.snapshot()
+        logging.info(f"Sora cache: hit_rate={stats['hit_rate']:.1%} hits={stats['hits']} "
+                     f"inflight_hits={stats['inflight_hits']} misses={stats['misses']} entries={stats['entries']} "
+                     f"bytes={stats['bytes']} evicted_age={stats['evicted_age']} evicted_size={stats['evicted_size']}")
+
+# --- Sora Engine Implementation ---
+class SoraService(sora_pb2_grpc.SoraServiceServicer):
+    """
+    The Sora Service handles text-to-video generation requests.
+    """
+    def GenerateVideo(self, request, context):
+        _hot_log.info(f"Received Video Generation Request from user: {request.user_id} (Prompt: {request.prompt[:30]}...)")
+
+        # --- 1. Validation and Job Creation ---
+        if len(request.prompt) < 10:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Prompt must be at least 10 characters long.")
+            return sora_pb2.GenerateVideoResponse(status="FAILED")
+
+        # --- 2. Content-Addressed Lookup ---
+        # An identical request already queued or finished is answered from its job;
+        # only a miss goes through admission and costs an engine slot.
+        key = request_key(request.prompt, request.style, request.duration_seconds)
+
+        def start():
+            # --- 3. Admission and Fair Queuing ---
+            # Jobs wait in the per-user weighted fair queue for a free engine slot.
+            job_id = f"SORA-JOB-{time.time()}"
+            _scheduler.submit(job_id, request.user_id, _tier_for(request.user_id, context),
+                              cost=request.duration_seconds or 5, payload=key)
+            return job_id
+
+        try:
+            entry, kind = _cache.get_or_start(key, start)
+        except scheduler.Rejected as e:
+            context.set_trailing_metadata((('retry-after-ms', str(int(e.retry_after * 1000))),))
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"{e.reason}; retry after {e.retry_after:.1f}s")
+
+        if kind != "miss":
+            _hot_log.info(f"Reusing {entry.job_id} ({entry.status}, cache {kind}) for user {request.user_id}")
+
+        # PENDING until the engine finishes; COMPLETED carries the video URL
+        return sora_pb2.GenerateVideoResponse(
+            job_id=entry.job_id,
+            status=entry.status,
+            video_url=entry.video_url
+        )
+
+def register(server):
+    sora_pb2_grpc.add_SoraServiceServicer_to_server(SoraService(), server)
+
+def warmup():
+    _scheduler.run_slots(_run_engine)
+    if CACHE_STATS_SECONDS > 0:
+        threading.Thread(target=_report_cache_stats, name="sora-cache-stats", daemon=True).start()
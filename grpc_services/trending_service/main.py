@@ -0,0 +1,18 @@
+# File: trending_service/main.py
+# Python gRPC Server for the Trending Query Service
+#
+# Run from grpc_services/:  PYTHONPATH=.. python -m trending_service.main
+
+from phx_common import bootstrap
+
+# --- Configuration ---
+_LISTEN_PORT = '[::]:50063'
+_SERVICE_NAME = 'trending.TrendingService'
+
+# --- Server Setup ---
+def serve():
+    # Reports SERVING once the first Redis snapshot is loaded (servicer.warmup)
+    bootstrap.serve("Trending", _LISTEN_PORT, "trending_service.servicer", service_names=[_SERVICE_NAME])
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,132 @@
+# File: trending_service/servicer.py
+# Trending Query implementation (loaded by main.py on warmup)
+
+import os
+import re
+import math
+import time
+import logging
+import threading
+
+import grpc
+import redis
+import trending_service.trending_pb2 as trending_pb2
+import trending_service.trending_pb2_grpc as trending_pb2_grpc
+
+# --- Configuration ---
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+NS = os.getenv('X_NS', 'phx')
+# Must match the ingestor's windows (services/x-ingestor/trending.py)
+WINDOWS = {"5m": 300.0, "1h": 3600.0, "24h": 86400.0}
+SNAPSHOT_SIZE = int(os.getenv('TRENDING_SNAPSHOT_SIZE', '1000'))
+REFRESH_SECONDS = float(os.getenv('TRENDING_REFRESH_SECONDS', '0.5'))
+DEFAULT_K = 10
+MAX_K = 100
+# Cap on memoized responses per snapshot (prefixes are caller-controlled)
+MAX_MEMOIZED = 4096
+# ZSCAN batch for prefix lookups past the snapshot (the ingestor keeps <= 10k members)
+SCAN_COUNT = 1000
+
+# --- Snapshot Cache ---
+class SnapshotCache:
+    """
+    Holds the top SNAPSHOT_SIZE members of each window's ZSET in memory and
+    swaps in a fresh copy every REFRESH_SECONDS, so requests never touch Redis.
+    Built responses are memoized per (window, k, prefix) in a dict that
+    belongs to the snapshot they were built from, so a response computed
+    from the old snapshot can't land in the new one's memo.
+
+    A prefix with fewer than k matches in a full snapshot may have more
+    below it, so those requests ZSCAN the whole window (once per snapshot,
+    through the memo).
+    """
+    def __init__(self, rconn, ns: str = NS, size: int = SNAPSHOT_SIZE, interval: float = REFRESH_SECONDS):
+        self.rconn = rconn
+        self.size = size
+        self.interval = interval
+        self.keys = {name: f"{ns}:trending:z:{name}" for name in WINDOWS}
+        self.meta_key = f"{ns}:trending:meta"
+        # (members per window, refreshed_at, memoized responses, score decay per window),
+        # swapped as one reference
+        self._state = ({name: [] for name in WINDOWS}, 0.0, {}, {name: 1.0 for name in WINDOWS})
+
+    def refresh(self):
+        pipe = self.rconn.pipeline(transaction=False)
+        pipe.hmget(self.meta_key, list(WINDOWS))
+        for zkey in self.keys.values():
+            pipe.zrevrange(zkey, 0, self.size - 1, withscores=True)
+        epochs, *ranges = pipe.execute()
+        now = time.time()
+        snapshot, decays = {}, {}
+        for (name, tau), epoch, members in zip(WINDOWS.items(), epochs, ranges):
+            decay = decays[name] = math.exp(-(now - float(epoch)) / tau) if epoch else 1.0
+            snapshot[name] = [(member.decode("utf-8", "ignore"), score * decay) for member, score in members]
+        # Single reference swap; readers see either the old or the new state
+        self._state = (snapshot, now, {}, decays)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Trending snapshot refresh failed (serving stale data): {e}")
+
+    def _scan_prefix(self, window: str, prefix: str, k: int, decay: float):
+        """Top ``k`` members of the whole window ZSET starting with ``prefix``"""
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        found = [(member.decode("utf-8", "ignore"), score * decay)
+                 for member, score in self.rconn.zscan_iter(self.keys[window], match=pattern, count=SCAN_COUNT)]
+        found.sort(key=lambda m: -m[1])
+        return found[:k]
+
+    def top(self, window: str, k: int, prefix: str):
+        key = (window, k, prefix)
+        snapshot, refreshed_at, responses, decays = self._state
+        response = responses.get(key)
+        if response is None:
+            members = snapshot[window]
+            memoize = True
+            if prefix:
+                full = len(members) >= self.size
+                members = [m for m in members if m[0].startswith(prefix)]
+                if full and len(members) < k:
+                    try:
+                        members = self._scan_prefix(window, prefix, k, decays[window])
+                    except redis.RedisError as e:
+                        # Serve what the snapshot has; try Redis again on the next request
+                        logging.warning(f"Trending prefix scan failed (serving snapshot matches): {e}")
+                        memoize = False
+            response = trending_pb2.TopTrendsResponse(
+                window=window,
+                trends=[trending_pb2.Trend(keyword=kw, score=score) for kw, score in members[:k]],
+                snapshot_unix_ms=refreshed_at * 1000,
+            )
+            if memoize and len(responses) < MAX_MEMOIZED:
+                responses[key] = response
+        return response
+
+_cache = None
+
+# --- Trending Query Implementation ---
+class TrendingService(trending_pb2_grpc.TrendingServiceServicer):
+    """
+    The Trending Service answers "what's trending now" from an in-process snapshot.
+    """
+    def GetTopTrends(self, request, context):
+        window = request.window or "1h"
+        if window not in WINDOWS:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"window must be one of {', '.join(WINDOWS)}")
+        if request.k < 0:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "k must not be negative")
+        k = min(request.k or DEFAULT_K, MAX_K)
+        return _cache.top(window, k, request.prefix)
+
+def register(server):
+    trending_pb2_grpc.add_TrendingServiceServicer_to_server(TrendingService(), server)
+
+def warmup():
+    global _cache
+    _cache = SnapshotCache(redis.from_url(REDIS_URL))
+    _cache.refresh()
+    threading.Thread(target=_cache.run, name="trending-refresh", daemon=True).start()
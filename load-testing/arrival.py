@@ -0,0 +1,206 @@
+"""
+PROFITHACK AI - Open-Model Load Generation
+Arrival-rate schedules and coordinated-omission-safe latency recording.
+
+Closed-model users (think time between requests) slow down together with the
+system under test, so queueing delay never shows up in the numbers. Here every
+request gets an *intended* send time from a shared arrival schedule, and its
+latency is recorded from that intended time - if the generator falls behind,
+the backlog is charged to the system, not silently dropped.
+"""
+
+import math
+import time
+
+from hdrh.histogram import HdrHistogram
+
+# Latencies are recorded in microseconds, 1us .. 1h, 3 significant digits
+HDR_LOWEST_US = 1
+HDR_HIGHEST_US = 3_600_000_000
+HDR_SIGNIFICANT_DIGITS = 3
+
+# ============================================================================
+# Rate Profiles
+# ============================================================================
+
+def parse_duration(value) -> float:
+    """Converts locust-style durations ("90s", "10m", "1h", 30) to seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class RateProfile:
+    """Target arrivals/sec as a function of elapsed seconds"""
+
+    duration: float = 0.0
+
+    def rate(self, elapsed: float) -> float:
+        raise NotImplementedError
+
+    def peak(self) -> float:
+        raise NotImplementedError
+
+
+class ConstantRate(RateProfile):
+    def __init__(self, rate: float, duration: float):
+        self._rate = float(rate)
+        self.duration = float(duration)
+
+    def rate(self, elapsed: float) -> float:
+        return self._rate
+
+    def peak(self) -> float:
+        return self._rate
+
+
+class RampRate(RateProfile):
+    """Linear ramp from ``start`` to ``end`` over ``ramp`` seconds, then holds"""
+
+    def __init__(self, start: float, end: float, ramp: float, duration: float):
+        self.start, self.end = float(start), float(end)
+        self.ramp = float(ramp)
+        self.duration = float(duration)
+
+    def rate(self, elapsed: float) -> float:
+        if elapsed >= self.ramp or self.ramp <= 0:
+            return self.end
+        return self.start + (self.end - self.start) * elapsed / self.ramp
+
+    def peak(self) -> float:
+        return max(self.start, self.end)
+
+
+class StepRate(RateProfile):
+    """Sequence of ``(seconds, rate)`` plateaus"""
+
+    def __init__(self, steps: list[tuple[float, float]]):
+        self.steps = [(float(d), float(r)) for d, r in steps]
+        self.duration = sum(d for d, _ in self.steps)
+
+    def rate(self, elapsed: float) -> float:
+        for step_duration, step_rate in self.steps:
+            if elapsed < step_duration:
+                return step_rate
+            elapsed -= step_duration
+        return self.steps[-1][1] if self.steps else 0.0
+
+    def peak(self) -> float:
+        return max((r for _, r in self.steps), default=0.0)
+
+
+def build_profile(spec: dict) -> RateProfile:
+    """Builds a profile from a ``LoadTestConfig`` ``arrival`` block"""
+    kind = spec.get("profile", "constant")
+    if kind == "constant":
+        return ConstantRate(spec["rate"], parse_duration(spec["duration"]))
+    if kind == "ramp":
+        return RampRate(spec.get("start", 0), spec["rate"], parse_duration(spec["ramp"]),
+                        parse_duration(spec["duration"]))
+    if kind == "step":
+        return StepRate([(parse_duration(d), r) for d, r in spec["steps"]])
+    raise ValueError(f"Unknown arrival profile: {kind}")
+
+# ============================================================================
+# Arrival Schedule
+# ============================================================================
+
+class ArrivalSchedule:
+    """
+    Hands out intended send times following a rate profile. Shared by every
+    user in the process; users simply sleep until their slot. Slots are never
+    skipped, so a slow system accumulates visible lateness instead of having
+    its requests quietly spread out.
+    """
+
+    # While the profile rate is zero, look ahead in these increments
+    IDLE_STEP = 0.1
+
+    def __init__(self, profile: RateProfile, share: float = 1.0, start: float = None):
+        self.profile = profile
+        self.share = share
+        self.start = time.perf_counter() if start is None else start
+        self._next = self.start
+        self.issued = 0
+
+    def next_slot(self):
+        """Returns the next intended send time (perf_counter clock), or None when done"""
+        while True:
+            elapsed = self._next - self.start
+            if self.profile.duration and elapsed >= self.profile.duration:
+                return None
+            rate = self.profile.rate(elapsed) * self.share
+            if rate > 0:
+                slot = self._next
+                self._next += 1.0 / rate
+                self.issued += 1
+                return slot
+            self._next += self.IDLE_STEP
+
+
+def pool_size(profile: RateProfile, share: float = 1.0, headroom_seconds: float = 2.0, rate: float = None) -> int:
+    """
+    Users needed to sustain ``rate`` (default: the profile's peak) when each
+    request can take up to ``headroom_seconds``. Too few users turns the open
+    model back into a closed one, so err on the generous side.
+    """
+    rate = profile.peak() if rate is None else rate
+    return max(10, math.ceil(rate * share * headroom_seconds))
+
+# ============================================================================
+# Latency Recording
+# ============================================================================
+
+class LatencyRecorder:
+    """Per-request-name HDR histograms of latency measured from the intended send time"""
+
+    def __init__(self):
+        self.histograms: dict[str, HdrHistogram] = {}
+
+    def _histogram(self, name: str) -> HdrHistogram:
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = HdrHistogram(HDR_LOWEST_US, HDR_HIGHEST_US, HDR_SIGNIFICANT_DIGITS)
+            self.histograms[name] = hist
+        return hist
+
+    def record(self, name: str, latency_seconds: float):
+        us = min(max(int(latency_seconds * 1_000_000), HDR_LOWEST_US), HDR_HIGHEST_US)
+        self._histogram(name).record_value(us)
+        self._histogram("Aggregated").record_value(us)
+
+    def merge_encoded(self, name: str, encoded: bytes):
+        """Adds a histogram produced by ``encode()`` (e.g. from another process)"""
+        self._histogram(name).decode_and_add(encoded)
+
+    def encode(self) -> dict[str, bytes]:
+        return {name: hist.encode() for name, hist in self.histograms.items()}
+
+    def drain_encoded(self) -> dict[str, bytes]:
+        """``encode()`` of what was recorded since the last drain, then resets (worker -> master deltas)"""
+        out = {name: hist.encode() for name, hist in self.histograms.items() if hist.get_total_count()}
+        for hist in self.histograms.values():
+            hist.reset()
+        return out
+
+    def summary(self, percentiles=(50, 90, 95, 99, 99.9)) -> dict:
+        out = {}
+        for name, hist in sorted(self.histograms.items()):
+            out[name] = {
+                "count": hist.get_total_count(),
+                "max_ms": hist.get_max_value() / 1000.0,
+                **{f"p{p:g}_ms": hist.get_value_at_percentile(p) / 1000.0 for p in percentiles},
+            }
+        return out
+
+    def format_table(self) -> str:
+        rows = [f"{'Name':<45} {'count':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'p99.9':>9} {'max':>9}"]
+        for name, s in self.summary().items():
+            rows.append(
+                f"{name[:45]:<45} {s['count']:>9} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+                f"{s['p99_ms']:>9.1f} {s['p99.9_ms']:>9.1f} {s['max_ms']:>9.1f}"
+            )
+        return "\n".join(rows)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Diagnostics Overhead Benchmark
+Measures what phx_common/diagnostics.py costs a busy process: worker
+threads run a request-like loop (JSON decode/encode, hashing, small
+allocations) while the benchmark takes, in turn:
+  1. nothing (diagnostics installed but idle - the steady state)
+  2. a CPU profile at 100 Hz and at 1000 Hz
+  3. a heap capture (tracemalloc on for the window)
+  4. thread dumps, 10 per second
+and reports throughput in each window relative to the idle one.
+
+Usage:
+    python load-testing/diagnostics_overhead_bench.py --threads 8 --seconds 5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, ROOT)
+
+from phx_common import diagnostics
+
+PAYLOAD = json.dumps({"video_id": "v123", "user_id": "u42", "caption": "new drop " * 20,
+                      "tags": ["ai", "tools", "creator"] * 5})
+
+# ============================================================================
+# Workload
+# ============================================================================
+
+class Workload:
+    def __init__(self, threads: int):
+        self.counts = [0] * threads
+        self.stop = threading.Event()
+        self.threads = [threading.Thread(target=self._loop, args=(n,), name=f"handler-{n}", daemon=True)
+                        for n in range(threads)]
+
+    def _loop(self, n: int):
+        counts = self.counts
+        while not self.stop.is_set():
+            request = json.loads(PAYLOAD)
+            digest = hashlib.sha256(request["caption"].encode()).hexdigest()
+            words = [w.upper() for w in request["caption"].split()]
+            json.dumps({"id": request["video_id"], "digest": digest, "words": len(words)})
+            counts[n] += 1
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def measure(self, seconds: float, during=None) -> float:
+        """Requests per second while ``during`` (a blocking capture) runs, or idle"""
+        before, t0 = sum(self.counts), time.perf_counter()
+        if during is None:
+            time.sleep(seconds)
+        else:
+            during(seconds)
+        return (sum(self.counts) - before) / (time.perf_counter() - t0)
+
+
+def dumps(seconds: float):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        diagnostics.thread_dump()
+        time.sleep(0.1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput cost of diagnostics captures")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of each window")
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    diagnostics.start("diagnostics-bench")
+    work = Workload(args.threads)
+    work.start()
+    time.sleep(0.5)
+
+    windows = [
+        ("idle", None),
+        ("profile 100 Hz", lambda s: diagnostics.sample_stacks(s, 100)),
+        ("profile 1000 Hz", lambda s: diagnostics.sample_stacks(s, 1000)),
+        ("heap (tracemalloc)", lambda s: diagnostics.heap_report(s)),
+        ("thread dumps 10/s", dumps),
+        ("idle again", None),
+    ]
+    results = {}
+    print(f"{args.threads} handler threads, {args.seconds:g}s per window\n")
+    print(f"  {'window':<20}{'req/s':>12}{'vs idle':>9}")
+    for name, during in windows:
+        rate = work.measure(args.seconds, during)
+        base = results.get("idle", {}).get("per_second", rate)
+        results[name] = {"per_second": rate, "relative": rate / base}
+        print(f"  {name:<20}{rate:>12,.0f}{rate / base:>8.2f}x")
+    work.stop.set()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"diagnostics-overhead-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "diagnostics_overhead", "args": vars(args), "windows": results}, f, indent=2)
+    print(f"\nResults: {out}")
+
+
+if __name__ == "__main__":
+    main()
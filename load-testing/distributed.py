@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Distributed Locust Launcher
+One locust process tops out around a few thousand users; the 100k-user
+stress scenario needs many. This starts a locust master plus one worker per
+core on this machine and, with --hosts, one per core on other machines over
+ssh (each needs this repository at --remote-dir and locust installed).
+
+Locust sums the request stats of all workers on the master. The HDR
+latency histograms from load_test.py are merged the same way: each worker
+ships what it recorded since its last report and the master adds them, so
+percentiles are over every request, not an average of per-worker
+percentiles. In the open model each worker generates 1/N of the arrival
+rate.
+
+Usage:
+    python load-testing/distributed.py run --scenario stress --host http://api:5000
+    python load-testing/distributed.py run --scenario stress --host http://api:5000 \\
+        --hosts lg1,lg2,lg3 --remote-dir /srv/profithack --master-advertise 10.0.0.5
+    python load-testing/distributed.py worker --master-host 10.0.0.5    # by hand on an extra machine
+"""
+
+import argparse
+import os
+import resource
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCUSTFILE = os.path.join(ROOT, "load-testing", "load_test.py")
+sys.path.insert(0, os.path.join(ROOT, "load-testing"))
+
+# Passed through to every worker, local or remote
+FORWARDED_ENV = ("LOAD_MODEL", "LOAD_SCENARIO", "OPEN_POOL_HEADROOM", "UPLOAD_BYTES")
+
+
+def locust_cmd(*args) -> list:
+    return [sys.executable, "-m", "locust", "-f", LOCUSTFILE, *args]
+
+
+def processes(value: str, reserve: int = 0) -> int:
+    """"auto" = one per core (minus ``reserve`` for the master), else the number given"""
+    if value == "auto":
+        return max(1, (os.cpu_count() or 1) - reserve)
+    return int(value)
+
+
+def raise_fd_limit():
+    # Every simulated user holds a socket; workers inherit the raised soft limit
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def spawn_workers(count: int, master_host: str, master_port: int, env: dict) -> list:
+    return [subprocess.Popen(locust_cmd("--worker", "--master-host", master_host, "--master-port", str(master_port)),
+                             env=env) for _ in range(count)]
+
+
+def stop(procs: list, grace: float = 10.0):
+    for proc in procs:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    for proc in procs:
+        try:
+            proc.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def forward_signals(target):
+    def handler(signum, _frame):
+        target(signum)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handler)
+
+# ============================================================================
+# Remote Hosts
+# ============================================================================
+
+def ssh(host: str, command: str, tty: bool = False, **kwargs):
+    # -tt: closing the session hangs up the remote workers when the run ends
+    args = ["ssh", "-o", "BatchMode=yes", *(["-tt"] if tty else []), host, command]
+    return subprocess.Popen(args, **kwargs)
+
+
+def remote_cores(host: str) -> int:
+    out, _ = ssh(host, "nproc", stdout=subprocess.PIPE, text=True).communicate(timeout=30)
+    return int(out.strip())
+
+
+def remote_worker_cmd(args, count: int) -> str:
+    env = " ".join(f"{k}={shlex.quote(os.environ[k])}" for k in FORWARDED_ENV if k in os.environ)
+    return (f"cd {shlex.quote(args.remote_dir)} && {env} {args.remote_python} load-testing/distributed.py worker "
+            f"--master-host {shlex.quote(args.master_advertise)} --master-port {args.master_port} "
+            f"--processes {count}")
+
+# ============================================================================
+# Commands
+# ============================================================================
+
+def run(args) -> int:
+    env = dict(os.environ)
+    options = []
+    if args.scenario:
+        from load_test import LoadTestConfig
+        config = LoadTestConfig.get(args.scenario)
+        if config is None:
+            sys.exit(f"unknown scenario: {args.scenario}")
+        env["LOAD_SCENARIO"] = os.environ["LOAD_SCENARIO"] = args.scenario
+        options += ["--users", str(args.users or config["users"]),
+                    "--spawn-rate", str(args.spawn_rate or config["spawn_rate"]),
+                    "--run-time", args.run_time or config["duration"]]
+    elif args.users:
+        options += ["--users", str(args.users), "--spawn-rate", str(args.spawn_rate or args.users),
+                    *(["--run-time", args.run_time] if args.run_time else [])]
+    if args.host:
+        options += ["--host", args.host]
+    if not args.web:
+        options += ["--headless"]
+
+    local = processes(args.workers, reserve=1)
+    hosts = [h for h in (args.hosts or "").split(",") if h]
+    per_host = {h: remote_cores(h) if args.workers_per_host == "auto" else int(args.workers_per_host) for h in hosts}
+    expected = local + sum(per_host.values())
+
+    raise_fd_limit()
+    master = subprocess.Popen(locust_cmd("--master", "--master-bind-port", str(args.master_port),
+                                         "--expect-workers", str(expected),
+                                         "--expect-workers-max-wait", str(args.expect_wait),
+                                         *options, *args.locust_args), env=env)
+    workers = spawn_workers(local, "127.0.0.1", args.master_port, env)
+    remotes = [ssh(h, remote_worker_cmd(args, n), tty=True, stdin=subprocess.DEVNULL) for h, n in per_host.items()]
+    print(f"[distributed] master pid {master.pid}, {local} local workers"
+          + "".join(f", {n} on {h}" for h, n in per_host.items()) + f" ({expected} total)", flush=True)
+
+    # The master stops its workers when the run ends; a signal here stops the master first
+    def to_master(signum):
+        if master.poll() is None:
+            master.send_signal(signum)
+
+    forward_signals(to_master)
+    code = master.wait()
+    stop(workers + remotes)
+    return code
+
+
+def worker(args) -> int:
+    count = processes(args.processes)
+    raise_fd_limit()
+    procs = spawn_workers(count, args.master_host, args.master_port, dict(os.environ))
+    print(f"[distributed] {count} workers on {socket.gethostname()} -> {args.master_host}:{args.master_port}",
+          flush=True)
+    forward_signals(lambda signum: stop(procs))
+    codes = [p.wait() for p in procs]
+    return max(codes, default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Locust master + per-core workers, locally or across hosts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="start the master and its workers",
+                           epilog="arguments after -- are passed to the locust master")
+    p_run.add_argument("--scenario", help="smoke | stress | endurance (users, spawn rate, duration)")
+    p_run.add_argument("--host", help="target base URL")
+    p_run.add_argument("--users", type=int, help="override the scenario's user count")
+    p_run.add_argument("--spawn-rate", type=float)
+    p_run.add_argument("--run-time")
+    p_run.add_argument("--workers", default="auto", help="local workers; auto = cores - 1")
+    p_run.add_argument("--hosts", help="comma list of ssh hosts to start more workers on")
+    p_run.add_argument("--workers-per-host", default="auto", help="auto = the host's core count")
+    p_run.add_argument("--remote-dir", default=ROOT, help="repository path on the remote hosts")
+    p_run.add_argument("--remote-python", default="python3")
+    p_run.add_argument("--master-advertise", default=socket.getfqdn(), help="address remote workers connect to")
+    p_run.add_argument("--master-port", type=int, default=5557)
+    p_run.add_argument("--expect-wait", type=int, default=120, help="seconds to wait for all workers")
+    p_run.add_argument("--web", action="store_true", help="web UI instead of --headless")
+    p_run.add_argument("locust_args", nargs=argparse.REMAINDER)
+
+    p_worker = sub.add_parser("worker", help="start workers for a master elsewhere")
+    p_worker.add_argument("--master-host", required=True)
+    p_worker.add_argument("--master-port", type=int, default=5557)
+    p_worker.add_argument("--processes", default="auto", help="auto = one per core")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if args.locust_args[:1] == ["--"]:
+            args.locust_args = args.locust_args[1:]
+        return run(args)
+    return worker(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Local Stand-in Backend
+Fake API server + fake X filtered stream so the load test, the X ingestor and
+the agent worker can be benchmarked end-to-end on one box with no network.
+
+Usage:
+    python load-testing/fake_backend.py --port 5000 --workers 4 \\
+        --latency default=lognormal:1.0:0.5 \\
+        --latency /api/videos/upload=uniform:20:80 \\
+        --error-rate 0.01 --stream-rate 500
+
+Then point the load test at http://localhost:5000 and the ingestor at it with
+X_API_BASE=http://localhost:5000 X_BEARER_TOKEN=fake.
+
+Latency specs (milliseconds):
+    const:<ms>                 fixed delay
+    uniform:<lo>:<hi>          uniform between lo and hi
+    exp:<mean>                 exponential with the given mean
+    lognormal:<mu>:<sigma>     exp(N(mu, sigma)) - long right tail
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+
+from aiohttp import web
+
+from synthetic import synthetic_tweet
+
+# ============================================================================
+# Latency / Error Model
+# ============================================================================
+
+class LatencyModel:
+    """Samples an artificial service delay (in seconds) from a parsed spec"""
+
+    def __init__(self, spec: str = "const:0"):
+        self.spec = spec
+        kind, *args = spec.split(":")
+        args = [float(a) for a in args]
+        if kind == "const":
+            self._sample = lambda: args[0]
+        elif kind == "uniform":
+            lo, hi = args
+            self._sample = lambda: random.uniform(lo, hi)
+        elif kind == "exp":
+            (mean,) = args
+            self._sample = lambda: random.expovariate(1.0 / mean) if mean > 0 else 0.0
+        elif kind == "lognormal":
+            mu, sigma = args
+            self._sample = lambda: random.lognormvariate(mu, sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        return max(self._sample(), 0.0) / 1000.0
+
+
+class RouteBehaviour:
+    """Latency + error injection applied to one route (or the default)"""
+
+    def __init__(self, latency: LatencyModel, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    async def apply(self):
+        delay = self.latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.error_rate and random.random() < self.error_rate
+
+
+def parse_overrides(items: list[str]) -> dict[str, str]:
+    """Parses repeated ``route=value`` flags into a dict"""
+    overrides = {}
+    for item in items or []:
+        route, _, value = item.partition("=")
+        if not value:
+            raise ValueError(f"Expected ROUTE=VALUE, got: {item}")
+        overrides[route] = value
+    return overrides
+
+
+def build_behaviours(latency: list[str], errors: list[str], default_error_rate: float) -> dict:
+    latency_specs = parse_overrides(latency)
+    error_specs = {k: float(v) for k, v in parse_overrides(errors).items()}
+    routes = set(latency_specs) | set(error_specs) | {"default"}
+    default_latency = latency_specs.get("default", "const:0")
+    default_errors = error_specs.get("default", default_error_rate)
+    return {
+        route: RouteBehaviour(
+            LatencyModel(latency_specs.get(route, default_latency)),
+            error_specs.get(route, default_errors),
+        )
+        for route in routes
+    }
+
+# ============================================================================
+# Canned Responses (serialized once, reused for every request)
+# ============================================================================
+
+def _json_bytes(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+VIDEO_FEED = _json_bytes([
+    {"id": f"video-{i}", "title": f"Video {i}", "views": 1000 + i, "category": "reels"}
+    for i in range(20)
+])
+XAI_RECOMMENDATIONS = _json_bytes({
+    "recommendations": [
+        {"videoId": f"video-{i}", "score": round(0.99 - i * 0.01, 2), "explanation": "similar creators"}
+        for i in range(20)
+    ]
+})
+LOGIN_OK = _json_bytes({"userId": "loadtest-user", "token": "fake-session-token"})
+OK = _json_bytes({"ok": True})
+ACCEPTED = _json_bytes({"ok": True, "jobId": "fake-job"})
+SERVER_ERROR = _json_bytes({"error": "injected failure"})
+
+# ============================================================================
+# Handlers
+# ============================================================================
+
+def _behaviour(request: web.Request) -> RouteBehaviour:
+    behaviours = request.app["behaviours"]
+    route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+    return behaviours.get(route) or behaviours["default"]
+
+
+def canned(body: bytes, status: int = 200):
+    async def handler(request: web.Request) -> web.Response:
+        if request.can_read_body:
+            await request.read()
+        if await _behaviour(request).apply():
+            return web.Response(body=SERVER_ERROR, status=500, content_type="application/json")
+        return web.Response(body=body, status=status, content_type="application/json")
+    return handler
+
+
+async def stream_rules(request: web.Request) -> web.Response:
+    rules = request.app["rules"]
+    if request.method == "GET":
+        return web.json_response({"data": list(rules.values()), "meta": {"result_count": len(rules)}})
+    body = await request.json()
+    for rule_id in body.get("delete", {}).get("ids", []):
+        rules.pop(rule_id, None)
+    for rule in body.get("add", []):
+        # Numeric string like X's rule ids, unique across workers
+        rule_id = str(uuid.uuid4().int >> 65)
+        rules[rule_id] = {"id": rule_id, **rule}
+    return web.json_response({"meta": {"summary": {"created": len(body.get("add", []))}}})
+
+
+async def tweet_stream(request: web.Request) -> web.StreamResponse:
+    """
+    NDJSON filtered stream. Emits ``--stream-rate`` tweets/sec in small
+    bursts, with a keep-alive newline when idle, until ``--stream-limit``.
+    """
+    cfg = request.app["stream"]
+    behaviour = _behaviour(request)
+    if await behaviour.apply():
+        return web.Response(body=SERVER_ERROR, status=503, content_type="application/json")
+    resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+    await resp.prepare(request)
+
+    rate, limit = cfg["rate"], cfg["limit"]
+    rules = list(request.app["rules"].values()) or [{"id": "1", "tag": "ai"}]
+    rng = random.Random()
+    interval = 0.01
+    sent, start = 0, time.monotonic()
+    while not limit or sent < limit:
+        due = int((time.monotonic() - start) * rate) if rate else sent + 100
+        if limit:
+            due = min(due, limit)
+        if due <= sent:
+            await resp.write(b"\r\n")
+            await asyncio.sleep(interval)
+            continue
+        chunk = []
+        for seq in range(sent, due):
+            event = synthetic_tweet(seq + cfg["seq_offset"], rng)
+            event["matching_rules"] = [rng.choice(rules)]
+            chunk.append(_json_bytes(event))
+        sent = due
+        await resp.write(b"\r\n".join(chunk) + b"\r\n")
+        if rate:
+            await asyncio.sleep(interval)
+    await resp.write_eof()
+    return resp
+
+# ============================================================================
+# App Factory
+# ============================================================================
+
+def create_app(behaviours: dict, stream_rate: float = 100.0, stream_limit: int = 0,
+               rules=None) -> web.Application:
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app["behaviours"] = behaviours
+    # Stream rules; with several workers a manager dict shared by all of them
+    app["rules"] = {} if rules is None else rules
+    app["stream"] = {"rate": stream_rate, "limit": stream_limit, "seq_offset": os.getpid() * 10_000_000}
+    app.router.add_post("/api/auth/login", canned(LOGIN_OK))
+    app.router.add_get("/api/videos", canned(VIDEO_FEED))
+    app.router.add_post("/api/videos/upload", canned(ACCEPTED, status=202))
+    app.router.add_post("/api/videos/{video_id}/like", canned(OK))
+    app.router.add_get("/api/recommendations/xai", canned(XAI_RECOMMENDATIONS))
+    app.router.add_post("/api/dating/swipe", canned(OK))
+    app.router.add_post("/api/messages", canned(OK, status=201))
+    app.router.add_post("/api/payments/subscribe", canned(OK))
+    app.router.add_get("/2/tweets/search/stream", tweet_stream)
+    app.router.add_route("*", "/2/tweets/search/stream/rules", stream_rules)
+    return app
+
+
+def _run_worker(args, rules=None):
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    behaviours = build_behaviours(args.latency, args.errors, args.error_rate)
+    app = create_app(behaviours, args.stream_rate, args.stream_limit, rules)
+    web.run_app(
+        app,
+        host=args.host,
+        port=args.port,
+        reuse_port=args.workers > 1,
+        access_log=None,
+        print=None if args.workers > 1 else print,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PROFITHACK AI local stand-in backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--latency", action="append", default=[], metavar="ROUTE=SPEC",
+                        help="latency distribution, e.g. default=exp:2 or /api/videos=const:1")
+    parser.add_argument("--errors", action="append", default=[], metavar="ROUTE=RATE",
+                        help="per-route error rate, e.g. /api/dating/swipe=0.05")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="default error rate for all routes")
+    parser.add_argument("--stream-rate", type=float, default=100.0, help="tweets/sec per stream connection (0 = unthrottled)")
+    parser.add_argument("--stream-limit", type=int, default=0, help="close the stream after N tweets (0 = never)")
+    args = parser.parse_args(argv)
+
+    # Validate specs before forking so a typo fails loudly once
+    build_behaviours(args.latency, args.errors, args.error_rate)
+
+    print(f"🧪 Fake backend on http://{args.host}:{args.port} ({args.workers} worker(s))")
+    if args.workers <= 1:
+        _run_worker(args)
+        return
+
+    # Created before forking so a rule POSTed to one worker is streamed by all of them.
+    # The parent never touches the proxy; each child opens its own manager connection.
+    manager = multiprocessing.Manager()
+    rules = manager.dict()
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(args, rules)
+            os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, 15)
+            except ProcessLookupError:
+                pass
+    finally:
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Multi-process gRPC Scaling Benchmark
+Measures Moderation AnalyzeVideo throughput as the number of SO_REUSEPORT
+server processes grows (PHX_PROCESSES = 1, 2, 4, ... cores).
+
+Each client process opens its own channel (its own TCP connection), so the
+kernel spreads connections across the server processes.
+
+Usage:
+    python load-testing/grpc_scaling_bench.py --processes 1 2 4 8 --duration 15
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRPC_SERVICES_DIR = os.path.join(ROOT, "grpc_services")
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path[:0] = [ROOT, GRPC_SERVICES_DIR]
+
+CAPTIONS = [
+    "My morning routine as a creator #ai",
+    "exclusive drop on onlyfans tonight",
+    "hi",
+    "Sora made this whole clip from one prompt, thoughts?",
+]
+
+
+def client_worker(target: str, threads: int, duration: float, results):
+    import threading
+    import grpc
+    import moderation_service.moderation_pb2 as mod_pb2
+    import moderation_service.moderation_pb2_grpc as mod_pb2_grpc
+
+    channel = grpc.insecure_channel(target, options=[("grpc.use_local_subchannel_pool", 1)])
+    stub = mod_pb2_grpc.ModerationServiceStub(channel)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def loop(idx: int):
+        nonlocal errors
+        local, local_errors, n = [], 0, 0
+        while time.perf_counter() < deadline:
+            req = mod_pb2.AnalyzeVideoRequest(video_id=f"v-{idx}-{n}", user_id="bench",
+                                              caption=CAPTIONS[n % len(CAPTIONS)])
+            start = time.perf_counter()
+            try:
+                stub.AnalyzeVideo(req, timeout=5)
+                local.append(time.perf_counter() - start)
+            except grpc.RpcError:
+                local_errors += 1
+            n += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    channel.close()
+    results.put((latencies, errors))
+
+
+def wait_ready(target: str, processes: int, timeout: float = 30.0):
+    """Waits until enough distinct connections see SERVING to cover every worker"""
+    import grpc
+    from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+    deadline = time.monotonic() + timeout
+    ok = 0
+    while ok < processes * 4:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{target} not ready after {timeout}s")
+        channel = grpc.insecure_channel(target, options=[("grpc.use_local_subchannel_pool", 1)])
+        try:
+            resp = health_pb2_grpc.HealthStub(channel).Check(health_pb2.HealthCheckRequest(), timeout=0.5)
+            ok = ok + 1 if resp.status == health_pb2.HealthCheckResponse.SERVING else 0
+        except grpc.RpcError:
+            ok = 0
+            time.sleep(0.1)
+        finally:
+            channel.close()
+
+
+def run_level(processes: int, args) -> dict:
+    env = dict(os.environ, PHX_PROCESSES=str(processes), PYTHONPATH=os.pathsep.join([ROOT, GRPC_SERVICES_DIR]))
+    server = subprocess.Popen([sys.executable, "-m", "moderation_service.main"], cwd=GRPC_SERVICES_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(args.target, processes)
+        # spawn, not fork: this process already has grpc threads running
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        clients = [ctx.Process(target=client_worker, args=(args.target, args.threads, args.duration, results))
+                   for _ in range(args.clients)]
+        for c in clients:
+            c.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            lat, err = results.get()
+            latencies.extend(lat)
+            errors += err
+        for c in clients:
+            c.join()
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    latencies.sort()
+    pick = lambda p: latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "processes": processes,
+        "rps": len(latencies) / args.duration,
+        "errors": errors,
+        "p50_ms": pick(50),
+        "p99_ms": pick(99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Moderation throughput vs. server processes")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, default=16, help="concurrent RPCs per client process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--target", default="localhost:50057")
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    levels = [run_level(n, args) for n in args.processes]
+    base = levels[0]["rps"] or 1.0
+    print(f"{'procs':>6} {'rps':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for lvl in levels:
+        lvl["speedup"] = lvl["rps"] / base
+        print(f"{lvl['processes']:>6} {lvl['rps']:>10.0f} {lvl['speedup']:>7.2f}x "
+              f"{lvl['p50_ms']:>8.1f} {lvl['p99_ms']:>8.1f} {lvl['errors']:>7}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"grpc-scaling-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "moderation_prefork_scaling", "cpu_count": os.cpu_count(),
+                   "clients": args.clients, "threads": args.threads, "levels": levels}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
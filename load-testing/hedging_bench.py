@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Inter-Service Call Benchmark (deadlines, hedging, breaker)
+Runs a fake Sora gRPC server in-process with injected slowness and drives it
+through phx_common.calls.Caller:
+  1. tail latency with a slow fraction of calls, plain vs hedged
+  2. an outage window where Sora hangs then fails, with and without the
+     circuit breaker: how long callers stay blocked and how many calls
+     still reach the sick server
+
+Usage:
+    python load-testing/hedging_bench.py --calls 2000 --slow-fraction 0.03 --slow-ms 300
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent import futures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRPC_SERVICES_DIR = os.path.join(ROOT, "grpc_services")
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path[:0] = [ROOT, GRPC_SERVICES_DIR]
+
+import grpc
+import sora_service.sora_pb2 as sora_pb2
+import sora_service.sora_pb2_grpc as sora_pb2_grpc
+
+from phx_common.calls import Caller, CircuitBreaker
+
+# ============================================================================
+# Fake Sora
+# ============================================================================
+
+class FakeSora(sora_pb2_grpc.SoraServiceServicer):
+    """GenerateVideo with lognormal latency, a slow fraction and an outage switch"""
+
+    def __init__(self, base_ms: float, slow_fraction: float, slow_ms: float):
+        self.base_ms = base_ms
+        self.slow_fraction = slow_fraction
+        self.slow_ms = slow_ms
+        self.outage = threading.Event()
+        self.outage_hang = 1.0
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def GenerateVideo(self, request, context):
+        with self._lock:
+            self.received += 1
+        if self.outage.is_set():
+            time.sleep(self.outage_hang)
+            context.abort(grpc.StatusCode.UNAVAILABLE, "injected outage")
+        delay = random.lognormvariate(0, 0.3) * self.base_ms
+        if random.random() < self.slow_fraction:
+            delay += self.slow_ms
+        time.sleep(delay / 1000.0)
+        return sora_pb2.GenerateVideoResponse(job_id=f"FAKE-{request.prompt}", status="PENDING")
+
+
+def start_fake(fake: FakeSora, port: int):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=128))
+    sora_pb2_grpc.add_SoraServiceServicer_to_server(fake, server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server
+
+# ============================================================================
+# Load
+# ============================================================================
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000 if values else 0.0
+
+
+def drive(caller: Caller, stub, calls: int, concurrency: int, on_progress=None):
+    """Runs ``calls`` calls over ``concurrency`` threads; returns (latency, ok) per call"""
+    samples, lock = [], threading.Lock()
+    counter = iter(range(calls))
+
+    def loop():
+        local = []
+        for n in counter:
+            if on_progress:
+                on_progress(n)
+            req = sora_pb2.GenerateVideoRequest(user_id="bench", prompt=f"bench {n}", duration_seconds=5)
+            start = time.perf_counter()
+            try:
+                caller.call(stub.GenerateVideo, req)
+                local.append((time.perf_counter() - start, True))
+            except grpc.RpcError:
+                local.append((time.perf_counter() - start, False))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def tail_scenario(name: str, stub, fake: FakeSora, args, hedge: bool) -> dict:
+    caller = Caller(name, timeout=args.timeout, hedge=hedge, hedge_budget=args.hedge_budget,
+                    breaker=CircuitBreaker(name, min_calls=10 ** 9))
+    received = fake.received
+    samples = drive(caller, stub, args.calls, args.concurrency)
+    lat = [s[0] for s in samples if s[1]]
+    return {
+        "name": name,
+        "p50_ms": pct(lat, 50), "p95_ms": pct(lat, 95), "p99_ms": pct(lat, 99), "p999_ms": pct(lat, 99.9),
+        "max_ms": max(lat, default=0.0) * 1000,
+        "errors": sum(1 for s in samples if not s[1]),
+        # Load amplification from hedging
+        "server_calls_per_call": (fake.received - received) / max(args.calls, 1),
+        **caller.stats,
+    }
+
+
+def outage_scenario(name: str, stub, fake: FakeSora, args, breaker: bool) -> dict:
+    caller = Caller(name, timeout=args.timeout, hedge=False,
+                    breaker=CircuitBreaker(name, min_calls=10 if breaker else 10 ** 9, open_seconds=1.0))
+    third = args.calls // 3
+
+    def toggle(n):
+        # Sora is sick for the middle third of the run
+        if n == third:
+            fake.outage.set()
+        elif n == 2 * third:
+            fake.outage.clear()
+
+    received = fake.received
+    start = time.perf_counter()
+    samples = drive(caller, stub, args.calls, args.concurrency, on_progress=toggle)
+    fake.outage.clear()
+    failed = [s[0] for s in samples if not s[1]]
+    return {
+        "name": name,
+        "wall_s": time.perf_counter() - start,
+        "failed_calls": len(failed),
+        # Thread-seconds callers spent waiting on calls that failed anyway
+        "blocked_s": sum(failed),
+        "failed_p50_ms": pct(failed, 50),
+        "server_calls": fake.received - received,
+        **caller.stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deadlines, hedging and circuit breaking against a fake Sora")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--base-ms", type=float, default=5.0, help="median fake Sora latency")
+    parser.add_argument("--slow-fraction", type=float, default=0.03, help="share of calls that stall")
+    parser.add_argument("--slow-ms", type=float, default=300.0, help="extra delay of a stalled call")
+    parser.add_argument("--timeout", type=float, default=2.0, help="per-call deadline (s)")
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=50255)
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    fake = FakeSora(args.base_ms, args.slow_fraction, args.slow_ms)
+    server = start_fake(fake, args.port)
+    channel = grpc.insecure_channel(f"127.0.0.1:{args.port}")
+    stub = sora_pb2_grpc.SoraServiceStub(channel)
+    try:
+        tail = [
+            tail_scenario("plain", stub, fake, args, hedge=False),
+            tail_scenario("hedged", stub, fake, args, hedge=True),
+        ]
+        outage = [
+            outage_scenario("no breaker", stub, fake, args, breaker=False),
+            outage_scenario("breaker", stub, fake, args, breaker=True),
+        ]
+    finally:
+        channel.close()
+        server.stop(0)
+
+    print(f"{args.calls} calls x {args.concurrency} threads, {args.slow_fraction:.0%} stall +{args.slow_ms:.0f}ms")
+    print(f"{'scenario':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'load':>6} {'hedges':>7} {'wins':>6}")
+    for r in tail:
+        print(f"{r['name']:<10} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['p999_ms']:>9.1f} "
+              f"{r['server_calls_per_call']:>5.2f}x {r['hedges']:>7} {r['hedge_wins']:>6}")
+    print(f"{'outage':<10} {'failed':>8} {'blocked s':>10} {'server calls':>13} {'fast-failed':>12}")
+    for r in outage:
+        print(f"{r['name']:<10} {r['failed_calls']:>8} {r['blocked_s']:>10.1f} {r['server_calls']:>13} "
+              f"{r['rejected_open']:>12}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"hedging-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "inter_service_calls", "args": vars(args), "tail": tail, "outage": outage}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Agent Model Stage Benchmark
+Feeds a retweet-heavy synthetic stream through workers/agent/stage.py with the
+deterministic FakeModel and reports how many model items/calls each layer
+saves per 10k tweets:
+  1. no cache      (one model item per tweet, batched)
+  2. exact cache   (normalised-text hash, in-process LRU)
+  3. + near-dups   (SimHash collapse)
+  4. + Redis tier  (--redis-url; --workers stages sharing one Redis)
+
+Usage:
+    python load-testing/llm_stage_bench.py --count 10000 --dup-rate 0.6
+    python load-testing/llm_stage_bench.py --workers 4 --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, os.path.join(ROOT, "workers", "agent"))
+
+from stage import FakeModel, ProcessingStage
+from synthetic import TWEET_WORDS, synthetic_tweet
+
+# ============================================================================
+# Retweet-heavy stream
+# ============================================================================
+
+def variant(text: str, rng: random.Random) -> str:
+    """Same tweet as it shows up again: RT, new link, emoji, or one extra word"""
+    kind = rng.random()
+    if kind < 0.5:
+        return f"RT @user{rng.randint(1000, 5999)}: {text}"
+    if kind < 0.7:
+        return f"{text} https://t.co/{rng.getrandbits(40):x}"
+    if kind < 0.85:
+        return f"{text} {rng.choice(['🔥', '!!', '💯', '👀'])}"
+    return f"{text} {rng.choice(TWEET_WORDS)}"
+
+
+def build_stream(count: int, dup_rate: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    originals, texts = [], []
+    for seq in range(count):
+        if originals and rng.random() < dup_rate:
+            # Popular tweets get reshared far more (Pareto over recent originals)
+            idx = max(0, len(originals) - int(rng.paretovariate(1.2)))
+            texts.append(variant(originals[idx], rng))
+        else:
+            text = synthetic_tweet(seq, rng)["data"]["text"]
+            originals.append(text)
+            texts.append(text)
+    return texts
+
+# ============================================================================
+# Runs
+# ============================================================================
+
+def run_uncached(texts: list[str], batch: int) -> dict:
+    """The stage-less baseline: every tweet goes to the model"""
+    model = FakeModel()
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        model.generate(texts[i:i + batch])
+    per_10k = 10000 / max(len(texts), 1)
+    return {"name": "no cache", "workers": 1, "seconds": time.perf_counter() - start,
+            "model_items_per_10k": model.items * per_10k, "model_calls_per_10k": model.calls * per_10k,
+            "items": len(texts), "model_items": model.items, "model_calls": model.calls, "near_dups": 0}
+
+
+def run_stages(name: str, texts: list[str], batch: int, workers: int = 1, **stage_kwargs) -> dict:
+    models = [FakeModel() for _ in range(workers)]
+    stages = [ProcessingStage(m, batch_size=batch, **stage_kwargs) for m in models]
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        # Batches are dealt round-robin, like workers popping one shared queue
+        stages[(i // batch) % workers].run(texts[i:i + batch])
+    elapsed = time.perf_counter() - start
+    totals = {k: sum(s.stats[k] for s in stages) for k in stages[0].stats}
+    per_10k = 10000 / max(len(texts), 1)
+    return {"name": name, "workers": workers, "seconds": elapsed,
+            "model_items_per_10k": totals["model_items"] * per_10k,
+            "model_calls_per_10k": totals["model_calls"] * per_10k, **totals}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agent model stage: model calls saved by caching and dedupe")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--dup-rate", type=float, default=0.6, help="share of tweets that reshare an earlier one")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=2, help="stages sharing the Redis tier")
+    parser.add_argument("--redis-url", help="enable the Redis tier run")
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    texts = build_stream(args.count, args.dup_rate, args.seed)
+    results = [
+        run_uncached(texts, args.batch),
+        run_stages("exact cache", texts, args.batch, near_dup_distance=-1),
+        run_stages("exact + near-dup", texts, args.batch),
+        run_stages(f"{args.workers} workers, LRU only", texts, args.batch, workers=args.workers),
+    ]
+    if args.redis_url:
+        import redis
+        r = redis.from_url(args.redis_url)
+        prefix = f"bench-{int(time.time())}:agent:out"
+        results.append(run_stages(f"{args.workers} workers + Redis", texts, args.batch, workers=args.workers,
+                                  redis=r, redis_prefix=prefix))
+        for key in r.scan_iter(f"{prefix}:*", count=1000):
+            r.delete(key)
+
+    baseline = results[0]
+    print(f"{len(texts):,} tweets, dup rate {args.dup_rate:.0%}, batch {args.batch}")
+    print(f"{'variant':<26} {'items/10k':>10} {'calls/10k':>10} {'saved/10k':>10} {'near-dups':>10}")
+    for r_ in results:
+        saved = baseline["model_items_per_10k"] - r_["model_items_per_10k"]
+        r_["items_saved_per_10k"] = saved
+        print(f"{r_['name']:<26} {r_['model_items_per_10k']:>10,.0f} {r_['model_calls_per_10k']:>10,.0f} "
+              f"{saved:>10,.0f} {r_['near_dups']:>10,}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"llm-stage-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "agent_model_stage", "count": len(texts), "dup_rate": args.dup_rate,
+                   "batch": args.batch, "results": results}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,22 +7,45 @@ Target: 50,000 req/sec feed service, sub-50ms latency
 Test Duration: 10 minutes ramping to 100,000 concurrent users
 """
 
+import os
 import time
 import random
 import json
 import asyncio
 import aiohttp
 import grpc
-from locust import HttpUser, task, between, events
+from locust import HttpUser, LoadTestShape, task, between, events
 from locust.env import Environment
+from locust.exception import StopUser
 from locust.stats import stats_printer, stats_history
 from locust.log import setup_logging
+from locust.runners import MasterRunner, WorkerRunner
 import sys
 
+from arrival import ArrivalSchedule, LatencyRecorder, build_profile, pool_size
+
 # Configuration
 API_BASE_URL = "http://localhost:5000"
 GRPC_HOST = "localhost:50051"
 
+# "closed" = think-time users (default), "open" = arrival-rate driven users
+LOAD_MODEL = os.getenv("LOAD_MODEL", "closed")
+LOAD_SCENARIO = os.getenv("LOAD_SCENARIO", "smoke")
+# Seconds of latency the open-model user pool can absorb at peak rate
+OPEN_POOL_HEADROOM = float(os.getenv("OPEN_POOL_HEADROOM", "2.0"))
+# The open-model pool grows with the profile, sized for the rate this far ahead
+OPEN_POOL_LOOKAHEAD = float(os.getenv("OPEN_POOL_LOOKAHEAD", "10"))
+HDR_REPORT_PATH = os.getenv("HDR_REPORT_PATH", "load-test-hdr.json")
+# Upload flow body size; the multipart body is built once and sent as-is by every upload
+UPLOAD_BYTES = int(os.getenv("UPLOAD_BYTES", "15000"))
+UPLOAD_BOUNDARY = "phx-load-test-boundary"
+_UPLOAD_VIDEO = (b"fake-video-data" * (UPLOAD_BYTES // 15 + 1))[:UPLOAD_BYTES]
+UPLOAD_BODY = (
+    f"--{UPLOAD_BOUNDARY}\r\n"
+    'Content-Disposition: form-data; name="video"; filename="test.mp4"\r\n'
+    "Content-Type: video/mp4\r\n\r\n"
+).encode() + _UPLOAD_VIDEO + f"\r\n--{UPLOAD_BOUNDARY}--\r\n".encode()
+
 # ============================================================================
 # Critical User Flows
 # ============================================================================
@@ -31,6 +54,7 @@ class ProfitHackUser(HttpUser):
     """
     Simulates a realistic PROFITHACK AI user with all critical flows
     """
+    abstract = LOAD_MODEL == "open"
     wait_time = between(1, 5)  # Realistic think time
     
     def on_start(self):
@@ -187,16 +211,16 @@ class ProfitHackUser(HttpUser):
         Upload video for processing
         Target: <30 seconds processing time
         """
-        headers = {"Authorization": f"Bearer {self.session_token}"}
-        
-        # Simulate small video upload
-        files = {
-            "video": ("test.mp4", b"fake-video-data" * 1000, "video/mp4")
+        headers = {
+            "Authorization": f"Bearer {self.session_token}",
+            "Content-Type": f"multipart/form-data; boundary={UPLOAD_BOUNDARY}",
         }
         
+        # Same multipart request as files={"video": ...}, but the body is one
+        # prebuilt bytes object sent directly instead of re-encoded per request
         with self.client.post(
             "/api/videos/upload",
-            files=files,
+            data=UPLOAD_BODY,
             headers=headers,
             catch_response=True,
             name="POST /api/videos/upload"
@@ -253,7 +277,8 @@ class LoadTestConfig:
             "spawn_rate": 1000,  # 1000 users/second
             "duration": "10m",
             "expected_rps": 50000,
-            "expected_p95_latency_ms": 50
+            "expected_p95_latency_ms": 50,
+            "arrival": {"profile": "ramp", "start": 1000, "rate": 50000, "ramp": "2m", "duration": "10m"}
         }
     
     @staticmethod
@@ -267,7 +292,8 @@ class LoadTestConfig:
             "spawn_rate": 100,
             "duration": "2m",
             "expected_rps": 500,
-            "expected_p95_latency_ms": 20
+            "expected_p95_latency_ms": 20,
+            "arrival": {"profile": "constant", "rate": 500, "duration": "2m"}
         }
     
     @staticmethod
@@ -281,9 +307,161 @@ class LoadTestConfig:
             "spawn_rate": 500,
             "duration": "1h",
             "expected_rps": 25000,
-            "expected_p95_latency_ms": 50
+            "expected_p95_latency_ms": 50,
+            "arrival": {"profile": "step", "steps": [["10m", 10000], ["20m", 25000], ["20m", 25000], ["10m", 10000]]}
         }
 
+    @staticmethod
+    def scenarios():
+        return {
+            "smoke": LoadTestConfig.smoke_test,
+            "stress": LoadTestConfig.stress_test,
+            "endurance": LoadTestConfig.endurance_test,
+        }
+
+    @staticmethod
+    def get(scenario):
+        scenarios = LoadTestConfig.scenarios()
+        if scenario not in scenarios:
+            return None
+        return scenarios[scenario]()
+
+
+# ============================================================================
+# Open Model (arrival-rate) Load Generation
+# ============================================================================
+
+SCENARIO_CONFIG = LoadTestConfig.get(LOAD_SCENARIO)
+if SCENARIO_CONFIG is None:
+    raise ValueError(f"Unknown LOAD_SCENARIO {LOAD_SCENARIO!r}; "
+                     f"valid scenarios: {', '.join(LoadTestConfig.scenarios())}")
+ARRIVAL_PROFILE = build_profile(SCENARIO_CONFIG["arrival"])
+latency_recorder = LatencyRecorder()
+arrival_schedule = None
+# Under a master, each worker generates 1/N of the profile, phase-shifted by
+# its index so the workers' slots interleave instead of firing together
+arrival_share = {"workers": 1, "index": 0}
+
+
+def _new_schedule():
+    workers = arrival_share["workers"]
+    first_rate = ARRIVAL_PROFILE.rate(0) / workers
+    offset = (arrival_share["index"] % workers) / workers / first_rate if workers > 1 and first_rate > 0 else 0.0
+    return ArrivalSchedule(ARRIVAL_PROFILE, share=1.0 / workers, start=time.perf_counter() + offset)
+
+
+class OpenModelUser(ProfitHackUser):
+    """
+    Same flows as ProfitHackUser, but each task fires at the next slot of a
+    shared arrival schedule instead of after a think time. Latency is recorded
+    from the slot (the intended send time), so queueing inside a slow system
+    shows up in the percentiles instead of being absorbed by fewer requests.
+    """
+    abstract = LOAD_MODEL != "open"
+    scheduled_at = None
+
+    def on_start(self):
+        super().on_start()
+        # Locust runs the first task right after on_start; make it wait for a slot too
+        self.wait()
+
+    def wait_time(self):
+        global arrival_schedule
+        if arrival_schedule is None:
+            arrival_schedule = _new_schedule()
+        slot = arrival_schedule.next_slot()
+        if slot is None:
+            raise StopUser()
+        self.scheduled_at = slot
+        return max(0.0, slot - time.perf_counter())
+
+    def context(self):
+        return {"scheduled_at": self.scheduled_at}
+
+
+if LOAD_MODEL == "open":
+    class ArrivalRateShape(LoadTestShape):
+        """
+        Grows the user pool with the profile (sized for the rate
+        OPEN_POOL_LOOKAHEAD seconds ahead) at the scenario's spawn rate, then
+        stops. New users sleep until their first slot, so spawning never
+        adds requests outside the schedule.
+        """
+
+        def tick(self):
+            run_time = self.get_run_time()
+            if run_time >= ARRIVAL_PROFILE.duration:
+                return None
+            rate = max(ARRIVAL_PROFILE.rate(run_time), ARRIVAL_PROFILE.rate(run_time + OPEN_POOL_LOOKAHEAD))
+            users = pool_size(ARRIVAL_PROFILE, headroom_seconds=OPEN_POOL_HEADROOM, rate=rate)
+            return users, SCENARIO_CONFIG["spawn_rate"]
+
+
+# ============================================================================
+# Distributed Runs (locust --master / --worker, see distributed.py)
+# ============================================================================
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        environment.runner.register_message("arrival_share", on_arrival_share)
+
+
+@events.test_start.add_listener
+def send_arrival_share(environment, **kwargs):
+    # Fires on the master before it sends the spawn messages, so workers get it first
+    if isinstance(environment.runner, MasterRunner):
+        environment.runner.send_message("arrival_share", {"workers": max(1, environment.runner.worker_count)})
+
+
+def on_arrival_share(environment, msg, **kwargs):
+    global arrival_schedule
+    arrival_share.update(workers=msg.data["workers"], index=getattr(environment.runner, "worker_index", 0))
+    arrival_schedule = None
+
+
+@events.report_to_master.add_listener
+def send_hdr(client_id, data, **kwargs):
+    # Only what was recorded since the last report; the master sums the deltas
+    encoded = latency_recorder.drain_encoded()
+    if encoded:
+        data["hdr"] = encoded
+
+
+@events.worker_report.add_listener
+def merge_hdr(client_id, data, **kwargs):
+    for name, encoded in data.get("hdr", {}).items():
+        latency_recorder.merge_encoded(name, encoded)
+
+
+@events.request.add_listener
+def record_from_schedule(request_type, name, response_time, context, **kwargs):
+    scheduled_at = (context or {}).get("scheduled_at")
+    if scheduled_at is None:
+        if LOAD_MODEL == "open":
+            # Session setup (login in on_start) is not part of the arrival profile
+            return
+        # Closed-model request: fall back to the measured service time
+        latency_recorder.record(f"{request_type} {name}", response_time / 1000.0)
+        return
+    latency_recorder.record(f"{request_type} {name}", time.perf_counter() - scheduled_at)
+
+
+@events.quitting.add_listener
+def report_hdr(environment, **kwargs):
+    # Workers ship their histograms to the master, which writes the merged report
+    if isinstance(environment.runner, WorkerRunner) or not latency_recorder.histograms:
+        return
+    merged = ""
+    if isinstance(environment.runner, MasterRunner):
+        merged = f", merged from {environment.runner.worker_count} workers"
+    print("")
+    print(f"HDR latency ({LOAD_MODEL} model, ms from intended send time{merged}):")
+    print(latency_recorder.format_table())
+    with open(HDR_REPORT_PATH, "w") as f:
+        json.dump({"model": LOAD_MODEL, "scenario": LOAD_SCENARIO,
+                   "percentiles": latency_recorder.summary()}, f, indent=2)
+
 
 # ============================================================================
 # Main Execution
@@ -314,13 +492,8 @@ if __name__ == "__main__":
     else:
         scenario = "smoke"
     
-    if scenario == "smoke":
-        config = LoadTestConfig.smoke_test()
-    elif scenario == "stress":
-        config = LoadTestConfig.stress_test()
-    elif scenario == "endurance":
-        config = LoadTestConfig.endurance_test()
-    else:
+    config = LoadTestConfig.get(scenario)
+    if config is None:
         print(f"❌ Unknown scenario: {scenario}")
         sys.exit(1)
     
@@ -343,7 +516,18 @@ if __name__ == "__main__":
     print(f"          --headless \\")
     print(f"          --html=load-test-report.html")
     print("")
+    print("📈 Open model (constant arrival rate, coordinated-omission safe):")
+    print(f"   LOAD_MODEL=open LOAD_SCENARIO={scenario} \\")
+    print(f"   locust -f load-testing/load_test.py --host={API_BASE_URL} --headless")
+    print(f"   Arrival profile: {config['arrival']}")
+    print("")
+    print("🖥️  Distributed (one locust worker per core; add --hosts for more machines):")
+    print(f"   python load-testing/distributed.py run --scenario {scenario} --host {API_BASE_URL}")
+    print("")
     print("📊 Or access Web UI:")
     print("   locust -f load-testing/load_test.py")
     print("   Then visit: http://localhost:8089")
     print("")
+    print("🧪 No backend running? Start the local stand-in first:")
+    print(f"   python load-testing/fake_backend.py --port 5000 --workers 4")
+    print("")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Logging Pipeline Benchmark
+Compares today's logging (logging.basicConfig: every record formatted and
+written to stderr on the calling thread) with phx_common/logs.py (JSON
+formatted and written by a QueueListener thread, hot loggers sampled):
+  1. ingest: one thread running the ingestor's per-tweet work (parse,
+     re-encode, one "forwarded tweet" line per tweet)
+  2. rpc: handler threads each doing ~50us of work and logging two lines
+     per request, like the moderation and Sora handlers
+
+Each (setup, workload) pair runs in a fresh process whose stderr is a pipe
+drained by this process, as under a container runtime. --slow-reader-ms
+makes the drain pause after every 64 KB read to model a busy log collector.
+"async" writes every line (no sampling or repeat limiting); when the
+listener falls behind, the bounded queue drops records, which shows as
+fewer lines than items.
+
+Usage:
+    python load-testing/logging_bench.py --tweets 200000 --requests 100000 --threads 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, ROOT)
+
+SETUPS = {
+    # name: environment for phx_common.logs (None = logging.basicConfig as before)
+    "basicConfig": None,
+    "async": {"PHX_LOG_SAMPLE": "", "PHX_LOG_REPEAT_WINDOW": "0"},
+    "async+sampled": {"PHX_LOG_SAMPLE": "*.hot=0.01"},
+}
+
+# ============================================================================
+# Workloads (run in the child process)
+# ============================================================================
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def ingest(args) -> dict:
+    import logging
+    hot_log = logging.getLogger("x_ingestor.hot")
+    raw = [json.dumps({"data": {"id": str(10 ** 17 + i), "text": f"new #ai tool drop {i} https://t.co/x",
+                                "author_id": str(i % 5000), "public_metrics": {"like_count": i % 700}},
+                       "includes": {"users": [{"id": str(i % 5000), "username": f"creator{i % 5000}"}]}})
+           for i in range(min(args.tweets, 10_000))]
+    start = time.perf_counter()
+    for i in range(args.tweets):
+        obj = json.loads(raw[i % len(raw)])
+        data = obj["data"]
+        body = json.dumps({"id": data["id"], "text": data["text"], "score": data["public_metrics"]["like_count"],
+                           "ingested_at": time.time()}).encode("utf-8")
+        hot_log.info("forwarded tweet %s by @%s", data["id"], obj["includes"]["users"][0]["username"])
+    elapsed = time.perf_counter() - start
+    return {"items": args.tweets, "seconds": elapsed, "per_second": args.tweets / elapsed, "bytes": len(body)}
+
+
+def rpc(args) -> dict:
+    import hashlib
+    import logging
+    hot_log = logging.getLogger("moderation.hot")
+    per_thread = args.requests // args.threads
+    latencies = [[] for _ in range(args.threads)]
+    blob = os.urandom(1024)
+
+    def handler(n, out):
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            hot_log.info(f"Received Analysis Request for video: v{n}-{i} (User: u{i % 977})")
+            digest = blob
+            for _ in range(20):
+                digest = hashlib.sha256(digest).digest()
+            hot_log.info(f"Video v{n}-{i} decided by frame stage (risk 0.12, {digest[:2].hex()})")
+            out.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=handler, args=(n, latencies[n])) for n in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    flat = [x for xs in latencies for x in xs]
+    return {"items": len(flat), "seconds": elapsed, "per_second": len(flat) / elapsed,
+            "p50_us": percentile(flat, 50) * 1e6, "p99_us": percentile(flat, 99) * 1e6}
+
+
+def child(setup: str, workload: str, args):
+    import logging
+    if SETUPS[setup] is None:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    else:
+        from phx_common import logs
+        logs.setup("logging-bench")
+    result = (ingest if workload == "ingest" else rpc)(args)
+    if SETUPS[setup] is not None:
+        # Time to drain what was queued: the cost that moved off the hot path
+        from phx_common import logs
+        t0 = time.perf_counter()
+        logs.shutdown()
+        result["drain_s"] = time.perf_counter() - t0
+    print(json.dumps(result), flush=True)
+
+# ============================================================================
+# Driver
+# ============================================================================
+
+def run_child(setup: str, workload: str, args) -> dict:
+    env = dict(os.environ, **(SETUPS[setup] or {}))
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", setup, workload,
+           "--tweets", str(args.tweets), "--requests", str(args.requests), "--threads", str(args.threads)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    logged = [0, 0]
+
+    def drain():
+        while True:
+            chunk = proc.stderr.read1(65536)
+            if not chunk:
+                return
+            logged[0] += len(chunk)
+            logged[1] += chunk.count(b"\n")
+            if args.slow_reader_ms:
+                time.sleep(args.slow_reader_ms / 1000)
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    out = proc.stdout.read()
+    proc.wait()
+    reader.join()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{setup}/{workload} exited with {proc.returncode}")
+    result = json.loads(out.decode().strip().splitlines()[-1])
+    result.update(log_mb=logged[0] / 1024 ** 2, log_lines=logged[1])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logging setup: ingest and RPC handler throughput")
+    parser.add_argument("--tweets", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--slow-reader-ms", type=float, default=0.0, help="pause after each 64 KB of stderr read")
+    parser.add_argument("--setups", default=",".join(SETUPS))
+    parser.add_argument("--child", nargs=2, metavar=("SETUP", "WORKLOAD"), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(*args.child, args)
+
+    results = {}
+    for workload in ("ingest", "rpc"):
+        print(f"\n{workload}: {args.tweets if workload == 'ingest' else args.requests:,} items"
+              + (f", {args.threads} threads" if workload == "rpc" else ""))
+        print(f"  {'setup':<15}{'items/s':>12}{'vs base':>9}{'p50 us':>9}{'p99 us':>9}{'lines':>10}{'MB':>8}{'drain s':>9}")
+        base = None
+        for setup in args.setups.split(","):
+            r = results.setdefault(workload, {})[setup] = run_child(setup, workload, args)
+            base = base or r["per_second"]
+            print(f"  {setup:<15}{r['per_second']:>12,.0f}{r['per_second'] / base:>8.2f}x"
+                  f"{r.get('p50_us', 0):>9.1f}{r.get('p99_us', 0):>9.1f}{r['log_lines']:>10,}{r['log_mb']:>8.1f}"
+                  f"{r.get('drain_s', 0):>9.2f}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"logging-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "logging", "args": {k: v for k, v in vars(args).items() if k != "child"},
+                   "results": results}, f, indent=2)
+    print(f"\nResults: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Per-Event Hot Function Microbenchmarks
+Times the functions that run once per tweet, message or request, against
+fixed fixtures, and tracks them commit to commit:
+
+  ingestor.parse_rules       X_RULES parsing (JSON and comma forms)
+  ingestor.keywords          Tokenizer.keywords over fixture tweet texts
+  ingestor.upsert_trending   keywords + the merge/executemany loop (null DB)
+  ingestor.payload           json.loads + tweet_payload + encode + route
+  acquisition.prompts        AcquisitionService._generate_prompts (50 prompts)
+  moderation.caption_rules   the AnalyzeVideo caption checks over a caption corpus
+  worker.decode              agent worker decode() of queued payloads
+
+Fixtures live in load-testing/fixtures: tweets.ndjson (synthetic.py events
+in the filtered-stream wire format; pass --tweets with a recorded capture
+for real data) and captions.txt (creator captions, ~6% policy-risky).
+
+Each benchmark is calibrated to run at least --min-time per repeat, with
+the garbage collector off while timing (as timeit does); the median of
+--repeats is what gets compared. A benchmark whose module can't be
+imported here (e.g. grpc stubs not generated) is reported as skipped; a
+comparison fails when a baseline benchmark has no current result.
+
+Usage:
+    python load-testing/microbench.py run                      # results/microbench-<ts>.json
+    python load-testing/microbench.py run --save-baseline      # also load-testing/baselines/microbench.json
+    python load-testing/microbench.py run --compare --threshold 10   # exit 1 on a >10% regression
+    python load-testing/microbench.py compare NEW.json [--baseline OLD.json] [--threshold 10]
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+FIXTURES_DIR = os.path.join(ROOT, "load-testing", "fixtures")
+BASELINE = os.path.join(ROOT, "load-testing", "baselines", "microbench.json")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "grpc_services"))
+sys.path.insert(0, os.path.join(ROOT, "services", "x-ingestor"))
+sys.path.insert(0, os.path.join(ROOT, "workers", "agent"))
+
+# name -> factory(fixtures) returning (callable, items handled per call)
+BENCHMARKS = {}
+
+
+def bench(name: str):
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+class Fixtures:
+    def __init__(self, tweets_path: str, captions_path: str):
+        with open(tweets_path, "rb") as f:
+            self.lines = [line.rstrip(b"\n") for line in f if line.strip()]
+        with open(captions_path, encoding="utf-8") as f:
+            self.captions = [line.rstrip("\n") for line in f]
+        events = [json.loads(line) for line in self.lines]
+        self.texts = [e["data"].get("text", "") for e in events if e.get("data")]
+        # What the ingestor queues for the worker, minus the fields it adds
+        self.queued = [json.dumps({"id": e["data"]["id"], "text": e["data"].get("text", ""),
+                                   "author_id": e["data"].get("author_id"), "ingested_at": 1.7e9}).encode("utf-8")
+                       for e in events if e.get("data")]
+
+
+X_RULES_JSON = json.dumps(
+    ["ai", "chatgpt", {"value": "sora lang:en", "tag": "sora"}, {"value": "openai -is:retweet", "tag": "ai"}]
+    + [{"value": f"#{topic} has:media", "tag": topic} for topic in
+       ("creator", "viral", "hustle", "automation", "marketing", "startup", "affiliate", "seo", "reels", "tiktok")]
+    + [f"keyword{i}" for i in range(10)])
+X_RULES_CSV = ",".join(f"topic{i}" for i in range(20))
+
+# ============================================================================
+# Benchmarks
+# ============================================================================
+
+@bench("ingestor.parse_rules")
+def _parse_rules(fx):
+    import x_ingestor
+
+    def run():
+        x_ingestor.parse_rules(X_RULES_JSON)
+        x_ingestor.parse_rules(X_RULES_CSV)
+    return run, 2
+
+
+@bench("ingestor.keywords")
+def _keywords(fx):
+    import x_ingestor
+    texts = fx.texts
+
+    def run():
+        for text in texts:
+            x_ingestor.extract_keywords(text)
+    return run, len(texts)
+
+
+class _NullDB:
+    """Consumes the rows the way a driver would iterate them; no I/O"""
+
+    def executemany(self, sql, rows):
+        for _ in rows:
+            pass
+
+
+@bench("ingestor.upsert_trending")
+def _upsert_trending(fx):
+    import x_ingestor
+    texts, db = fx.texts, _NullDB()
+
+    def run():
+        for text in texts:
+            x_ingestor.upsert_trending(db, x_ingestor.extract_keywords(text))
+    return run, len(texts)
+
+
+@bench("ingestor.payload")
+def _payload(fx):
+    import x_ingestor
+    lines = fx.lines
+
+    def run():
+        for line in lines:
+            obj = json.loads(line)
+            payload = x_ingestor.tweet_payload(obj)
+            json.dumps(payload).encode("utf-8")
+            x_ingestor.route(obj.get("matching_rules"), x_ingestor.lane_for(payload["score"]))
+    return run, len(lines)
+
+
+@bench("acquisition.prompts")
+def _prompts(fx):
+    from acquisition_service.servicer import AcquisitionService
+    service = AcquisitionService()
+
+    def run():
+        service._generate_prompts("AI side hustle", 50)
+    return run, 50
+
+
+@bench("moderation.caption_rules")
+def _caption_rules(fx):
+    from moderation_service import cascade
+    items = [types.SimpleNamespace(caption=c) for c in fx.captions]
+
+    def run():
+        for item in items:
+            cascade.caption_rules(item, cascade.Verdict())
+    return run, len(items)
+
+
+@bench("worker.decode")
+def _decode(fx):
+    import worker
+    payloads = fx.queued
+
+    def run():
+        for payload in payloads:
+            worker.decode(payload)
+    return run, len(payloads)
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+def time_it(fn, min_time: float, repeats: int) -> dict:
+    fn()  # warm caches, lazy imports, regex compiles
+    loops, elapsed = 1, 0.0
+    while loops < 1 << 20:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time / 10:
+            break
+        loops *= 2
+    loops = max(1, round(loops * min_time / max(elapsed, 1e-9)))
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"median_s": statistics.median(samples), "min_s": min(samples),
+            "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0, "loops": loops, "repeats": repeats}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(args) -> dict:
+    fx = Fixtures(args.tweets, args.captions)
+    results, skipped = {}, {}
+    print(f"{'benchmark':<28}{'per call':>12}{'per item':>12}{'stdev':>8}")
+    for name, factory in BENCHMARKS.items():
+        if not selected(name, args.filter):
+            continue
+        try:
+            fn, items = factory(fx)
+        except ImportError as e:
+            skipped[name] = str(e)
+            print(f"{name:<28}{'skipped':>12}  ({e})")
+            continue
+        r = time_it(fn, args.min_time, args.repeats)
+        r["items"] = items
+        r["per_item_us"] = r["median_s"] / items * 1e6
+        results[name] = r
+        print(f"{name:<28}{r['median_s'] * 1e6:>10.1f}us{r['per_item_us']:>10.3f}us"
+              f"{r['stdev_s'] / r['median_s']:>7.1%}")
+    return {
+        "benchmark": "microbench",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixtures": {"tweets": os.path.relpath(args.tweets, ROOT), "captions": os.path.relpath(args.captions, ROOT)},
+        "filter": args.filter or "",
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def selected(name: str, filter_spec: str) -> bool:
+    return not filter_spec or any(fnmatch.fnmatchcase(name, f) for f in filter_spec.split(","))
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple:
+    """
+    Prints the change per benchmark. Returns the names slower than
+    ``threshold`` percent, and the baseline benchmarks the current run
+    selected but has no result for (skipped or gone)
+    """
+    regressions, missing = [], []
+    print(f"\nvs {base.get('commit') or 'baseline'} ({base.get('created_at', '?')}), threshold +{threshold:g}%")
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+    names = {n for n in base["results"] if selected(n, new.get("filter", ""))} | set(new["results"])
+    for name in sorted(names):
+        old, cur = base["results"].get(name), new["results"].get(name)
+        if cur is None:
+            missing.append(name)
+            print(f"{name:<28}{'present':>12}{'skipped' if name in new.get('skipped', {}) else '-':>12}"
+                  f"{'n/a':>9}  MISSING")
+            continue
+        if old is None:
+            print(f"{name:<28}{'-':>12}{'present':>12}{'new':>9}")
+            continue
+        change = (cur["per_item_us"] / old["per_item_us"] - 1) * 100
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{old['per_item_us']:>10.3f}us{cur['per_item_us']:>10.3f}us{change:>+8.1f}%{flag}")
+    if base.get("python") != new.get("python") or base.get("platform") != new.get("platform"):
+        print(f"note: baseline from Python {base.get('python')} on {base.get('platform')}, "
+              f"current Python {new.get('python')} on {new.get('platform')}")
+    return regressions, missing
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def write(path: str, result: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-event hot function microbenchmarks with regression tracking")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the suite")
+    p_run.add_argument("--filter", help="comma list of name globs, e.g. 'ingestor.*'")
+    p_run.add_argument("--tweets", default=os.path.join(FIXTURES_DIR, "tweets.ndjson"))
+    p_run.add_argument("--captions", default=os.path.join(FIXTURES_DIR, "captions.txt"))
+    p_run.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    p_run.add_argument("--repeats", type=int, default=11)
+    p_run.add_argument("--out", help="results JSON path")
+    p_run.add_argument("--save-baseline", action="store_true", help=f"also write {os.path.relpath(BASELINE, ROOT)}")
+    p_run.add_argument("--compare", action="store_true", help="compare against the baseline afterwards")
+
+    p_cmp = sub.add_parser("compare", help="compare a results file against the baseline")
+    p_cmp.add_argument("results")
+    for p in (p_run, p_cmp):
+        p.add_argument("--baseline", default=BASELINE)
+        p.add_argument("--threshold", type=float, default=10.0, help="max slowdown per item, percent")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = run(args)
+        out = args.out or os.path.join(RESULTS_DIR, f"microbench-{int(time.time())}.json")
+        write(out, result)
+        print(f"\nResults: {out}")
+        if args.save_baseline:
+            write(args.baseline, result)
+            print(f"Baseline: {args.baseline}")
+        if not args.compare:
+            return 0
+    else:
+        result = load(args.results)
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with: run --save-baseline")
+        return 2
+    regressions, missing = compare(load(args.baseline), result, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%: {', '.join(regressions)}")
+    if missing:
+        print(f"\n{len(missing)} baseline benchmark(s) without a current result: {', '.join(missing)}")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Moderation Cascade Benchmark
+Runs moderation_service/cascade.py in-process over synthetic uploads and
+compares it with the old single-stage path (video model on every item):
+  * mean / p95 latency per item
+  * share of items decided by each stage
+  * decisions that differ from what the video model alone would say
+
+With the defaults the placeholder models reproduce the single-stage
+decisions, so only latency changes; --sim-unsafe and --extra-terms exercise
+the block paths (see cascade.py).
+
+--phash adds the known-media stage as the server runs it with
+MODERATION_PHASH=1: a capped MediaIndex, hashing in a 2-thread background
+pool (64 pending at most) from the moment an item arrives, and the default
+MODERATION_PHASH_WAIT_MS. Hashing is simulated as a --hash-ms sleep (measure
+the real cost with phash_index_bench.py); --reupload-fraction of the items
+repeat an earlier upload.
+
+Usage:
+    python load-testing/moderation_cascade_bench.py --items 2000 --spam-fraction 0.05
+    python load-testing/moderation_cascade_bench.py --sim-unsafe 0.1 --extra-terms
+    python load-testing/moderation_cascade_bench.py --phash --reupload-fraction 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, os.path.join(ROOT, "grpc_services"))
+
+from moderation_service import cascade
+from moderation_service.hashindex import MAX_VIDEOS, MediaIndex
+
+FRAMES = 8
+# The servicer's MODERATION_PHASH_WORKERS and MODERATION_PHASH_BACKLOG defaults
+HASH_WORKERS = 2
+HASH_BACKLOG = 64
+
+CLEAN = ("my morning routine", "how I edit reels in 5 minutes", "sora prompt breakdown", "day in the life",
+         "AI tools for creators", "quick pasta recipe", "gym progress update")
+SUGGESTIVE = ("spicy content link in bio", "dm me for more", "uncensored version on my page")
+HIGH = ("exclusive onlyfans drop tonight", "full nsfw 18+ video, link in bio")
+
+# ============================================================================
+# Simulation
+# ============================================================================
+
+def uploads(n: int, args, seed: int = 7):
+    rng = random.Random(seed)
+    earlier = []
+    for i in range(n):
+        if earlier and rng.random() < args.reupload_fraction:
+            # Same media and id: the models would decide it exactly as before
+            yield rng.choice(earlier)
+            continue
+        roll = rng.random()
+        if roll < args.spam_fraction:
+            caption = rng.choice(HIGH)
+        elif roll < args.spam_fraction + args.suggestive_fraction:
+            caption = rng.choice(SUGGESTIVE)
+        else:
+            caption = rng.choice(CLEAN)
+        item = SimpleNamespace(video_id=f"v-{i}", video_url=f"https://cdn.profithack.ai/v/{i}.mp4",
+                               caption=caption, user_id=f"u-{rng.randint(0, 500)}")
+        earlier.append(item)
+        yield item
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+class SimulatedHashing:
+    """The servicer's background hashing and indexing, with a sleep standing in for phash"""
+
+    def __init__(self, hash_seconds: float):
+        self.hash_seconds = hash_seconds
+        self.index = MediaIndex(max_videos=MAX_VIDEOS)
+        self.pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+        self.slots = threading.BoundedSemaphore(HASH_BACKLOG)
+        self.skipped = 0
+
+    def _hash(self, item):
+        time.sleep(self.hash_seconds)
+        rng = random.Random(item.video_url)
+        return [rng.getrandbits(64) for _ in range(FRAMES)]
+
+    def start(self, item):
+        if not self.slots.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        future = self.pool.submit(self._hash, item)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def remember(self, item, verdict, future):
+        if verdict.stage in ("frame", "video"):
+            future.add_done_callback(lambda f: self.index.remember(item.video_id, f.result(), verdict.is_safe))
+
+
+def run(name: str, pipeline: cascade.Cascade, items, hashing: SimulatedHashing = None) -> tuple:
+    latencies, decisions = [], []
+    for item in items:
+        future = hashing.start(item) if hashing else None
+        verdict = pipeline.run(item, notes={"hashing": future} if future else None)
+        if future:
+            hashing.remember(item, verdict, future)
+        latencies.append(verdict.seconds)
+        decisions.append(verdict.is_safe)
+    snap = pipeline.snapshot()
+    return decisions, {
+        "name": name,
+        "mean_ms": snap["mean_ms"],
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "stages": {stage: {"exited": s["exited"], "reached": s["reached"], "mean_ms": s["mean_ms"]}
+                   for stage, s in snap["stages"].items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Moderation cascade: early exits vs the video model on every item")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--spam-fraction", type=float, default=0.05, help="captions with a HIGH-severity match")
+    parser.add_argument("--suggestive-fraction", type=float, default=0.10, help="borderline captions")
+    parser.add_argument("--frame-ms", type=float, default=3.0)
+    parser.add_argument("--video-ms", type=float, default=20.0)
+    parser.add_argument("--sim-unsafe", type=float, default=cascade.SIM_UNSAFE,
+                        help="share of uploads the placeholder models treat as unsafe")
+    parser.add_argument("--extra-terms", action="store_true", default=cascade.EXTRA_TERMS,
+                        help="score the RISKY_TERMS captions too")
+    parser.add_argument("--phash", action="store_true", help="add the known-media stage with the server defaults")
+    parser.add_argument("--reupload-fraction", type=float, default=0.0, help="items that repeat an earlier upload")
+    parser.add_argument("--hash-ms", type=float, default=30.0, help="simulated cost of hashing one upload")
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+    cascade.EXTRA_TERMS = args.extra_terms
+
+    items = list(uploads(args.items, args))
+    video = cascade.SimulatedVideoModel(args.video_ms / 1000, args.sim_unsafe)
+    # The old path: caption rules decide nothing early, the video model sees everything
+    single = cascade.Cascade([
+        cascade.Stage("caption", cascade.caption_rules, block=2.0),
+        cascade.Stage("video", video, block=0.5),
+    ])
+    hashing = SimulatedHashing(args.hash_ms / 1000) if args.phash else None
+    staged = cascade.from_env(frame_seconds=args.frame_ms / 1000, video_seconds=args.video_ms / 1000,
+                              sim_unsafe=args.sim_unsafe,
+                              known_media=cascade.KnownMedia(hashing.index) if hashing else None)
+
+    reference, baseline = run("video model only", single, items)
+    decisions, result = run("cascade", staged, items, hashing)
+    # Where the single-stage path allowed but a caption rule blocked, the cascade is stricter by design
+    result["disagreements"] = sum(1 for a, b in zip(reference, decisions) if a != b)
+    result["missed_unsafe"] = sum(1 for a, b in zip(reference, decisions) if not a and b)
+    result["speedup"] = baseline["mean_ms"] / result["mean_ms"] if result["mean_ms"] else 0.0
+    if hashing:
+        result["not_hashed"] = hashing.skipped
+
+    print(f"{args.items} items, {args.spam_fraction:.0%} HIGH captions, {args.suggestive_fraction:.0%} borderline")
+    if hashing:
+        print(f"known media: {args.reupload_fraction:.0%} re-uploads, hashing {args.hash_ms:g} ms, "
+              f"wait {cascade.PHASH_WAIT_MS:g} ms, {result['not_hashed']} items not hashed (backlog full)")
+    print(f"{'pipeline':<18} {'mean ms':>8} {'p95 ms':>8}  exits")
+    for r in (baseline, result):
+        exits = " ".join(f"{stage}={s['exited']:.1%}" for stage, s in r["stages"].items())
+        print(f"{r['name']:<18} {r['mean_ms']:>8.2f} {r['p95_ms']:>8.2f}  {exits}")
+    print(f"Speedup {result['speedup']:.1f}x; {result['disagreements']} decisions differ from the video model "
+          f"({result['missed_unsafe']} it would have blocked)")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"moderation-cascade-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "moderation_cascade", "args": vars(args), "results": [baseline, result]}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
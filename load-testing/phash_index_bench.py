@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Perceptual-Hash Index Benchmark
+Exercises moderation_service/hashindex.py and phash.py in-process:
+  1. index scale: build a MediaIndex with --entries frame hashes (8 per
+     video) under the server's default cap of --max-videos, then time
+     near-duplicate lookups of the newest videos and unrelated lookups
+     against a linear Hamming scan, with recall and false matches
+  2. persistence: snapshot size, save and load time
+  3. pHash robustness: synthetic .y4m clips, re-encoded (brightness shift +
+     noise) copies and unrelated clips, hashed through the mmap reader, and
+     how long hashing one clip takes (the known-media stage waits
+     MODERATION_PHASH_WAIT_MS for it, see cascade.py)
+
+Index hashes are uniformly random 64-bit values; real pHashes cluster more,
+so bucket sizes in production will be somewhat less even.
+
+Usage:
+    python load-testing/phash_index_bench.py --entries 1000000 --queries 500
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, os.path.join(ROOT, "grpc_services"))
+
+from moderation_service import phash
+from moderation_service.cascade import PHASH_WAIT_MS
+from moderation_service.hashindex import MAX_VIDEOS, MediaIndex
+
+FRAMES = 8
+
+# ============================================================================
+# Index Scale
+# ============================================================================
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def perturb(h: int, rng: random.Random, bits: int) -> int:
+    for b in rng.sample(range(64), bits):
+        h ^= 1 << b
+    return h
+
+
+def index_scale(args) -> tuple:
+    rng = random.Random(1)
+    videos = args.entries // FRAMES
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = MediaIndex(max_distance=args.max_distance, max_videos=args.max_videos)
+    stored = []
+    start = time.perf_counter()
+    for v in range(videos):
+        hashes = [rng.getrandbits(64) for _ in range(FRAMES)]
+        index.remember(f"v{v}", hashes, is_safe=v % 10 != 0, policy="" if v % 10 else "Adult Content Policy")
+        # The newest videos: older ones may have been evicted by the cap
+        if v >= videos - args.queries:
+            stored.append((v, hashes))
+    build = time.perf_counter() - start
+    rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+
+    # Re-uploads: every frame moved by up to max_distance bits
+    near, hits = [], 0
+    for v, hashes in stored:
+        query = [perturb(h, rng, rng.randint(0, args.max_distance)) for h in hashes]
+        t0 = time.perf_counter()
+        match = index.match(query)
+        near.append(time.perf_counter() - t0)
+        hits += match is not None and match.video_id == f"v{v}"
+    unrelated, false_matches = [], 0
+    for _ in range(args.queries):
+        query = [rng.getrandbits(64) for _ in range(FRAMES)]
+        t0 = time.perf_counter()
+        false_matches += index.match(query) is not None
+        unrelated.append(time.perf_counter() - t0)
+
+    # What every lookup would cost without the index: one popcount per stored frame
+    all_hashes = index.frame_hashes()
+    probe = [rng.getrandbits(64) for _ in range(args.linear_queries)]
+    t0 = time.perf_counter()
+    for h in probe:
+        [1 for x in all_hashes if (x ^ h).bit_count() <= args.max_distance]
+    linear_frame = (time.perf_counter() - t0) / max(len(probe), 1)
+
+    result = {
+        "entries": len(index),
+        "videos": index.videos,
+        "build_s": build,
+        "rss_mb": rss_mb,
+        "near_p50_ms": percentile(near, 50) * 1000,
+        "near_p99_ms": percentile(near, 99) * 1000,
+        "recall": hits / max(len(stored), 1),
+        "unrelated_p50_ms": percentile(unrelated, 50) * 1000,
+        "unrelated_p99_ms": percentile(unrelated, 99) * 1000,
+        "false_match_rate": false_matches / max(args.queries, 1),
+        "linear_scan_video_ms": linear_frame * FRAMES * 1000,
+    }
+    return index, result
+
+
+def persistence(index: MediaIndex) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "media.phx")
+        t0 = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        t0 = time.perf_counter()
+        loaded = MediaIndex.load(path, max_distance=index.max_distance, max_videos=index.max_videos)
+        load = time.perf_counter() - t0
+        assert len(loaded) == len(index)
+    return {"snapshot_mb": size / 1024 ** 2, "save_s": saved, "load_s": load}
+
+# ============================================================================
+# pHash Robustness
+# ============================================================================
+
+def write_y4m(path: str, seed: int, width: int = 320, height: int = 240, frames: int = 24,
+              brightness: int = 0, noise: int = 0):
+    """A clip of drifting rectangles; the same seed gives the same scene"""
+    scene = random.Random(seed)
+    shapes = [(scene.randrange(width), scene.randrange(height), scene.randint(20, 120), scene.randint(20, 90),
+               scene.randint(0, 255), scene.uniform(-3, 3), scene.uniform(-2, 2)) for _ in range(6)]
+    background = scene.randint(20, 80)
+    grain = random.Random(seed * 7919 + noise + brightness)
+    with open(path, "wb") as f:
+        f.write(f"YUV4MPEG2 W{width} H{height} F24:1 Ip A1:1 C420jpeg\n".encode())
+        for t in range(frames):
+            luma = bytearray([background]) * (width * height)
+            for x, y, w, h, shade, dx, dy in shapes:
+                x0, y0 = int(x + dx * t) % width, int(y + dy * t) % height
+                for row in range(y0, min(y0 + h, height)):
+                    end = min(x0 + w, width)
+                    luma[row * width + x0:row * width + end] = bytes([shade]) * (end - x0)
+            if brightness or noise:
+                luma = bytearray(min(max(p + brightness + (grain.randint(-noise, noise) if noise else 0), 0), 255)
+                                 for p in luma)
+            f.write(b"FRAME\n")
+            f.write(luma)
+            f.write(bytes([128]) * (width * height // 2))
+
+
+def robustness(args) -> dict:
+    same, different = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        hashed, clip_seconds = 0, []
+        for clip in range(args.clips):
+            original, copy, other = (os.path.join(tmp, f"{clip}-{n}.y4m") for n in ("a", "b", "c"))
+            write_y4m(original, clip)
+            write_y4m(copy, clip, brightness=15, noise=12)
+            write_y4m(other, clip + 10_000)
+            t1 = time.perf_counter()
+            a = phash.video_hashes(original, count=FRAMES, media_root=tmp)
+            clip_seconds.append(time.perf_counter() - t1)
+            b, c = (phash.video_hashes(p, count=FRAMES, media_root=tmp) for p in (copy, other))
+            hashed += len(a) + len(b) + len(c)
+            same.extend(phash.hamming(x, y) for x, y in zip(a, b))
+            different.extend(phash.hamming(x, y) for x, y in zip(a, c))
+        elapsed = time.perf_counter() - t0
+    return {
+        "clips": args.clips,
+        "reencoded_mean_bits": sum(same) / max(len(same), 1),
+        "reencoded_max_bits": max(same, default=0),
+        "unrelated_min_bits": min(different, default=0),
+        "unrelated_mean_bits": sum(different) / max(len(different), 1),
+        "ms_per_frame_incl_io": elapsed / max(hashed, 1) * 1000,
+        "hash_clip_ms": percentile(clip_seconds, 50) * 1000,
+        "wait_ms": PHASH_WAIT_MS,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perceptual-hash index: lookup speed, persistence, robustness")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="frame hashes in the index")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--linear-queries", type=int, default=20, help="frames for the linear-scan baseline")
+    parser.add_argument("--max-distance", type=int, default=7)
+    parser.add_argument("--max-videos", type=int, default=MAX_VIDEOS, help="index cap (0 = unbounded)")
+    parser.add_argument("--clips", type=int, default=5, help="synthetic clips for the robustness check")
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    index, scale = index_scale(args)
+    saved = persistence(index)
+    robust = robustness(args)
+
+    print(f"Index: {scale['entries']:,} frame hashes ({scale['videos']:,} videos), built in {scale['build_s']:.1f}s, "
+          f"+{scale['rss_mb']:.0f} MB RSS")
+    print(f"  re-upload lookup  p50 {scale['near_p50_ms']:.2f} ms  p99 {scale['near_p99_ms']:.2f} ms  "
+          f"recall {scale['recall']:.1%}")
+    print(f"  unrelated lookup  p50 {scale['unrelated_p50_ms']:.2f} ms  p99 {scale['unrelated_p99_ms']:.2f} ms  "
+          f"false matches {scale['false_match_rate']:.2%}")
+    print(f"  linear scan       {scale['linear_scan_video_ms']:.0f} ms per video")
+    print(f"Snapshot: {saved['snapshot_mb']:.1f} MB, save {saved['save_s']:.2f}s, load {saved['load_s']:.1f}s")
+    print(f"pHash: re-encoded copies {robust['reencoded_mean_bits']:.1f} bits apart (max {robust['reencoded_max_bits']}), "
+          f"unrelated clips >= {robust['unrelated_min_bits']} (mean {robust['unrelated_mean_bits']:.1f}); "
+          f"{robust['ms_per_frame_incl_io']:.1f} ms/frame")
+    print(f"  hashing {FRAMES} frames of a clip {robust['hash_clip_ms']:.1f} ms "
+          f"(known-media stage waits {robust['wait_ms']:g} ms)")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"phash-index-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "phash_index", "args": vars(args), "index": scale, "persistence": saved,
+                   "robustness": robust}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
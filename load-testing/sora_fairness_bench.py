@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Sora Fair Scheduling Benchmark
+Drives sora_service/scheduler.py in-process with simulated engine slots and
+reports queue wait for interactive users:
+  1. interactive users alone
+  2. interactive users + a bulk seeder flooding submissions (fair queuing)
+  3. the same mix through a single FIFO queue (no per-user fairness)
+
+The interactive p95 wait should stay roughly flat between 1 and 2; 3 shows
+what the seeder would do without the scheduler.
+
+--check turns that into a pass/fail gate (exit 1): the p95 with the seeder
+may exceed the p95 alone by at most --max-p95-ratio, plus one longest job
+per slot of slack. It also replays a steady stream of short-lived users
+against a fake clock and fails if the scheduler's per-flow state grows with
+the user population instead of staying bounded.
+
+Usage:
+    python load-testing/sora_fairness_bench.py --seconds 10 --users 50
+    python load-testing/sora_fairness_bench.py --check
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path.insert(0, os.path.join(ROOT, "grpc_services"))
+
+from sora_service.scheduler import DEFAULT_TIERS, FairScheduler, Rejected
+
+# ============================================================================
+# Simulation
+# ============================================================================
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def simulate(name: str, args, bulk: bool, fifo: bool = False) -> dict:
+    # Same admission limits either way; FIFO only drops the per-user fair queue
+    sched = FairScheduler(DEFAULT_TIERS, slots=args.slots, fair=not fifo)
+    waits = {"interactive": [], "bulk": []}
+    submitted = {"interactive": 0, "bulk": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def engine(job):
+        with lock:
+            waits[job.tier].append(job.dispatched_at - job.enqueued_at)
+        time.sleep(job.cost * args.scale)
+
+    sched.run_slots(engine, name=f"bench-{name}")
+
+    def interactive(user: int):
+        rng = random.Random(user)
+        while not stop.is_set():
+            time.sleep(rng.expovariate(args.user_rate))
+            try:
+                sched.submit(f"i-{user}-{time.time()}", f"user-{user}", "interactive", cost=rng.randint(5, 15))
+                with lock:
+                    submitted["interactive"] += 1
+            except Rejected:
+                pass
+
+    def seeder():
+        rng = random.Random(0)
+        while not stop.is_set():
+            try:
+                sched.submit(f"b-{time.time()}", "founder", "bulk", cost=rng.randint(5, 15))
+                with lock:
+                    submitted["bulk"] += 1
+            except Rejected as e:
+                time.sleep(min(e.retry_after, 0.5))
+
+    threads = [threading.Thread(target=interactive, args=(u,), daemon=True) for u in range(args.users)]
+    if bulk:
+        threads.append(threading.Thread(target=seeder, daemon=True))
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+
+    with lock:
+        inter, blk = list(waits["interactive"]), list(waits["bulk"])
+    return {
+        "name": name,
+        "interactive_jobs": len(inter),
+        # Admitted but never reached an engine slot during the run
+        "interactive_starved": submitted["interactive"] - len(inter),
+        "interactive_p50_ms": percentile(inter, 50) * 1000,
+        "interactive_p95_ms": percentile(inter, 95) * 1000,
+        "bulk_jobs": len(blk),
+        "bulk_p95_ms": percentile(blk, 95) * 1000,
+        "queued_at_end": sched.queued(),
+        **sched.stats,
+    }
+
+
+def flow_state(steps: int, population: int = 1_000_000) -> dict:
+    """Steady backlog fed by mostly one-off users, on a fake clock; reports peak tracked flows"""
+    now = [0.0]
+    sched = FairScheduler(DEFAULT_TIERS, slots=1, clock=lambda: now[0])
+    rng = random.Random(1)
+    peak = 0
+    for step in range(steps):
+        now[0] += 1.0
+        for i in range(2):
+            try:
+                sched.submit(f"f-{step}-{i}", f"user-{rng.randrange(population)}",
+                             rng.choice(("interactive", "pro", "bulk")), cost=rng.randint(5, 15))
+            except Rejected:
+                pass
+        sched.next_job(timeout=0)
+        if sched.queued() > 50:
+            sched.next_job(timeout=0)
+        peak = max(peak, sched.tracked_flows())
+    return {"steps": steps, "submitted": sched.stats["admitted"], "peak_tracked_flows": peak,
+            "tracked_flows_at_end": sched.tracked_flows()}
+
+
+def check(results: list, flows: dict, args) -> list:
+    """Failed criteria, as messages"""
+    failures = []
+    alone, mixed = results[0], results[1]
+    slack_ms = 15 * args.scale * 1000  # one longest job
+    limit = alone["interactive_p95_ms"] * args.max_p95_ratio + slack_ms
+    if mixed["interactive_p95_ms"] > limit:
+        failures.append(f"interactive p95 with seeder {mixed['interactive_p95_ms']:.1f} ms > {limit:.1f} ms "
+                        f"(alone {alone['interactive_p95_ms']:.1f} ms x {args.max_p95_ratio:g} + {slack_ms:.0f} ms)")
+    if mixed["interactive_starved"] > max(args.slots, 0.02 * mixed["interactive_jobs"]):
+        failures.append(f"{mixed['interactive_starved']} interactive jobs never reached a slot with the seeder")
+    if flows["peak_tracked_flows"] > flows["submitted"] // 10:
+        failures.append(f"scheduler tracked {flows['peak_tracked_flows']} flows for {flows['submitted']} jobs")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sora fair scheduling: interactive wait under a bulk seeder")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=20, help="interactive users")
+    parser.add_argument("--user-rate", type=float, default=0.2, help="submissions/s per interactive user")
+    parser.add_argument("--slots", type=int, default=4, help="engine slots")
+    # ~20 jobs/s of capacity: the seeder alone saturates it
+    parser.add_argument("--scale", type=float, default=0.02, help="engine seconds per video second")
+    parser.add_argument("--out", help="results JSON path")
+    parser.add_argument("--check", action="store_true", help="exit 1 unless the interactive p95 stays flat")
+    parser.add_argument("--max-p95-ratio", type=float, default=1.5, help="--check: allowed p95 growth with the seeder")
+    parser.add_argument("--flow-steps", type=int, default=100_000, help="--check: fake-clock steps for the flow state check")
+    args = parser.parse_args(argv)
+
+    results = [
+        simulate("interactive only", args, bulk=False),
+        simulate("interactive + seeder", args, bulk=True),
+    ]
+    if not args.check:
+        results.append(simulate("FIFO + seeder", args, bulk=True, fifo=True))
+    print(f"{args.users} interactive users @ {args.user_rate}/s, {args.slots} slots, {args.seconds:.0f}s")
+    print(f"{'scenario':<22} {'jobs':>6} {'starved':>8} {'p50 ms':>9} {'p95 ms':>9} {'bulk jobs':>10} {'rejected':>9}")
+    for r in results:
+        print(f"{r['name']:<22} {r['interactive_jobs']:>6} {r['interactive_starved']:>8} {r['interactive_p50_ms']:>9.1f} "
+              f"{r['interactive_p95_ms']:>9.1f} {r['bulk_jobs']:>10} {r['rejected_rate'] + r['rejected_queue']:>9}")
+
+    flows = flow_state(args.flow_steps) if args.check else None
+    if flows:
+        print(f"flow state: {flows['submitted']} jobs from one-off users, "
+              f"peak {flows['peak_tracked_flows']} tracked flows, {flows['tracked_flows_at_end']} at end")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"sora-fairness-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "sora_fairness", "args": vars(args), "results": results, "flow_state": flows},
+                  f, indent=2)
+    print(f"Results: {out}")
+
+    if args.check:
+        failures = check(results, flows, args)
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            return 1
+        print("PASS: interactive p95 flat under the seeder, flow state bounded")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
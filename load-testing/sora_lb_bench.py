@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Sora Client-Side Load Balancing Benchmark
+Starts local Sora replicas on consecutive ports and drives GenerateVideo
+through phx_common.channels.lb_channel (round_robin + health checking +
+outlier detection):
+  1. throughput with 1, 2, ... N replicas
+  2. failover: N replicas under load, one is SIGKILLed mid-run; reports the
+     errors and worst latency after the kill and how long until calls are
+     clean again.
+
+Usage:
+    python load-testing/sora_lb_bench.py --replicas 3 --duration 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRPC_SERVICES_DIR = os.path.join(ROOT, "grpc_services")
+RESULTS_DIR = os.path.join(ROOT, "load-testing", "results")
+sys.path[:0] = [ROOT, GRPC_SERVICES_DIR]
+
+HEALTH_SERVICE = "sora.SoraService"
+
+# ============================================================================
+# Replicas
+# ============================================================================
+
+def start_replica(port: int) -> subprocess.Popen:
+    env = dict(os.environ, SORA_LISTEN_ADDRESS=f"[::]:{port}", PHX_PROCESSES="1",
+               SORA_CACHE_STATS_SECONDS="0", PYTHONPATH=os.pathsep.join([ROOT, GRPC_SERVICES_DIR]))
+    return subprocess.Popen([sys.executable, "-m", "sora_service.main"], cwd=GRPC_SERVICES_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_serving(port: int, timeout: float = 30.0):
+    import grpc
+    from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+    deadline = time.monotonic() + timeout
+    with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = health_pb2_grpc.HealthStub(channel)
+        while time.monotonic() < deadline:
+            try:
+                resp = stub.Check(health_pb2.HealthCheckRequest(service=HEALTH_SERVICE), timeout=0.5)
+                if resp.status == health_pb2.HealthCheckResponse.SERVING:
+                    return
+            except grpc.RpcError:
+                pass
+            time.sleep(0.1)
+    raise TimeoutError(f"Sora replica on :{port} not SERVING after {timeout}s")
+
+# ============================================================================
+# Client
+# ============================================================================
+
+def client_worker(spec: str, idx: int, threads: int, duration: float, results):
+    """Records (start offset, latency, ok) for every call"""
+    import threading
+    import grpc
+    import sora_service.sora_pb2 as sora_pb2
+    import sora_service.sora_pb2_grpc as sora_pb2_grpc
+    from phx_common.channels import lb_channel
+
+    channel = lb_channel(spec, HEALTH_SERVICE, options=[("grpc.use_local_subchannel_pool", 1)])
+    grpc.channel_ready_future(channel).result(timeout=10)
+    stub = sora_pb2_grpc.SoraServiceStub(channel)
+    t0 = time.time()
+    deadline = time.perf_counter() + duration
+    samples = []
+    lock = threading.Lock()
+
+    def loop(tid: int):
+        local, n = [], 0
+        while time.perf_counter() < deadline:
+            # Unique users and prompts: no rate limiting, no cache hits
+            req = sora_pb2.GenerateVideoRequest(user_id=f"lb-{idx}-{tid}-{n}", prompt=f"benchmark prompt {idx}-{tid}-{n}",
+                                                duration_seconds=5, style="cinematic")
+            start = time.perf_counter()
+            offset = time.time() - t0
+            try:
+                stub.GenerateVideo(req, timeout=2)
+                local.append((offset, time.perf_counter() - start, True))
+            except grpc.RpcError:
+                local.append((offset, time.perf_counter() - start, False))
+            n += 1
+        with lock:
+            samples.extend(local)
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    channel.close()
+    results.put((t0, samples))
+
+
+def drive(spec: str, args, on_started=None):
+    # spawn, not fork: the parent has grpc threads from the health checks
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    clients = [ctx.Process(target=client_worker, args=(spec, i, args.threads, args.duration, results))
+               for i in range(args.clients)]
+    for c in clients:
+        c.start()
+    if on_started:
+        on_started()
+    samples = []
+    for _ in clients:
+        t0, s = results.get()
+        samples.extend((t0 + off, lat, ok) for off, lat, ok in s)
+    for c in clients:
+        c.join()
+    return sorted(samples)
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000 if values else 0.0
+
+# ============================================================================
+# Scenarios
+# ============================================================================
+
+def throughput(replicas: list, args) -> list:
+    levels = []
+    for n in range(1, len(replicas) + 1):
+        spec = ",".join(f"127.0.0.1:{port}" for port, _ in replicas[:n])
+        samples = drive(spec, args)
+        lat = [s[1] for s in samples if s[2]]
+        levels.append({"replicas": n, "rps": len(lat) / args.duration, "p50_ms": pct(lat, 50),
+                       "p99_ms": pct(lat, 99), "errors": sum(1 for s in samples if not s[2])})
+    return levels
+
+
+def failover(replicas: list, args) -> dict:
+    spec = ",".join(f"127.0.0.1:{port}" for port, _ in replicas)
+    victim_port, victim = replicas[-1]
+    killed_at = []
+
+    def kill_later():
+        time.sleep(args.duration / 2)
+        killed_at.append(time.time())
+        victim.send_signal(signal.SIGKILL)
+
+    import threading
+    killer = threading.Thread(target=kill_later, daemon=True)
+    samples = drive(spec, args, on_started=killer.start)
+    killer.join()
+    kill = killed_at[0]
+    before = [s for s in samples if s[0] < kill]
+    after = [s for s in samples if s[0] >= kill]
+    failures = [s for s in after if not s[2]]
+    # Recovery: the last failure or >10x-baseline latency after the kill
+    baseline_p99 = pct([s[1] for s in before if s[2]], 99) / 1000
+    slow = [s for s in after if not s[2] or s[1] > max(10 * baseline_p99, 0.05)]
+    return {
+        "killed_port": victim_port,
+        "errors_after_kill": len(failures),
+        "calls_after_kill": len(after),
+        "p99_before_ms": baseline_p99 * 1000,
+        "max_latency_after_kill_ms": max((s[1] for s in after), default=0.0) * 1000,
+        "recovery_ms": ((slow[-1][0] + slow[-1][1]) - kill) * 1000 if slow else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sora client-side load balancing: scaling and failover")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=50155)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent RPCs per client process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--out", help="results JSON path")
+    args = parser.parse_args(argv)
+
+    replicas = [(args.base_port + i, start_replica(args.base_port + i)) for i in range(args.replicas)]
+    try:
+        for port, _ in replicas:
+            wait_serving(port)
+        levels = throughput(replicas, args)
+        fo = failover(replicas, args)
+    finally:
+        for _, proc in replicas:
+            if proc.poll() is None:
+                proc.terminate()
+                proc.wait(30)
+
+    base = levels[0]["rps"] or 1.0
+    print(f"{'replicas':>8} {'rps':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for lvl in levels:
+        lvl["speedup"] = lvl["rps"] / base
+        print(f"{lvl['replicas']:>8} {lvl['rps']:>10.0f} {lvl['speedup']:>7.2f}x "
+              f"{lvl['p50_ms']:>8.1f} {lvl['p99_ms']:>8.1f} {lvl['errors']:>7}")
+    print(f"Failover (killed :{fo['killed_port']}): {fo['errors_after_kill']}/{fo['calls_after_kill']} calls failed, "
+          f"max latency {fo['max_latency_after_kill_ms']:.1f} ms, clean again after {fo['recovery_ms']:.0f} ms")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"sora-lb-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"benchmark": "sora_client_lb", "clients": args.clients, "threads": args.threads,
+                   "levels": levels, "failover": fo}, f, indent=2)
+    print(f"Results: {out}")
+
+
+if __name__ == "__main__":
+    main()
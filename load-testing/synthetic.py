@@ -0,0 +1,53 @@
+"""
+PROFITHACK AI - Synthetic X Stream Data
+Tweet events shaped like the X v2 filtered-stream payload, shared by the fake
+backend and the ingest pipeline benchmark.
+"""
+
+import json
+import random
+import time
+
+TWEET_WORDS = (
+    "ai chatgpt sora video creators viral trend money hustle prompt agents "
+    "automation growth tiktok reels marketing startup launch model openai "
+    "grok llm income affiliate content seo"
+).split()
+TWEET_TAGS = ("#ai", "#chatgpt", "#sora", "#creator", "#viral", "@profithackai")
+
+
+def synthetic_tweet(seq: int, rng: random.Random = random) -> dict:
+    """Builds one filtered-stream event shaped like the X v2 API payload"""
+    author_id = str(1000 + rng.randint(0, 4999))
+    words = rng.choices(TWEET_WORDS, k=rng.randint(6, 18))
+    words.insert(rng.randrange(len(words)), rng.choice(TWEET_TAGS))
+    if rng.random() < 0.3:
+        words.append(f"https://t.co/{rng.getrandbits(40):x}")
+    likes = int(rng.paretovariate(1.2)) - 1
+    return {
+        "data": {
+            "id": str(1_700_000_000_000_000_000 + seq),
+            "text": " ".join(words),
+            "lang": "en",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "author_id": author_id,
+            "public_metrics": {
+                "like_count": likes,
+                "retweet_count": likes // 4,
+                "reply_count": likes // 10,
+                "quote_count": likes // 20,
+            },
+        },
+        "includes": {"users": [{"id": author_id, "username": f"user{author_id}", "name": f"User {author_id}"}]},
+        "matching_rules": [{"id": "1", "tag": "ai"}],
+    }
+
+
+def write_ndjson(path: str, count: int, seed: int = 42, seq_offset: int = 0) -> str:
+    """Writes ``count`` synthetic events to ``path`` (one JSON object per line)"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for seq in range(count):
+            f.write(json.dumps(synthetic_tweet(seq_offset + seq, rng), separators=(",", ":")))
+            f.write("\n")
+    return path
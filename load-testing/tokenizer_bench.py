@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+PROFITHACK AI - Trending Tokenizer Benchmark
+Legacy per-tweet regex (pre-tokenizer upsert_trending) vs. tokenizer.Tokenizer,
+per tweet and batched. Reports tokens/sec and how many distinct keywords (i.e.
+trending_topics rows / ZSET members) each approach produces.
+
+Usage:
+    python load-testing/tokenizer_bench.py --count 50000
+    python load-testing/tokenizer_bench.py --ndjson recorded.ndjson --bigrams
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "x-ingestor"))
+
+from synthetic import synthetic_tweet
+from tokenizer import Tokenizer
+
+
+def legacy_keywords(text: str):
+    # upsert_trending before the tokenizer module: uncompiled pattern, no filtering
+    words = [w.lower() for w in re.findall(r"[A-Za-z0-9#@_]{3,24}", text)]
+    return [(w, 2.0 if w.startswith("#") or w.startswith("@") else 1.0) for w in words]
+
+
+def load_texts(args) -> list[str]:
+    if args.ndjson:
+        with open(args.ndjson) as f:
+            return [json.loads(line).get("data", {}).get("text", "") for line in f if line.strip()]
+    rng = random.Random(args.seed)
+    return [synthetic_tweet(i, rng)["data"]["text"] for i in range(args.count)]
+
+
+def measure(name: str, texts: list[str], fn, rounds: int) -> dict:
+    best, out = float("inf"), None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        out = fn(texts)
+        best = min(best, time.perf_counter() - start)
+    tokens = sum(len(kws) for kws in out)
+    distinct = len({kw for kws in out for kw, _ in kws})
+    return {"name": name, "seconds": best, "tweets_per_sec": len(texts) / best,
+            "tokens": tokens, "tokens_per_sec": tokens / best, "distinct_keywords": distinct}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trending tokenizer benchmark")
+    parser.add_argument("--ndjson", help="recorded stream to tokenize (default: synthetic)")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--bigrams", action="store_true")
+    args = parser.parse_args(argv)
+
+    texts = load_texts(args)
+    tok = Tokenizer(bigrams=args.bigrams)
+
+    def batched(ts):
+        out = []
+        for i in range(0, len(ts), args.batch):
+            out.extend(tok.keywords_batch(ts[i:i + args.batch]))
+        return out
+
+    results = [
+        measure("legacy regex", texts, lambda ts: [legacy_keywords(t) for t in ts], args.rounds),
+        measure("tokenizer", texts, lambda ts: [tok.keywords(t) for t in ts], args.rounds),
+        measure(f"tokenizer batch={args.batch}", texts, batched, args.rounds),
+    ]
+    legacy = results[0]
+    print(f"{len(texts):,} tweets, bigrams={'on' if args.bigrams else 'off'}")
+    print(f"{'variant':<24} {'tweets/s':>10} {'tokens/s':>11} {'tokens':>9} {'distinct':>9}")
+    for r in results:
+        print(f"{r['name']:<24} {r['tweets_per_sec']:>10,.0f} {r['tokens_per_sec']:>11,.0f} "
+              f"{r['tokens']:>9,} {r['distinct_keywords']:>9,}")
+    new = results[-1]
+    print(f"Distinct keywords: {legacy['distinct_keywords']:,} -> {new['distinct_keywords']:,} "
+          f"({(1 - new['distinct_keywords'] / max(legacy['distinct_keywords'], 1)) * 100:.1f}% fewer)")
+    print(f"Keyword writes per tweet: {legacy['tokens'] / len(texts):.1f} -> {new['tokens'] / len(texts):.1f}")
+
+
+if __name__ == "__main__":
+    main()
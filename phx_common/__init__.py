@@ -0,0 +1,9 @@
+"""
+PROFITHACK AI - shared Python runtime for the gRPC services, the X ingestor
+and the agent worker.
+
+Put the repository root on PYTHONPATH and run services as modules from
+grpc_services/ so the generated stubs resolve, e.g.:
+
+    cd grpc_services && PYTHONPATH=.. python -m sora_service.main
+"""
@@ -0,0 +1,253 @@
+# File: phx_common/bootstrap.py
+# Fast-start bootstrap shared by the Python gRPC services
+
+"""
+Starts a gRPC server as early as possible and defers the expensive part -
+importing the generated stubs / servicer module and loading models - to a
+background warmup (or to the first request, in lazy mode).
+
+Readiness is published through the standard gRPC health checking service:
+the service names report NOT_SERVING until the servicer is loaded, so load
+balancers and Kubernetes probes only send traffic to warm replicas.
+
+Environment:
+    PHX_WARMUP            "background" (default) or "lazy"
+    PHX_STARTUP_PROFILE   "1" to log a per-phase startup timing breakdown
+    PHX_GRPC_WORKERS      thread pool size (default: per-service value)
+    PHX_PROCESSES         server processes sharing the port (default: per-service value)
+    PHX_SHUTDOWN_GRACE    seconds to drain in-flight RPCs on SIGTERM (default 10)
+    PHX_LOG_*             logging format, sampling and queueing (see phx_common/logs.py)
+    PHX_DIAG_*            on-demand profiling via SIGUSR1/SIGUSR2 or HTTP (see phx_common/diagnostics.py)
+"""
+
+import importlib
+import logging
+import os
+import signal
+import threading
+import time
+
+_BOOT_T0 = time.perf_counter()
+
+log = logging.getLogger("bootstrap")
+
+# ============================================================================
+# Startup Timing
+# ============================================================================
+
+def process_uptime() -> float:
+    """Seconds since this process was exec'd (Linux /proc), so interpreter start counts too"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return max(system_uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _BOOT_T0
+
+
+class StartupTimer:
+    """Collects named phase marks relative to process start"""
+
+    def __init__(self):
+        self._offset = process_uptime() - (time.perf_counter() - _BOOT_T0)
+        self.marks = [("bootstrap imported", self._offset)]
+
+    def mark(self, phase: str) -> float:
+        elapsed = self._offset + (time.perf_counter() - _BOOT_T0)
+        self.marks.append((phase, elapsed))
+        return elapsed
+
+    def summary(self) -> str:
+        parts, last = [], 0.0
+        for phase, elapsed in self.marks:
+            parts.append(f"{phase}={elapsed * 1000:.1f}ms (+{(elapsed - last) * 1000:.1f})")
+            last = elapsed
+        return "; ".join(parts)
+
+# ============================================================================
+# Deferred Servicer Loading
+# ============================================================================
+
+class _HandlerCollector:
+    """
+    Stand-in "server" passed to the generated ``add_*Servicer_to_server``
+    helpers so their handlers can be captured after the real server started.
+    """
+
+    def __init__(self):
+        self.handlers = []
+
+    def add_generic_rpc_handlers(self, handlers):
+        self.handlers.extend(handlers)
+
+    def add_registered_method_handlers(self, service_name, method_handlers):
+        import grpc
+        self.handlers.append(grpc.method_handlers_generic_handler(service_name, method_handlers))
+
+
+class ServicerLoader:
+    """
+    Imports the servicer module, calls its ``register(server)`` hook against a
+    collector and its optional ``warmup()`` hook (model loads, caches). Runs at
+    most once; concurrent callers wait for the first load to finish.
+    """
+
+    def __init__(self, module_name: str, timer: StartupTimer):
+        self.module_name = module_name
+        self.timer = timer
+        self.handlers = None
+        self.module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.handlers is not None:
+            return self.handlers
+        with self._lock:
+            if self.handlers is None:
+                module = importlib.import_module(self.module_name)
+                self.timer.mark("servicer imported")
+                collector = _HandlerCollector()
+                module.register(collector)
+                warmup = getattr(module, "warmup", None)
+                if warmup is not None:
+                    warmup()
+                    self.timer.mark("warmup done")
+                self.module = module
+                self.handlers = collector.handlers
+        return self.handlers
+
+
+def _deferred_handler(loader: ServicerLoader, lazy: bool):
+    import grpc
+
+    def _warming_up(request, context):
+        context.abort(grpc.StatusCode.UNAVAILABLE, "Service is warming up, retry shortly.")
+
+    warming_up = grpc.unary_unary_rpc_method_handler(_warming_up)
+
+    class DeferredHandler(grpc.GenericRpcHandler):
+        def service(self, handler_call_details):
+            handlers = loader.handlers
+            if handlers is None:
+                if not lazy:
+                    return warming_up
+                handlers = loader.load()
+            for handler in handlers:
+                method_handler = handler.service(handler_call_details)
+                if method_handler is not None:
+                    return method_handler
+            return None
+
+    return DeferredHandler()
+
+# ============================================================================
+# Server Entry Point
+# ============================================================================
+
+def configure_logging(service: str = "phx"):
+    # Async JSON logging; configured before a pre-fork so each child rebuilds its own listener
+    from phx_common import logs
+    logs.setup(service)
+
+
+def serve(display_name: str, listen_port: str, servicer_module: str, service_names=(),
+          max_workers: int = 10, server_options=None, on_server=None, processes: int = 1):
+    """
+    Runs a gRPC service until SIGINT/SIGTERM.
+
+    With ``processes`` > 1 (or PHX_PROCESSES), a pre-fork supervisor starts
+    that many server processes bound to the same port with SO_REUSEPORT;
+    grpc is only imported inside the forked workers.
+
+    ``servicer_module`` is imported in the background (or on first request
+    with PHX_WARMUP=lazy) and must define ``register(server)``; it may define
+    ``warmup()`` for expensive one-time initialisation. ``service_names`` are
+    the fully-qualified proto service names reported by the health service.
+    ``on_server`` is called with the server before it starts, for extra
+    services that must be registered up front.
+    """
+    configure_logging(servicer_module.split(".")[0])
+    processes = int(os.getenv("PHX_PROCESSES", processes))
+    if processes > 1:
+        from phx_common import prefork
+        options = [*(server_options or ()), ("grpc.so_reuseport", 1)]
+        prefork.supervise(
+            processes,
+            lambda: _serve_process(display_name, listen_port, servicer_module, service_names,
+                                   max_workers, options, on_server),
+            display_name,
+            grace=float(os.getenv("PHX_SHUTDOWN_GRACE", "10")),
+        )
+        return None
+    return _serve_process(display_name, listen_port, servicer_module, service_names,
+                          max_workers, server_options, on_server)
+
+
+def _serve_process(display_name, listen_port, servicer_module, service_names,
+                   max_workers, server_options, on_server):
+    timer = StartupTimer()
+    profile = os.getenv("PHX_STARTUP_PROFILE") == "1"
+    lazy = os.getenv("PHX_WARMUP", "background") == "lazy"
+
+    from concurrent import futures
+    import grpc
+    from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+    timer.mark("grpc imported")
+
+    workers = int(os.getenv("PHX_GRPC_WORKERS", max_workers))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers), options=server_options)
+    health_servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    loader = ServicerLoader(servicer_module, timer)
+    server.add_generic_rpc_handlers((_deferred_handler(loader, lazy),))
+    if on_server is not None:
+        on_server(server)
+
+    initial = health_pb2.HealthCheckResponse.SERVING if lazy else health_pb2.HealthCheckResponse.NOT_SERVING
+    for name in ("", *service_names):
+        health_servicer.set(name, initial)
+
+    server.add_insecure_port(listen_port)
+    server.start()
+    worker = os.getenv("PHX_WORKER_INDEX")
+    suffix = f" (worker {worker}, pid {os.getpid()})" if worker is not None else ""
+    logging.info(f"{display_name} gRPC Server started, listening on {listen_port}{suffix}")
+    timer.mark("listening")
+    from phx_common import diagnostics
+    diagnostics.start(servicer_module.split(".")[0])
+
+    def _warm():
+        try:
+            loader.load()
+        except Exception:
+            logging.exception(f"{display_name} warmup failed; health stays NOT_SERVING")
+            return
+        for name in ("", *service_names):
+            health_servicer.set(name, health_pb2.HealthCheckResponse.SERVING)
+        ready = timer.mark("ready")
+        logging.info(f"{display_name} ready in {ready * 1000:.0f}ms")
+        if profile:
+            logging.info(f"{display_name} startup profile: {timer.summary()}")
+
+    if not lazy:
+        threading.Thread(target=_warm, name="warmup", daemon=True).start()
+    elif profile:
+        logging.info(f"{display_name} startup profile (lazy): {timer.summary()}")
+
+    stopped = threading.Event()
+
+    def _shutdown(*_):
+        if stopped.is_set():
+            return
+        stopped.set()
+        grace = float(os.getenv("PHX_SHUTDOWN_GRACE", "10"))
+        logging.info(f"{display_name} shutting down (grace {grace:g}s)")
+        health_servicer.enter_graceful_shutdown()
+        server.stop(grace)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, _shutdown)
+    server.wait_for_termination()
+    return server
@@ -0,0 +1,316 @@
+# File: phx_common/calls.py
+# Deadlines, hedging and circuit breaking for calls between services
+
+"""
+Wraps unary calls on a generated stub so a slow or failing downstream cannot
+hold the caller's threads:
+
+* every call has a deadline. Inside a handler it is the caller's remaining
+  time (``context.time_remaining()``) less a small reserve, capped by the
+  default timeout. A call whose budget is already spent fails at once with
+  DEADLINE_EXCEEDED instead of being sent;
+* idempotent calls are hedged: if no reply has arrived after about the p95
+  of recent latencies, a second attempt is sent and the first successful
+  reply wins (an error is returned only once no attempt is left). Hedges
+  are limited to a budget (10% of calls by default), so a downstream
+  that is slow for everyone does not get twice the load;
+* a circuit breaker opens when most of the recent calls failed
+  (UNAVAILABLE, DEADLINE_EXCEEDED, INTERNAL, UNKNOWN). While it is open,
+  calls fail at once with UNAVAILABLE and a retry-after-ms trailer. After
+  the cool-down, one probe call at a time decides whether to close it.
+
+Errors are always ``grpc.RpcError``, so existing ``except grpc.RpcError``
+handling keeps working.
+
+Environment (defaults for ``Caller.from_env``; ``<NAME>_`` prefixed
+variants, e.g. SORA_CALL_TIMEOUT, override them per downstream):
+    PHX_CALL_TIMEOUT           seconds when the caller has no deadline (10)
+    PHX_HEDGE                  "0" turns hedging off
+    PHX_HEDGE_QUANTILE         latency percentile that triggers a hedge (95)
+    PHX_HEDGE_MIN_MS           lower bound for the hedge delay (10)
+    PHX_HEDGE_BUDGET           hedges allowed per call (0.1)
+    PHX_BREAKER_FAILURE_RATIO  failed share of the window that opens it (0.5)
+    PHX_BREAKER_MIN_CALLS      calls in the window before it can open (20)
+    PHX_BREAKER_OPEN_SECONDS   cool-down before a probe (10)
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import grpc
+
+# Codes that say the downstream is unhealthy. Client mistakes
+# (INVALID_ARGUMENT, ...) and throttling (RESOURCE_EXHAUSTED) do not count.
+BREAKER_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+})
+
+
+class CallRejected(grpc.RpcError):
+    """A call failed locally without being sent (circuit open, no time left)"""
+
+    def __init__(self, code: grpc.StatusCode, details: str, retry_after: float = 0.0):
+        super().__init__(details)
+        self._code = code
+        self._details = details
+        self.retry_after = retry_after
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+    def trailing_metadata(self):
+        return (('retry-after-ms', str(int(self.retry_after * 1000))),) if self.retry_after else ()
+
+# ============================================================================
+# Latency Window
+# ============================================================================
+
+class LatencyWindow:
+    """The last ``size`` successful attempt latencies, for the hedge delay"""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self._lock:
+            if not self._samples:
+                return None
+            values = sorted(self._samples)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+# ============================================================================
+# Circuit Breaker
+# ============================================================================
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_ratio: float = 0.5, min_calls: int = 20, window: int = 50,
+                 open_seconds: float = 10.0, clock=time.monotonic):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raises CallRejected unless a call may go out now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            left = self._opened_at + self.open_seconds - self.clock()
+            if self.state == self.OPEN and left <= 0:
+                self.state = self.HALF_OPEN
+                logging.info(f"Circuit for {self.name} half-open; probing")
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CallRejected(grpc.StatusCode.UNAVAILABLE, f"circuit open for {self.name}",
+                               retry_after=max(left, 0.1))
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self.state == self.OPEN:
+                # A call sent before the circuit opened; only the probe decides
+                return
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                    logging.info(f"Circuit for {self.name} closed")
+                else:
+                    self._trip()
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= not self._outcomes[0]
+            self._outcomes.append(ok)
+            self._failures += not ok
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_ratio * len(self._outcomes):
+                self._trip()
+
+    def _trip(self):
+        if self.state != self.OPEN:
+            logging.warning(f"Circuit for {self.name} open for {self.open_seconds:g}s "
+                            f"({self._failures}/{len(self._outcomes)} recent calls failed)")
+        self.state = self.OPEN
+        self._opened_at = self.clock()
+
+# ============================================================================
+# Caller
+# ============================================================================
+
+class Caller:
+    """
+    Deadline-bounded, hedged, circuit-broken unary calls to one downstream:
+
+        caller = Caller.from_env("sora")
+        reply = caller.call(stub.GenerateVideo, request, context=context)
+    """
+
+    def __init__(self, name: str, timeout: float = 10.0, hedge: bool = True, hedge_quantile: float = 95.0,
+                 hedge_min_delay: float = 0.01, hedge_budget: float = 0.1, max_hedges: int = 1,
+                 breaker: CircuitBreaker = None, reserve: float = 0.05):
+        self.name = name
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.max_hedges = max_hedges
+        self.breaker = breaker or CircuitBreaker(name)
+        # Left for the caller to answer after the downstream call returns
+        self.reserve = reserve
+        self.latency = LatencyWindow()
+        self._lock = threading.Lock()
+        # Hedge tokens: each call adds ``hedge_budget``, each hedge spends one
+        self._hedge_tokens = 1.0
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "errors": 0, "rejected_open": 0,
+                      "rejected_deadline": 0}
+
+    @classmethod
+    def from_env(cls, name: str, **overrides) -> "Caller":
+        prefix = name.upper().replace("-", "_")
+
+        def env(key, default):
+            return os.getenv(f"{prefix}_{key}", os.getenv(f"PHX_{key}", default))
+
+        breaker = CircuitBreaker(
+            name,
+            failure_ratio=float(env("BREAKER_FAILURE_RATIO", "0.5")),
+            min_calls=int(env("BREAKER_MIN_CALLS", "20")),
+            open_seconds=float(env("BREAKER_OPEN_SECONDS", "10")),
+        )
+        kwargs = dict(
+            timeout=float(env("CALL_TIMEOUT", "10")),
+            hedge=env("HEDGE", "1") != "0",
+            hedge_quantile=float(env("HEDGE_QUANTILE", "95")),
+            hedge_min_delay=float(env("HEDGE_MIN_MS", "10")) / 1000.0,
+            hedge_budget=float(env("HEDGE_BUDGET", "0.1")),
+            breaker=breaker,
+        )
+        kwargs.update(overrides)
+        return cls(name, **kwargs)
+
+    def time_left(self, context=None, timeout: float = None) -> float:
+        """Seconds this call may take: the caller's remaining deadline less the reserve, capped by the timeout"""
+        budget = timeout if timeout is not None else self.timeout
+        remaining = context.time_remaining() if context is not None else None
+        if remaining is not None:
+            budget = min(budget, remaining - self.reserve)
+        return budget
+
+    def hedge_delay(self):
+        """The hedge delay, or None until there are enough samples to estimate the tail"""
+        if not self.hedge or len(self.latency) < 20:
+            return None
+        return max(self.latency.percentile(self.hedge_quantile), self.hedge_min_delay)
+
+    def _take_hedge_token(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens < 1.0:
+                return False
+            self._hedge_tokens -= 1.0
+            self.stats["hedges"] += 1
+            return True
+
+    def call(self, method, request, context=None, timeout: float = None, metadata=None, idempotent: bool = True):
+        """
+        Calls ``method`` (a unary-unary stub attribute) and returns the reply.
+        Only ``idempotent`` calls are hedged.
+        """
+        budget = self.time_left(context, timeout)
+        with self._lock:
+            self.stats["calls"] += 1
+            self._hedge_tokens = min(self._hedge_tokens + self.hedge_budget, 10.0)
+        if budget <= 0:
+            with self._lock:
+                self.stats["rejected_deadline"] += 1
+            raise CallRejected(grpc.StatusCode.DEADLINE_EXCEEDED, f"no time left to call {self.name}")
+        try:
+            self.breaker.allow()
+        except CallRejected:
+            with self._lock:
+                self.stats["rejected_open"] += 1
+            raise
+
+        deadline = time.monotonic() + budget
+        finished = queue.SimpleQueue()
+        attempts = []
+
+        def launch():
+            started = time.monotonic()
+            future = method.future(request, timeout=max(deadline - started, 0.001), metadata=metadata)
+            attempts.append(future)
+            future.add_done_callback(lambda f: finished.put((f, started)))
+
+        delay = self.hedge_delay() if idempotent else None
+        pending, error, answered = 1, None, None
+        try:
+            launch()
+            while pending:
+                hedge_at = None
+                if delay is not None and len(attempts) <= self.max_hedges:
+                    # Attempt n+1 goes out n hedge delays after the first
+                    hedge_at = deadline - budget + delay * len(attempts)
+                wait = None if hedge_at is None else max(hedge_at - time.monotonic(), 0.0)
+                try:
+                    future, started = finished.get(timeout=wait)
+                except queue.Empty:
+                    if hedge_at < deadline and self._take_hedge_token():
+                        launch()
+                        pending += 1
+                    else:
+                        delay = None
+                    continue
+                pending -= 1
+                error = future.exception()
+                if error is None:
+                    self.latency.add(time.monotonic() - started)
+                    self.breaker.record(True)
+                    if future is not attempts[0]:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return future.result()
+                if error.code() not in BREAKER_CODES:
+                    # The downstream answered; send no more hedges, but an attempt already
+                    # in flight (e.g. admitted before a fast RESOURCE_EXHAUSTED hedge) may still succeed
+                    answered = answered or error
+                    delay = None
+        except Exception:
+            # Not an RPC outcome (closed channel, ...); still release a half-open probe
+            self.breaker.record(False)
+            raise
+        finally:
+            for future in attempts:
+                future.cancel()
+        error = answered or error
+        with self._lock:
+            self.stats["errors"] += 1
+        self.breaker.record(error.code() not in BREAKER_CODES)
+        raise error
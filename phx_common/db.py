@@ -0,0 +1,218 @@
+# File: phx_common/db.py
+# Shared Postgres access for the ingestor and the Python gRPC services
+
+"""
+A thin layer over psycopg_pool so every process talks to Postgres the same way:
+
+* connections come from a pool, are health-checked on checkout and replaced
+  in the background when the server drops them, so one dead socket no longer
+  stops writes for good;
+* statements run with prepare=True, so hot statements are parsed once per
+  connection and then reused as server-side prepared statements;
+* executemany/bulk() run in pipeline mode, one network round trip per batch;
+* the time spent waiting for a free connection is tracked and logged, which
+  is the first number to look at when the pool is too small.
+
+Environment (read by Database.from_env):
+    POSTGRES_URL         connection string; empty disables the database
+    PG_POOL_MIN          minimum connections (default 1)
+    PG_POOL_MAX          maximum connections (default 10)
+    PG_POOL_TIMEOUT      seconds to wait for a connection before failing (default 5)
+    PG_STATS_SECONDS     pool stats log interval, 0 to disable (default 60)
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+import psycopg
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+log = logging.getLogger("db")
+
+# ============================================================================
+# Pool Wait Metric
+# ============================================================================
+
+class WaitStats:
+    """Connection checkout wait times since the last reset"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.timeouts = 0
+
+    def record(self, ms: float):
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            snap = {
+                "checkouts": self.count,
+                "wait_avg_ms": self.total_ms / self.count if self.count else 0.0,
+                "wait_max_ms": self.max_ms,
+                "wait_timeouts": self.timeouts,
+            }
+            if reset:
+                self.reset()
+        return snap
+
+# ============================================================================
+# Database
+# ============================================================================
+
+class Database:
+    def __init__(self, url: str, name: str = "phx", min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, stats_interval: float = 60.0):
+        self.name = name
+        self.timeout = timeout
+        self.waits = WaitStats()
+        self.pool = ConnectionPool(
+            url,
+            min_size=min_size,
+            max_size=max_size,
+            name=name,
+            timeout=timeout,
+            kwargs={"autocommit": True},
+            check=ConnectionPool.check_connection,
+            reconnect_failed=self._reconnect_failed,
+            open=False,
+        )
+        # Connections are opened in the background; callers wait on first use
+        self.pool.open(wait=False)
+        if stats_interval > 0:
+            threading.Thread(target=self._report, args=(stats_interval,), name=f"{name}-pool-stats", daemon=True).start()
+
+    @classmethod
+    def from_env(cls, name: str = "phx", url: str = None, **overrides):
+        """A pool configured from the environment, or None if POSTGRES_URL is unset"""
+        url = (url if url is not None else os.getenv("POSTGRES_URL", "")).strip()
+        if not url:
+            return None
+        settings = {
+            "min_size": int(os.getenv("PG_POOL_MIN", "1")),
+            "max_size": int(os.getenv("PG_POOL_MAX", "10")),
+            "timeout": float(os.getenv("PG_POOL_TIMEOUT", "5")),
+            "stats_interval": float(os.getenv("PG_STATS_SECONDS", "60")),
+        }
+        settings.update(overrides)
+        return cls(url, name=name, **settings)
+
+    def _reconnect_failed(self, pool):
+        log.error(f"Postgres pool {self.name}: reconnection attempts exhausted; will retry on next checkout")
+
+    def _report(self, interval: float):
+        while True:
+            time.sleep(interval)
+            log.info(f"Postgres pool {self.name}: {self.stats(reset=True)}")
+
+    # --- Connections ---
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Checks out a pooled connection, recording how long the checkout waited"""
+        start = time.perf_counter()
+        try:
+            conn = self.pool.getconn(timeout=self.timeout)
+        except PoolTimeout:
+            self.waits.timeout()
+            raise
+        self.waits.record((time.perf_counter() - start) * 1000.0)
+        try:
+            yield conn
+        finally:
+            # The pool discards the connection if it came back broken
+            self.pool.putconn(conn)
+
+    # --- Statements ---
+
+    def execute(self, sql: str, params=None, prepare: bool = True, retries: int = 0):
+        """
+        Runs one statement and returns its rows (or None for statements without
+        a result). With ``retries``, a connection-level failure is retried on a
+        fresh connection; only pass it for idempotent statements, since a
+        write may have committed before the connection dropped.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    cur = conn.execute(sql, params, prepare=prepare)
+                    return cur.fetchall() if cur.description else None
+            except psycopg.OperationalError as e:
+                if attempt >= retries:
+                    raise
+                log.warning(f"Postgres pool {self.name}: {e}; retrying on a new connection")
+
+    def fetchone(self, sql: str, params=None, prepare: bool = True, retries: int = 0):
+        rows = self.execute(sql, params, prepare=prepare, retries=retries)
+        return rows[0] if rows else None
+
+    def executemany(self, sql: str, params_seq):
+        """
+        Runs one statement for every parameter tuple in a single pipelined round
+        trip (psycopg prepares it automatically once it is used repeatedly)
+        """
+        params_seq = list(params_seq)
+        if not params_seq:
+            return
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                # executemany uses pipeline mode on psycopg >= 3.1
+                cur.executemany(sql, params_seq)
+
+    @contextlib.contextmanager
+    def bulk(self):
+        """
+        A connection in pipeline mode for mixed bulk statements; results are
+        synced when the block exits, e.g.
+
+            with db.bulk() as conn:
+                conn.execute(INSERT_JOB, ..., prepare=True)
+                conn.execute(INSERT_ITEM, ..., prepare=True)
+        """
+        with self.connection() as conn:
+            with conn.pipeline():
+                yield conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        A connection inside one transaction: committed when the block exits,
+        rolled back if it raises
+        """
+        with self.connection() as conn:
+            with conn.transaction():
+                yield conn
+
+    # --- Health ---
+
+    def healthy(self) -> bool:
+        try:
+            return self.execute("select 1", retries=0) == [(1,)]
+        except (psycopg.Error, PoolTimeout) as e:
+            log.warning(f"Postgres pool {self.name}: health check failed: {e}")
+            return False
+
+    def stats(self, reset: bool = False) -> dict:
+        pool = self.pool.get_stats()
+        stats = {k: pool.get(k, 0) for k in ("pool_size", "pool_available", "requests_waiting", "connections_lost")}
+        stats.update(self.waits.snapshot(reset=reset))
+        return stats
+
+    def close(self):
+        self.pool.close()
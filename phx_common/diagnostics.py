@@ -0,0 +1,318 @@
+# File: phx_common/diagnostics.py
+# On-demand profiling of a live process: CPU stacks, allocations, thread dumps
+
+"""
+Nothing here runs until asked for, so it stays enabled in production:
+
+* ``SIGUSR1`` dumps every thread's stack to stderr (faulthandler, so it
+  works even when the interpreter is wedged holding the GIL);
+* ``SIGUSR2`` captures PHX_DIAG_SECONDS of CPU profile, allocation growth
+  and a thread dump into PHX_DIAG_DIR (a background thread does the work);
+* with PHX_DIAG_PORT set, a small HTTP server serves the same on demand:
+
+    GET /debug/threads
+    GET /debug/profile?seconds=10&hz=100&format=collapsed|speedscope&idle=0
+    GET /debug/heap?seconds=10&top=25
+
+  (400 unless 0 < seconds <= PHX_DIAG_MAX_SECONDS, 0 < hz <= 1000 and
+  0 < top <= 1000)
+
+The CPU profile is statistical: a sampler thread reads every thread's
+current Python stack (``sys._current_frames``) ``hz`` times a second, so the
+cost is bounded by the sampling rate and nothing is traced between
+samples. Samples whose innermost frame is a known blocking wait (idle pool
+threads, condition waits, selectors) are dropped unless ``idle=1``. Output
+is either collapsed stacks (``thread;outer;...;inner count``, for
+flamegraph.pl / speedscope / inferno) or a speedscope JSON file.
+
+The heap view starts tracemalloc for the window (unless it is already
+tracing, e.g. PHX_DIAG_TRACEMALLOC=1 or PYTHONTRACEMALLOC), then reports the
+lines whose allocations grew most and the largest live ones. Tracing slows
+allocation-heavy code several times over (see
+load-testing/diagnostics_overhead_bench.py), so it is only on while a
+capture runs; keep heap windows short on a loaded process.
+
+With pre-forked servers, signal the worker pid; worker N's HTTP port is
+PHX_DIAG_PORT + N.
+
+Environment:
+    PHX_DIAG_PORT          HTTP port, unset/0 = no HTTP server
+    PHX_DIAG_HOST          bind address (127.0.0.1; reach it via port-forward)
+    PHX_DIAG_DIR           where SIGUSR2 captures go (/tmp/phx-diag)
+    PHX_DIAG_SECONDS       SIGUSR2 capture length (10)
+    PHX_DIAG_MAX_SECONDS   longest capture accepted over HTTP (120)
+    PHX_DIAG_TRACEMALLOC   "1" traces allocations from start-up (N frames deep if > 1)
+"""
+
+import faulthandler
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+log = logging.getLogger("diagnostics")
+
+# Innermost frames that mean "blocked, not using CPU": (file basename, function)
+_IDLE_LEAVES = frozenset({
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker"),
+    ("socket.py", "accept"), ("socket.py", "readinto"), ("socketserver.py", "serve_forever"),
+    ("_server.py", "_serve"), ("diagnostics.py", "heap_report"),
+})
+
+# One capture at a time per process
+_capture_lock = threading.Lock()
+
+# ============================================================================
+# Thread Dump
+# ============================================================================
+
+def thread_dump() -> str:
+    frames = sys._current_frames()
+    out = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        flags = " daemon" if thread.daemon else ""
+        out.append(f'Thread "{thread.name}" (ident {thread.ident}{flags})\n')
+        if frame is not None:
+            out.extend(traceback.format_stack(frame))
+        out.append("\n")
+    return "".join(out)
+
+# ============================================================================
+# CPU Profile
+# ============================================================================
+
+def _label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, hz: float = 100.0, idle: bool = False) -> Tuple[Counter, float]:
+    """
+    Samples every other thread's stack for ``seconds``. Returns
+    ({(thread name, outermost label, ..., innermost label): samples}, the
+    mean seconds between samples actually achieved).
+    """
+    interval = 1.0 / hz
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    codes: Dict[object, str] = {}
+    start = next_tick = time.monotonic()
+    deadline = start + seconds
+    ticks = 0
+    while next_tick < deadline:
+        ticks += 1
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            code = frame.f_code
+            if not idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = codes.get(code)
+                if label is None:
+                    label = codes[code] = _label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stacks[tuple(reversed(stack))] += 1
+        # Under GIL contention a tick can run late; skip the missed ones rather than catch up
+        next_tick = max(next_tick + interval, time.monotonic() + interval / 2)
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    return stacks, (time.monotonic() - start) / max(ticks, 1)
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's folded format, heaviest first"""
+    return "".join(f"{';'.join(s.replace(';', ':') for s in stack)} {n}\n" for stack, n in stacks.most_common())
+
+
+def speedscope(stacks: Counter, interval: float, name: str) -> dict:
+    """speedscope.app file: one sampled profile per thread, weights in seconds"""
+    frames, index = [], {}
+    profiles: Dict[str, dict] = {}
+    for stack, n in stacks.most_common():
+        thread, *calls = stack
+        ids = []
+        for label in calls:
+            if label not in index:
+                func, _, where = label.rpartition(" (")
+                file, _, line = where.rstrip(")").rpartition(":")
+                index[label] = len(frames)
+                frames.append({"name": func, "file": file, "line": int(line)})
+            ids.append(index[label])
+        profile = profiles.setdefault(thread, {"type": "sampled", "name": thread, "unit": "seconds",
+                                               "startValue": 0, "endValue": 0, "samples": [], "weights": []})
+        profile["samples"].append(ids)
+        profile["weights"].append(n * interval)
+        profile["endValue"] += n * interval
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "phx_common.diagnostics",
+        "shared": {"frames": frames},
+        "profiles": sorted(profiles.values(), key=lambda p: -p["endValue"]),
+    }
+
+# ============================================================================
+# Allocations
+# ============================================================================
+
+def heap_report(seconds: float, top: int = 25) -> str:
+    """Allocation growth over ``seconds`` and the largest live allocations, by line"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+    scope = f"the {seconds:g}s window" if started else "tracing start"
+    out = [f"traced: {current / 1024 ** 2:.1f} MB current, {peak / 1024 ** 2:.1f} MB peak (since {scope})\n",
+           f"\nTop {top} by growth over {seconds:g}s:\n"]
+    for stat in after.compare_to(before, "lineno")[:top]:
+        out.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback}\n")
+    out.append(f"\nTop {top} live (allocated since {scope}):\n")
+    for stat in after.statistics("lineno")[:top]:
+        out.append(f"  {stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}\n")
+    return "".join(out)
+
+# ============================================================================
+# Triggers
+# ============================================================================
+
+def capture_to_dir(service: str, seconds: float, directory: str) -> Optional[str]:
+    """Profile, heap growth and thread dump over one window, written under ``directory``"""
+    if not _capture_lock.acquire(blocking=False):
+        log.warning("diagnostics capture already running; ignoring")
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{service}-{os.getpid()}-{time.strftime('%Y%m%dT%H%M%S')}")
+        results = {}
+        heap = threading.Thread(target=lambda: results.update(heap=heap_report(seconds)), name="diag-heap")
+        heap.start()
+        stacks, interval = sample_stacks(seconds)
+        heap.join()
+        with open(f"{prefix}.collapsed", "w") as f:
+            f.write(collapsed(stacks))
+        with open(f"{prefix}.speedscope.json", "w") as f:
+            json.dump(speedscope(stacks, interval, f"{service} pid {os.getpid()}"), f)
+        with open(f"{prefix}.heap.txt", "w") as f:
+            f.write(results.get("heap", ""))
+        with open(f"{prefix}.threads.txt", "w") as f:
+            f.write(thread_dump())
+        log.info(f"diagnostics written to {prefix}.*")
+        return prefix
+    except Exception:
+        log.exception("diagnostics capture failed")
+        return None
+    finally:
+        _capture_lock.release()
+
+
+def _bounded(query: dict, name: str, default: float, high: float) -> float:
+    """``query[name]`` as a float in (0, high]; ValueError (-> 400) otherwise, NaN included"""
+    value = float(query.get(name, default))
+    if not 0 < value <= high:
+        raise ValueError(f"{name} must be > 0 and <= {high:g}, got {query[name]}")
+    return value
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = "phx"
+    max_seconds = 120.0
+    max_hz = 1000.0
+    max_top = 1000
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            seconds = _bounded(query, "seconds", 10, self.max_seconds)
+            hz = _bounded(query, "hz", 100, self.max_hz)
+            top = int(_bounded(query, "top", 25, self.max_top))
+            if url.path == "/debug/threads":
+                return self._send(200, thread_dump())
+            if url.path not in ("/debug/profile", "/debug/heap"):
+                return self._send(404, "GET /debug/threads | /debug/profile | /debug/heap\n")
+            if not _capture_lock.acquire(blocking=False):
+                return self._send(409, "another capture is running\n")
+            try:
+                if url.path == "/debug/heap":
+                    return self._send(200, heap_report(seconds, top))
+                stacks, interval = sample_stacks(seconds, hz, query.get("idle") == "1")
+            finally:
+                _capture_lock.release()
+            if query.get("format") == "speedscope":
+                body = json.dumps(speedscope(stacks, interval, f"{self.service} pid {os.getpid()}"))
+                return self._send(200, body, "application/json")
+            return self._send(200, collapsed(stacks))
+        except ValueError as e:
+            return self._send(400, f"{e}\n")
+
+    def _send(self, status: int, body: str, content_type: str = "text/plain; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        log.info(f"{self.client_address[0]} {fmt % args}")
+
+
+def serve_http(service: str, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type("DiagnosticsHandler", (_Handler,), {
+        "service": service, "max_seconds": float(os.getenv("PHX_DIAG_MAX_SECONDS", "120"))})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="diagnostics-http", daemon=True).start()
+    return server
+
+
+def start(service: str):
+    """Installs the signal handlers (main thread only) and the optional HTTP endpoint"""
+    frames = int(os.getenv("PHX_DIAG_TRACEMALLOC", "0"))
+    if frames and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+    if threading.current_thread() is threading.main_thread():
+        faulthandler.register(signal.SIGUSR1, all_threads=True, chain=False)
+        directory = os.getenv("PHX_DIAG_DIR", "/tmp/phx-diag")
+        seconds = float(os.getenv("PHX_DIAG_SECONDS", "10"))
+
+        def _capture(*_):
+            threading.Thread(target=capture_to_dir, args=(service, seconds, directory),
+                             name="diagnostics-capture", daemon=True).start()
+
+        signal.signal(signal.SIGUSR2, _capture)
+
+    port = int(os.getenv("PHX_DIAG_PORT", "0") or 0)
+    if port:
+        port += int(os.getenv("PHX_WORKER_INDEX", "0"))
+        host = os.getenv("PHX_DIAG_HOST", "127.0.0.1")
+        try:
+            serve_http(service, host, port)
+            log.info(f"diagnostics on http://{host}:{port}/debug/ (pid {os.getpid()})")
+        except OSError as e:
+            log.warning(f"diagnostics HTTP port {port} unavailable: {e}")
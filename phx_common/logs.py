@@ -0,0 +1,235 @@
+# File: phx_common/logs.py
+# Asynchronous, sampled JSON logging shared by every Python process
+
+"""
+``setup(service)`` replaces the root handlers with a QueueHandler. Calling
+threads only filter the record, render its message and enqueue it. A
+QueueListener thread does the JSON formatting and the (blocking) stderr
+writes, so a slow log pipe no longer throttles request handling.
+
+Before a record is queued, on the calling thread:
+
+* sampling: INFO/DEBUG records from loggers matching a pattern keep only
+  that fraction (``PHX_LOG_SAMPLE="*.hot=0.01"``). WARNING and above are
+  never sampled. Kept records carry ``sample_rate`` so counts can be scaled
+  back up;
+* repeat limiting: an identical line (same logger, level and message) is
+  written at most ``burst`` times per ``window`` seconds, so an error
+  repeated for every message while Redis is down costs a few lines. The
+  first one in the next window carries ``suppressed`` = how many were
+  dropped;
+* if the queue is full the record is dropped rather than blocking; the
+  next record carries ``dropped``.
+
+Hot-path call sites log through a ``<service>.hot`` logger (e.g.
+``logging.getLogger("sora.hot")``), which the default sampling targets.
+
+Environment:
+    PHX_LOG_LEVEL          root level (INFO)
+    PHX_LOG_FORMAT         json (default) or text
+    PHX_LOG_SAMPLE         comma list of <logger glob>=<rate> ("*.hot=0.01")
+    PHX_LOG_REPEAT_WINDOW  seconds per repeat window, 0 disables (10)
+    PHX_LOG_REPEAT_BURST   identical records per window (20)
+    PHX_LOG_QUEUE          max queued records (10000)
+    PHX_LOG_ASYNC          "0" writes on the calling thread (same filters)
+"""
+
+import atexit
+import datetime
+import fnmatch
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# ============================================================================
+# Formatting
+# ============================================================================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, service, pid, plus any extras"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+        self.pid = os.getpid()
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "service": self.service,
+            "pid": self.pid,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str, separators=(",", ":"))
+
+# ============================================================================
+# Filters (run on the calling thread, before the record is queued)
+# ============================================================================
+
+def parse_rates(spec: str) -> list:
+    """"x_ingestor.hot=0.01,*.hot=0.05" -> [(pattern, rate)], first match wins"""
+    rates = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        pattern, _, rate = part.partition("=")
+        rates.append((pattern.strip(), float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: list):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = next((r for pattern, r in self.rates if fnmatch.fnmatchcase(name, pattern)), 1.0)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """At most ``burst`` identical records (logger, level, message) per ``window`` seconds"""
+
+    def __init__(self, window: float = 10.0, burst: int = 20, max_sites: int = 10000):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_sites = max_sites
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                if site is None and len(self._sites) >= self.max_sites:
+                    self._sites.clear()
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+# ============================================================================
+# Handlers
+# ============================================================================
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: a full queue drops the record and counts it"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message now (args may change later); the listener does the formatting
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_state = {}
+
+
+def _build(service: str):
+    fmt = os.getenv("PHX_LOG_FORMAT", "json")
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter(service) if fmt == "json" else
+                        logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    filters = [SamplingFilter(parse_rates(os.getenv("PHX_LOG_SAMPLE", "*.hot=0.01")))]
+    window = float(os.getenv("PHX_LOG_REPEAT_WINDOW", "10"))
+    if window > 0:
+        filters.append(RepeatFilter(window, int(os.getenv("PHX_LOG_REPEAT_BURST", "20"))))
+
+    listener = None
+    if os.getenv("PHX_LOG_ASYNC", "1") == "0":
+        handler = stream
+    else:
+        handler = _DroppingQueueHandler(queue.Queue(int(os.getenv("PHX_LOG_QUEUE", "10000"))))
+        listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+        listener.start()
+    for f in filters:
+        handler.addFilter(f)
+    return handler, listener
+
+
+def setup(service: str, level: str = None):
+    """Routes all logging in this process through the shared pipeline (idempotent)"""
+    if _state:
+        return
+    root = logging.getLogger()
+    handler, listener = _build(service)
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level or os.getenv("PHX_LOG_LEVEL", "INFO"))
+    _state.update(service=service, handler=handler, listener=listener)
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flushes queued records; called at exit"""
+    listener = _state.get("listener")
+    if listener is not None:
+        listener.stop()
+        _state["listener"] = None
+
+
+def _after_fork():
+    # The listener thread does not survive fork: pre-forked servers get their own
+    if _state.get("listener") is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_state["handler"])
+    handler, listener = _build(_state["service"])
+    root.addHandler(handler)
+    _state.update(handler=handler, listener=listener)
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,127 @@
+# File: phx_common/prefork.py
+# Pre-fork process supervisor for CPU-bound Python gRPC services
+
+"""
+Runs N copies of a service in separate processes, all bound to the same port
+with SO_REUSEPORT so the kernel spreads incoming connections across them and
+each process gets its own GIL.
+
+The parent never imports grpc (gRPC is not fork-safe once its threads are
+running); it only forks, supervises and forwards signals:
+
+- a worker that dies unexpectedly is restarted, with exponential backoff if
+  it keeps crashing right after start;
+- SIGTERM/SIGINT are forwarded to every worker, which drain in-flight RPCs
+  (see bootstrap.serve); stragglers are SIGKILLed after the grace period.
+"""
+
+import logging
+import os
+import signal
+import time
+
+from phx_common import logs
+
+log = logging.getLogger("prefork")
+
+# A worker that exits sooner than this after starting counts as a crash loop
+_MIN_HEALTHY_UPTIME = 5.0
+_MAX_RESTART_BACKOFF = 30.0
+
+
+def _run_child(slot: int, target):
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    os.environ["PHX_WORKER_INDEX"] = str(slot)
+    code = 0
+    try:
+        target()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 0
+    except BaseException:
+        log.exception(f"worker {slot} crashed")
+        code = 1
+    finally:
+        # os._exit skips atexit: stop the async log listener here so queued records
+        # (the crash traceback above included) reach the handlers
+        logs.shutdown()
+        logging.shutdown()
+        os._exit(code)
+
+
+def supervise(processes: int, target, display_name: str = "service", grace: float = 10.0) -> int:
+    """
+    Forks ``processes`` workers running ``target()`` and keeps them alive
+    until SIGTERM/SIGINT. Returns the number of worker restarts performed.
+    """
+    children = {}  # pid -> slot
+    started = {}   # slot -> start time
+    failures = {}  # slot -> consecutive fast crashes
+    restarts = 0
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            _run_child(slot, target)
+        children[pid] = slot
+        started[slot] = time.monotonic()
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        log.info(f"{display_name}: {signal.Signals(signum).name} received, stopping {len(children)} workers")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for slot in range(processes):
+        spawn(slot)
+    log.info(f"{display_name}: started {processes} worker processes (SO_REUSEPORT)")
+
+    while children and not stopping:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        uptime = time.monotonic() - started[slot]
+        failures[slot] = failures.get(slot, 0) + 1 if uptime < _MIN_HEALTHY_UPTIME else 0
+        backoff = min(_MAX_RESTART_BACKOFF, 0.5 * (2 ** failures[slot])) if failures[slot] else 0.0
+        log.warning(f"{display_name}: worker {slot} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                    f"after {uptime:.1f}s; restarting in {backoff:.1f}s")
+        if backoff:
+            time.sleep(backoff)
+        if not stopping:
+            spawn(slot)
+            restarts += 1
+
+    deadline = time.monotonic() + grace + 5.0
+    while children:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+            continue
+        if time.monotonic() > deadline:
+            for pid in list(children):
+                log.warning(f"{display_name}: worker pid {pid} did not stop in time, killing")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            deadline = float("inf")
+        time.sleep(0.05)
+    log.info(f"{display_name}: all workers stopped")
+    return restarts
@@ -0,0 +1,112 @@
+# File: phx_common/startup_profile.py
+# Cold-start profiler for the Python gRPC services
+
+"""
+Launches a service under ``python -X importtime``, polls the standard gRPC
+health service until it reports SERVING, then stops it and prints the
+time-to-first-ready plus the heaviest imports.
+
+Usage (from the repository root):
+    python -m phx_common.startup_profile moderation_service.main --port 50057
+    python -m phx_common.startup_profile sora_service.main --port 50055 --top 30 --json out.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRPC_SERVICES_DIR = os.path.join(ROOT, "grpc_services")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(lines):
+    """Returns [(module, self_us, cumulative_us, depth)] from ``-X importtime`` output"""
+    rows = []
+    for line in lines:
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            self_us, cumulative_us, indent, module = m.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def wait_until_serving(target: str, timeout: float, proc) -> float:
+    import grpc
+    from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+    start = time.perf_counter()
+    with grpc.insecure_channel(target) as channel:
+        stub = health_pb2_grpc.HealthStub(channel)
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"service exited with code {proc.returncode} before becoming ready")
+            try:
+                resp = stub.Check(health_pb2.HealthCheckRequest(service=""), timeout=0.2)
+                if resp.status == health_pb2.HealthCheckResponse.SERVING:
+                    return time.perf_counter() - start
+            except grpc.RpcError:
+                pass
+            time.sleep(0.005)
+    raise TimeoutError(f"{target} not SERVING after {timeout}s")
+
+
+def profile(module: str, port: int, timeout: float = 60.0, extra_env=None) -> dict:
+    env = dict(os.environ, PHX_STARTUP_PROFILE="1", PYTHONPATH=os.pathsep.join([ROOT, GRPC_SERVICES_DIR]))
+    env.update(extra_env or {})
+    with tempfile.TemporaryFile("w+") as stderr:
+        launched = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-X", "importtime", "-m", module],
+                                cwd=GRPC_SERVICES_DIR, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            ready = wait_until_serving(f"localhost:{port}", timeout, proc)
+            ready_from_launch = time.perf_counter() - launched
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        stderr.seek(0)
+        lines = stderr.read().splitlines()
+
+    imports = parse_importtime(lines)
+    total_us = sum(self_us for _, self_us, _, _ in imports)
+    top_level = sorted((r for r in imports if r[3] == 0), key=lambda r: r[2], reverse=True)
+    return {
+        "module": module,
+        "time_to_ready_ms": ready_from_launch * 1000,
+        "health_poll_ms": ready * 1000,
+        "import_total_ms": total_us / 1000,
+        "top_imports": [{"module": m, "cumulative_ms": c / 1000, "self_ms": s / 1000} for m, s, c, _ in top_level],
+        "startup_log": [line for line in lines if "startup profile" in line or "ready in" in line],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile gRPC service cold start")
+    parser.add_argument("module", help="service module, e.g. moderation_service.main")
+    parser.add_argument("--port", type=int, required=True, help="port the service listens on")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="write the full report to this path")
+    args = parser.parse_args(argv)
+
+    report = profile(args.module, args.port, args.timeout)
+    print(f"{report['module']}: ready {report['time_to_ready_ms']:.0f}ms after launch, "
+          f"{report['import_total_ms']:.0f}ms spent importing")
+    for line in report["startup_log"]:
+        print(f"  {line}")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in report["top_imports"][:args.top]:
+        print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {row['module']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
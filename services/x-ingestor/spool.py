@@ -0,0 +1,249 @@
+"""Local disk spool so the ingestor never drops the stream while Redis is slow or down.
+
+Records are appended to fixed-size, memory-mapped segment files
+(seg-<n>.log). Each segment starts with a 16-byte header whose last 8 bytes
+are the drained offset, so replay resumes where it stopped after a restart.
+Records are <len:u32><crc32:u32><bytes>; a zero length marks the end of the
+written area (segments are preallocated with zeros).
+
+RedisSpillover owns the spilling state: the ingestor calls ``spill()`` for
+anything it cannot hand to Redis right now, and a background drainer pings
+Redis, watches the queue length for backpressure, and replays the spool in
+pipelined batches once Redis is healthy again.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional
+
+import redis
+
+log = logging.getLogger("x_ingestor.spool")
+
+MAGIC = b"PHXS"
+HEADER = struct.Struct("<4sIQ")   # magic, version, drained offset
+RECORD = struct.Struct("<II")     # payload length, crc32
+VERSION = 1
+
+
+class Segment:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        exists = os.path.exists(path)
+        self._file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self._file.truncate(size)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), self.size)
+        if exists:
+            magic, _, self.drained = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a spool segment")
+            self.write_off = self._scan_end(self.drained)
+        else:
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, HEADER.size)
+            self.drained = HEADER.size
+            self.write_off = HEADER.size
+
+    def _scan_end(self, off: int) -> int:
+        """First offset past the last intact record (a torn tail write is discarded)."""
+        while off + RECORD.size <= self.size:
+            length, crc = RECORD.unpack_from(self.mm, off)
+            end = off + RECORD.size + length
+            if length == 0 or end > self.size or zlib.crc32(self.mm[off + RECORD.size:end]) != crc:
+                break
+            off = end
+        return off
+
+    def append(self, data: bytes) -> bool:
+        end = self.write_off + RECORD.size + len(data)
+        if end > self.size:
+            return False
+        RECORD.pack_into(self.mm, self.write_off, len(data), zlib.crc32(data))
+        self.mm[self.write_off + RECORD.size:end] = data
+        self.write_off = end
+        return True
+
+    def read(self, off: int, limit: int):
+        records = []
+        while off < self.write_off and len(records) < limit:
+            length, _ = RECORD.unpack_from(self.mm, off)
+            start = off + RECORD.size
+            records.append(self.mm[start:start + length])
+            off = start + length
+        return records, off
+
+    def mark_drained(self, off: int):
+        self.drained = off
+        struct.pack_into("<Q", self.mm, 8, off)
+
+    @property
+    def pending_bytes(self) -> int:
+        return self.write_off - self.drained
+
+    def close(self, delete: bool = False):
+        self.mm.flush()
+        self.mm.close()
+        self._file.close()
+        if delete:
+            os.unlink(self.path)
+
+
+class Spool:
+    """Append-only, segment-rotated record log. Thread-safe: one writer, one drainer."""
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        names = sorted(n for n in os.listdir(directory) if n.startswith("seg-") and n.endswith(".log"))
+        self._sealed: List[Segment] = [Segment(os.path.join(directory, n), segment_bytes) for n in names]
+        self._next_id = int(names[-1][4:-4]) + 1 if names else 0
+        self._active: Optional[Segment] = None
+        self.appended = 0
+        self.drained = 0
+
+    def _rotate(self):
+        if self._active is not None:
+            self._active.mm.flush()
+            self._sealed.append(self._active)
+        path = os.path.join(self.directory, f"seg-{self._next_id:016d}.log")
+        self._next_id += 1
+        self._active = Segment(path, self.segment_bytes)
+
+    def append(self, data: bytes):
+        with self._lock:
+            if self._active is None or not self._active.append(data):
+                self._rotate()
+                if not self._active.append(data):
+                    raise ValueError(f"record of {len(data)} bytes does not fit in a spool segment")
+            self.appended += 1
+
+    @property
+    def pending_bytes(self) -> int:
+        with self._lock:
+            segments = self._sealed + ([self._active] if self._active else [])
+            return sum(s.pending_bytes for s in segments)
+
+    def drain(self, handle_batch: Callable[[List[bytes]], None], batch_size: int = 500) -> int:
+        """
+        Replays every record written so far through ``handle_batch``. Progress is
+        checkpointed after each batch; if ``handle_batch`` raises, draining stops
+        and the failed batch is replayed next time (at-least-once).
+        """
+        with self._lock:
+            if self._active is not None and self._active.pending_bytes:
+                self._rotate()
+            segments = list(self._sealed)
+        total = 0
+        for seg in segments:
+            off = seg.drained
+            while True:
+                records, next_off = seg.read(off, batch_size)
+                if not records:
+                    break
+                handle_batch(records)
+                seg.mark_drained(next_off)
+                off = next_off
+                total += len(records)
+                with self._lock:
+                    self.drained += len(records)
+            with self._lock:
+                self._sealed.remove(seg)
+            seg.close(delete=True)
+        return total
+
+    def close(self):
+        with self._lock:
+            for seg in self._sealed + ([self._active] if self._active else []):
+                seg.close()
+
+
+# Dedupe + push to every routed queue in one round trip;
+# ARGV[2] == "0" means the tweet was already deduped
+_PUSH_SCRIPT = """
+if ARGV[2] == '0' or redis.call('SET', KEYS[1], '1', 'EX', 86400, 'NX') then
+  for i = 2, #KEYS do
+    redis.call('RPUSH', KEYS[i], ARGV[1])
+  end
+end
+"""
+
+
+def encode_record(dedupe_key: str, queue_keys: List[str], body: bytes, deduped: bool = False) -> bytes:
+    # Queue keys never contain spaces (tags are sanitised by the ingestor)
+    queues = " ".join(queue_keys).encode()
+    return b"%d\n%s\n%s\n" % (0 if deduped else 1, dedupe_key.encode(), queues) + body
+
+
+def decode_record(record: bytes):
+    flag, dedupe_key, queues, body = bytes(record).split(b"\n", 3)
+    return flag, dedupe_key, queues.split(b" "), body
+
+
+class RedisSpillover:
+    """
+    Tracks whether the ingestor should bypass Redis, and drains the spool back
+    into the queues once Redis is reachable and the queue is below the low
+    watermark. ``spilling`` is a plain attribute read on the hot path.
+    """
+
+    def __init__(self, spool: Spool, redis_url: str, queue_keys: List[str], high_water: int = 0,
+                 interval: float = 0.5, batch_size: int = 500, timeout: float = 2.0):
+        self.spool = spool
+        self.queue_keys = list(queue_keys)
+        self.high_water = high_water
+        self.low_water = high_water // 2
+        self.interval = interval
+        self.batch_size = batch_size
+        self.spilling = bool(spool.pending_bytes)
+        self.backpressured = False
+        self._r = redis.from_url(redis_url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._push = self._r.register_script(_PUSH_SCRIPT)
+
+    def spill(self, dedupe_key: str, queue_keys: List[str], body: bytes, deduped: bool = False):
+        self.spool.append(encode_record(dedupe_key, queue_keys, body, deduped))
+        self.spilling = True
+
+    def trip(self, reason):
+        if not self.spilling:
+            log.warning("Spilling to %s: %s", self.spool.directory, reason)
+        self.spilling = True
+
+    def _replay(self, records: List[bytes]):
+        pipe = self._r.pipeline(transaction=False)
+        for record in records:
+            flag, dedupe_key, queue_keys, body = decode_record(record)
+            self._push(keys=[dedupe_key, *queue_keys], args=[body, flag], client=pipe)
+        pipe.execute()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._r.ping()
+                if self.high_water:
+                    # Backpressure follows the deepest routed queue
+                    pipe = self._r.pipeline(transaction=False)
+                    for q in self.queue_keys:
+                        pipe.llen(q)
+                    depth = max(pipe.execute())
+                    if depth >= self.high_water and not self.backpressured:
+                        self.backpressured = True
+                        self.trip(f"queue depth {depth} >= {self.high_water}")
+                    elif depth <= self.low_water:
+                        self.backpressured = False
+                if self.backpressured or not (self.spilling or self.spool.pending_bytes):
+                    continue
+                replayed = self.spool.drain(self._replay, self.batch_size)
+                if not self.spool.pending_bytes:
+                    self.spilling = False
+                    log.info("Spool drained (%d records replayed); writing to Redis directly", replayed)
+            except redis.RedisError as e:
+                self.trip(e)
@@ -0,0 +1,198 @@
+"""Streaming heavy-hitters for "what's trending now".
+
+Each window keeps a Count-Min sketch (frequency estimate for any keyword) and
+a Space-Saving table of the top candidates, both with exponential time decay.
+Memory is fixed by the sketch size and the table capacity, no matter how many
+distinct keywords the stream contains.
+
+Decay uses forward decay: an increment at time t is stored as
+w * exp((t - t0) / tau), so stored values only ever grow and nothing has to
+be touched on each tick. Scores are read back as stored * exp(-(now - t0) / tau).
+When the scale factor gets large everything is renormalised to a new t0.
+"""
+
+import heapq
+import math
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Renormalise before exp() grows past ~1e26 to keep float precision sane
+_MAX_EXPONENT = 60.0
+
+WINDOWS = {"5m": 300.0, "1h": 3600.0, "24h": 86400.0}
+
+
+class CountMinSketch:
+    """depth x width counters; estimate = min over rows, never an underestimate."""
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+
+    def _indexes(self, key: str):
+        # Double hashing: one hash() call, depth indexes
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        w = self.width
+        return [(h1 + i * h2) % w for i in range(self.depth)]
+
+    def add(self, key: str, value: float) -> float:
+        est = math.inf
+        for row, idx in zip(self.rows, self._indexes(key)):
+            v = row[idx] + value
+            row[idx] = v
+            if v < est:
+                est = v
+        return est
+
+    def estimate(self, key: str) -> float:
+        return min(row[idx] for row, idx in zip(self.rows, self._indexes(key)))
+
+    def scale(self, factor: float):
+        for row in self.rows:
+            for i in range(self.width):
+                row[i] *= factor
+
+
+class DecayedTopK:
+    """Space-Saving top-K with forward exponential decay, backed by a Count-Min sketch."""
+
+    def __init__(self, tau: float, capacity: int = 256, width: int = 4096, depth: int = 4):
+        self.tau = tau
+        self.capacity = capacity
+        self.cms = CountMinSketch(width, depth)
+        self.counts: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._t0 = time.time()
+
+    def _weight(self, now: float) -> float:
+        exponent = (now - self._t0) / self.tau
+        if exponent > _MAX_EXPONENT:
+            self._renormalise(now)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _renormalise(self, now: float):
+        factor = math.exp(-(now - self._t0) / self.tau)
+        self.cms.scale(factor)
+        for key in self.counts:
+            self.counts[key] *= factor
+        self._heap = [(c, k) for k, c in self.counts.items()]
+        heapq.heapify(self._heap)
+        self._t0 = now
+
+    def _pop_min(self) -> Tuple[str, float]:
+        # Stored counts only increase, so stale heap entries are just too low
+        while True:
+            count, key = heapq.heappop(self._heap)
+            current = self.counts.get(key)
+            if current is None:
+                continue
+            if current == count:
+                return key, count
+            heapq.heappush(self._heap, (current, key))
+
+    def add(self, key: str, value: float = 1.0, now: Optional[float] = None):
+        inc = value * self._weight(time.time() if now is None else now)
+        est = self.cms.add(key, inc)
+        counts = self.counts
+        if key in counts:
+            counts[key] += inc
+            return
+        if len(counts) < self.capacity:
+            counts[key] = min(inc, est)
+        else:
+            evicted, floor = self._pop_min()
+            del counts[evicted]
+            # Both Space-Saving (floor + inc) and the sketch overestimate; keep the tighter one
+            counts[key] = min(floor + inc, est)
+        heapq.heappush(self._heap, (counts[key], key))
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        now = time.time() if now is None else now
+        decay = math.exp(-(now - self._t0) / self.tau)
+        best = heapq.nlargest(k, self.counts.items(), key=lambda kv: kv[1])
+        return [(key, count * decay) for key, count in best]
+
+    def estimate(self, key: str, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return self.cms.estimate(key) * math.exp(-(now - self._t0) / self.tau)
+
+
+class TrendingEngine:
+    """One DecayedTopK per window, fed with (keyword, weight) pairs from the tokenizer."""
+
+    def __init__(self, windows: Dict[str, float] = WINDOWS, capacity: int = 256,
+                 width: int = 4096, depth: int = 4):
+        self.windows = {name: DecayedTopK(tau, capacity, width, depth) for name, tau in windows.items()}
+        self._lock = threading.Lock()
+
+    def add(self, weighted: Iterable[Tuple[str, float]], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        # Collapse repeats within one tweet before touching the sketches
+        merged: Dict[str, float] = {}
+        for key, weight in weighted:
+            merged[key] = merged.get(key, 0.0) + weight
+        with self._lock:
+            for topk in self.windows.values():
+                for key, weight in merged.items():
+                    topk.add(key, weight, now)
+
+    def snapshot(self, k: int = 50, now: Optional[float] = None) -> Dict[str, List[Tuple[str, float]]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            return {name: topk.top(k, now) for name, topk in self.windows.items()}
+
+
+# Renormalise the Redis ZSETs well before scores lose float precision
+_REDIS_MAX_EXPONENT = 30.0
+
+
+class RedisTrendingIndex:
+    """Per-window Redis ZSETs kept current with ZINCRBY, using the same forward decay.
+
+    Members are scored w * exp((t - epoch) / tau); the per-window epoch lives
+    in the {ns}:trending:meta hash so readers can turn scores back into decayed
+    values. Ordering never depends on the epoch, so ZREVRANGE is always valid.
+    """
+
+    def __init__(self, rconn, ns: str, windows: Dict[str, float] = WINDOWS, max_members: int = 10000):
+        self.windows = windows
+        self.max_members = max_members
+        self.keys = {name: f"{ns}:trending:z:{name}" for name in windows}
+        self.meta_key = f"{ns}:trending:meta"
+        now = time.time()
+        pipe = rconn.pipeline(transaction=False)
+        for name in windows:
+            pipe.hsetnx(self.meta_key, name, now)
+        pipe.hmget(self.meta_key, list(windows))
+        self.epochs = dict(zip(windows, (float(e) for e in pipe.execute()[-1])))
+
+    def add(self, pipe, weighted: Iterable[Tuple[str, float]], now: Optional[float] = None):
+        """Queues the increments on ``pipe``; the caller executes it with its other writes."""
+        now = time.time() if now is None else now
+        merged: Dict[str, float] = {}
+        for key, weight in weighted:
+            merged[key] = merged.get(key, 0.0) + weight
+        for name, tau in self.windows.items():
+            zkey = self.keys[name]
+            exponent = (now - self.epochs[name]) / tau
+            if exponent > _REDIS_MAX_EXPONENT:
+                # Queued ahead of the increments, so they land on the rescaled set
+                pipe.zunionstore(zkey, {zkey: math.exp(-exponent)})
+                pipe.hset(self.meta_key, name, now)
+                self.epochs[name] = now
+                exponent = 0.0
+            factor = math.exp(exponent)
+            for key, weight in merged.items():
+                pipe.zincrby(zkey, weight * factor, key)
+
+    def trim(self, rconn):
+        """Drops everything below the top ``max_members`` of each window."""
+        pipe = rconn.pipeline(transaction=False)
+        for zkey in self.keys.values():
+            pipe.zremrangebyrank(zkey, 0, -(self.max_members + 1))
+        pipe.execute()
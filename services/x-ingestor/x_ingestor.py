@@ -1,8 +1,15 @@
-import os, sys, time, json, logging, signal
-from typing import List
+import os, re, sys, time, json, logging, signal, threading
+from typing import Dict, List, Optional
 import requests
 import redis
-import psycopg
+
+# phx_common lives at the repository root (copied next to this file in the image)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from phx_common import diagnostics, logs
+from phx_common.db import Database
+from spool import RedisSpillover, Spool
+from tokenizer import Tokenizer
+from trending import RedisTrendingIndex, TrendingEngine
 
 BEARER = os.getenv("X_BEARER_TOKEN", "").strip()
 RULES = os.getenv("X_RULES", "[]")
@@ -10,76 +17,210 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 POSTGRES_URL = os.getenv("POSTGRES_URL", "").strip()
 QUEUE_KEY = os.getenv("X_QUEUE_KEY", "x_stream")
 NS = os.getenv("X_NS", "phx")
+API_BASE = os.getenv("X_API_BASE", "https://api.twitter.com").rstrip("/")
+TRENDING_TOPK = int(os.getenv("TRENDING_TOPK", "50"))
+TRENDING_PUBLISH_SECONDS = float(os.getenv("TRENDING_PUBLISH_SECONDS", "10"))
+TRENDING_BIGRAMS = os.getenv("TRENDING_BIGRAMS", "0") == "1"
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "2"))
+SPOOL_DIR = os.getenv("SPOOL_DIR", "./spool")
+SPOOL_SEGMENT_MB = int(os.getenv("SPOOL_SEGMENT_MB", "64"))
+# Spill instead of pushing once the queue is this deep (0 = only spill when Redis fails)
+QUEUE_HIGH_WATER = int(os.getenv("X_QUEUE_HIGH_WATER", "0"))
+# Engagement score thresholds for the priority lanes (see lane_for)
+LANE_HOT_SCORE = float(os.getenv("LANE_HOT_SCORE", "1000"))
+LANE_WARM_SCORE = float(os.getenv("LANE_WARM_SCORE", "50"))
+LANES = ("hot", "warm", "cold")
 
-STREAM_URL = "https://api.twitter.com/2/tweets/search/stream"
+STREAM_URL = API_BASE + "/2/tweets/search/stream"
 RULES_URL = STREAM_URL + "/rules"
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger("x_ingestor")
+# Per-tweet lines; sampled by PHX_LOG_SAMPLE (1% by default)
+hot_log = logging.getLogger("x_ingestor.hot")
 
 def auth_headers():
     if not BEARER:
         raise RuntimeError("Missing X_BEARER_TOKEN in env")
     return {"Authorization": f"Bearer {BEARER}"}
 
-def parse_rules(env: str) -> List[str]:
+def parse_rules(env: str) -> List[Dict[str, Optional[str]]]:
+    """X_RULES is either "ai,chatgpt" or JSON: ["ai", {"value": "openai lang:en", "tag": "ai"}].
+    Tagged rules route their matches to {NS}:queue:{tag}; untagged ones go to X_QUEUE_KEY."""
     try:
         if env.strip().startswith('['):
-            return json.loads(env)
-        return [s.strip() for s in env.split(",") if s.strip()]
+            items = json.loads(env)
+        else:
+            items = [s.strip() for s in env.split(",") if s.strip()]
+        rules = []
+        for item in items:
+            if isinstance(item, str):
+                item = {"value": item}
+            if item.get("value"):
+                rules.append({"value": item["value"], "tag": item.get("tag") or None})
+        return rules
     except Exception as e:
         log.error("Failed to parse X_RULES: %s", e)
         return []
 
+_TAG_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+def queue_for_tag(tag: Optional[str]) -> str:
+    if not tag:
+        return QUEUE_KEY
+    return f"{NS}:queue:{_TAG_UNSAFE.sub('_', tag.strip().lower())}"
+
+def engagement_score(pub) -> float:
+    return ((pub.get("like_count") or 0) + 2 * (pub.get("retweet_count") or 0)
+            + 2 * (pub.get("quote_count") or 0) + (pub.get("reply_count") or 0))
+
+def lane_for(score: float) -> str:
+    if score >= LANE_HOT_SCORE:
+        return "hot"
+    if score >= LANE_WARM_SCORE:
+        return "warm"
+    return "cold"
+
+def lane_key(queue: str, lane: str) -> str:
+    # The cold lane is the plain queue, so consumers that ignore lanes still see the bulk
+    return queue if lane == "cold" else f"{queue}:{lane}"
+
+def route(matching_rules, lane: str = "cold") -> List[str]:
+    """Queues for one tweet: one per distinct matching rule tag (X_QUEUE_KEY if none are
+    tagged), each suffixed with the tweet's priority lane."""
+    queues = []
+    for rule in matching_rules or ():
+        q = lane_key(queue_for_tag(rule.get("tag")), lane)
+        if q not in queues:
+            queues.append(q)
+    return queues or [lane_key(QUEUE_KEY, lane)]
+
 def connect_redis(url: str):
-    r = redis.from_url(url, decode_responses=False)
+    # Bounded timeouts so a stalled Redis trips the spool instead of blocking the stream read
+    r = redis.from_url(url, decode_responses=False, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
     r.ping()
     return r
 
 def connect_pg(url: str):
-    if not url:
-        return None
-    try:
-        return psycopg.connect(url, autocommit=True)
-    except Exception as e:
-        log.warning("Postgres not available: %s", e)
-        return None
+    # Pooled, health-checked and reconnecting; a Postgres outage no longer stops trending writes for good
+    return Database.from_env("x-ingestor", url=url, max_size=2, timeout=1.0)
 
 def ensure_rules(desired):
     resp = requests.get(RULES_URL, headers=auth_headers(), timeout=30)
     resp.raise_for_status()
     existing = resp.json().get("data", [])
-    existing_vals = set([d.get("value") for d in existing if "value" in d])
-    desired_set = set([d for d in desired if d])
-    to_delete = [d.get("id") for d in existing if d.get("value") not in desired_set]
-    to_add = [v for v in desired_set if v not in existing_vals]
+    # A rule whose tag changed is deleted and re-added so matching_rules carries the new tag
+    existing_keys = set([(d.get("value"), d.get("tag") or None) for d in existing if "value" in d])
+    desired_set = set([(d["value"], d.get("tag")) for d in desired if d.get("value")])
+    to_delete = [d.get("id") for d in existing if (d.get("value"), d.get("tag") or None) not in desired_set]
+    to_add = [k for k in desired_set if k not in existing_keys]
     if to_delete:
         d = requests.post(RULES_URL, headers=auth_headers(), json={"delete": {"ids": to_delete}}, timeout=30)
         d.raise_for_status()
     if to_add:
-        a = requests.post(RULES_URL, headers=auth_headers(), json={"add": [{"value": v} for v in to_add]}, timeout=30)
+        a = requests.post(RULES_URL, headers=auth_headers(), json={"add": [{"value": v, "tag": t} if t else {"value": v} for v, t in to_add]}, timeout=30)
         a.raise_for_status()
 
-def upsert_trending(pg_conn, text: str):
-    if not pg_conn or not text:
+tokenizer = Tokenizer(bigrams=TRENDING_BIGRAMS)
+
+def extract_keywords(text: str):
+    return tokenizer.keywords(text)
+
+UPSERT_TRENDING = """insert into trending_topics(keyword, score, last_seen_at)
+                     values (%s, %s, now())
+                     on conflict (keyword) do update set
+                       score = trending_topics.score + excluded.score,
+                       last_seen_at = excluded.last_seen_at"""
+
+# Skip Postgres for a while after a failure so an outage never stalls the stream read
+_PG_BACKOFF_SECONDS = 10.0
+_pg_retry_at = 0.0
+
+def upsert_trending(db, keywords):
+    global _pg_retry_at
+    if not db or not keywords or time.time() < _pg_retry_at:
         return
-    import re
-    words = [w.lower() for w in re.findall(r"[A-Za-z0-9#@_]{3,24}", text)]
-    for w in words:
-        weight = 2.0 if w.startswith("#") or w.startswith("@") else 1.0
+    merged = {}
+    for w, weight in keywords:
+        merged[w] = merged.get(w, 0.0) + weight
+    try:
+        db.executemany(UPSERT_TRENDING, list(merged.items()))
+    except Exception as e:
+        _pg_retry_at = time.time() + _PG_BACKOFF_SECONDS
+        log.warning("Trending upsert failed, skipping Postgres for %.0fs: %s", _PG_BACKOFF_SECONDS, e)
+
+def publish_trending(rconn, engine, index=None, interval: float = TRENDING_PUBLISH_SECONDS, k: int = TRENDING_TOPK):
+    """Periodically writes the decayed top-K of each window to {NS}:trending:{window}
+    and trims the per-window ZSETs the trending service reads from."""
+    while True:
+        time.sleep(interval)
         try:
-            pg_conn.execute(
-                """insert into trending_topics(keyword, score, last_seen_at)
-                   values (%s, %s, now())
-                   on conflict (keyword) do update set
-                     score = trending_topics.score + excluded.score,
-                     last_seen_at = excluded.last_seen_at""",
-                (w, weight),
-            )
-        except Exception:
-            pass
-
-def stream_loop(rconn, pg_conn):
+            if index is not None:
+                index.trim(rconn)
+            now = time.time()
+            snapshot = engine.snapshot(k, now)
+            pipe = rconn.pipeline(transaction=False)
+            for window, top in snapshot.items():
+                body = {"window": window, "generated_at": now, "top": [[kw, round(score, 4)] for kw, score in top]}
+                pipe.set(f"{NS}:trending:{window}", json.dumps(body).encode("utf-8"), ex=max(60, int(interval * 6)))
+            pipe.execute()
+        except Exception as e:
+            log.warning("Trending publish failed: %s", e)
+
+def forward(rconn, spillover, dedupe_key: str, queues: List[str], body: bytes, keywords, trending_index=None) -> bool:
+    """Dedupes and queues one tweet on every routed queue, spilling to disk if Redis is
+    down or backpressured. Returns False for duplicates. Trending ZSET updates are
+    skipped while spilling."""
+    if spillover is not None and spillover.spilling:
+        spillover.spill(dedupe_key, queues, body)
+        return True
+    deduped = False
+    try:
+        if rconn.set(dedupe_key, b"1", ex=86400, nx=True) is None:
+            return False
+        deduped = True
+        pipe = rconn.pipeline(transaction=False)
+        for q in queues:
+            pipe.rpush(q, body)
+        if trending_index is not None and keywords:
+            trending_index.add(pipe, keywords)
+        pipe.execute()
+    except redis.RedisError as e:
+        if spillover is None:
+            raise
+        spillover.trip(e)
+        spillover.spill(dedupe_key, queues, body, deduped=deduped)
+    return True
+
+def tweet_payload(obj) -> Optional[dict]:
+    """The queued form of one filtered-stream event, or None if it carries no tweet."""
+    data = obj.get("data")
+    if not data:
+        return None
+    includes = obj.get("includes", {})
+    pub = data.get("public_metrics", {}) or {}
+    author_id = data.get("author_id")
+    username = None
+    for u in includes.get("users", []):
+        if u.get("id") == author_id:
+            username = u.get("username")
+            break
+    return {
+        "id": data.get("id"),
+        "text": data.get("text",""),
+        "lang": data.get("lang"),
+        "created_at": data.get("created_at"),
+        "author_id": author_id,
+        "username": username,
+        "likes": pub.get("like_count"),
+        "retweets": pub.get("retweet_count"),
+        "replies": pub.get("reply_count"),
+        "quotes": pub.get("quote_count"),
+        "tags": [m["tag"] for m in obj.get("matching_rules", []) if m.get("tag")],
+        "score": engagement_score(pub),
+        "ingested_at": time.time(),
+    }
+
+def stream_loop(rconn, db, trending=None, trending_index=None, spillover=None):
     backoff = 1.0
     while True:
         try:
@@ -99,39 +240,19 @@ def stream_loop(rconn, pg_conn):
                         obj = json.loads(line)
                     except Exception:
                         continue
-                    data = obj.get("data")
-                    includes = obj.get("includes", {})
-                    if not data:
+                    payload = tweet_payload(obj)
+                    if payload is None:
                         continue
-                    tweet_id = data.get("id")
-                    text = data.get("text","")
-                    lang = data.get("lang")
-                    created_at = data.get("created_at")
-                    pub = data.get("public_metrics", {}) or {}
-                    author_id = data.get("author_id")
-                    username = None
-                    for u in includes.get("users", []):
-                        if u.get("id") == author_id:
-                            username = u.get("username")
-                            break
-                    k = f"{NS}:tweet:{tweet_id}"
-                    if rconn.set(k, b"1", ex=86400, nx=True) is None:
+                    tweet_id, text, username, score = payload["id"], payload["text"], payload["username"], payload["score"]
+                    keywords = extract_keywords(text) if text else []
+                    body = json.dumps(payload).encode("utf-8")
+                    queues = route(obj.get("matching_rules"), lane_for(score))
+                    if not forward(rconn, spillover, f"{NS}:tweet:{tweet_id}", queues, body, keywords, trending_index):
                         continue
-                    payload = {
-                        "id": tweet_id,
-                        "text": text,
-                        "lang": lang,
-                        "created_at": created_at,
-                        "author_id": author_id,
-                        "username": username,
-                        "likes": pub.get("like_count"),
-                        "retweets": pub.get("retweet_count"),
-                        "replies": pub.get("reply_count"),
-                        "quotes": pub.get("quote_count"),
-                    }
-                    rconn.rpush(os.getenv("X_QUEUE_KEY","x_stream"), json.dumps(payload).encode("utf-8"))
-                    upsert_trending(pg_conn, text)
-                    log.info("forwarded tweet %s by @%s", tweet_id, username or "?")
+                    upsert_trending(db, keywords)
+                    if trending is not None and keywords:
+                        trending.add(keywords)
+                    hot_log.info("forwarded tweet %s by @%s", tweet_id, username or "?")
         except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as e:
             log.warning("Stream error: %s", e)
             backoff = min(backoff * 2.0, 60.0)
@@ -141,20 +262,35 @@ def stream_loop(rconn, pg_conn):
             time.sleep(5)
 
 def main():
+    # Here rather than at import, so importing the module (benchmarks) leaves logging alone
+    logs.setup("x-ingestor")
     rules = parse_rules(RULES)
     if not rules:
         log.warning("No X_RULES provided; defaulting to ['ai','chatgpt']")
-        rules = ["ai", "chatgpt"]
+        rules = [{"value": "ai", "tag": None}, {"value": "chatgpt", "tag": None}]
     rconn = connect_redis(REDIS_URL)
-    pg_conn = connect_pg(POSTGRES_URL)
+    db = connect_pg(POSTGRES_URL)
     ensure_rules(rules)
 
     def _sig(*_):
         log.info("Shutting down…"); sys.exit(0)
     for s in (signal.SIGINT, signal.SIGTERM):
         signal.signal(s, _sig)
+    diagnostics.start("x-ingestor")
+
+    trending = TrendingEngine()
+    trending_index = RedisTrendingIndex(rconn, NS)
+    threading.Thread(target=publish_trending, args=(rconn, trending, trending_index), name="trending", daemon=True).start()
+
+    spool = Spool(SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_MB * 1024 * 1024)
+    queues = sorted(set(lane_key(queue_for_tag(r["tag"]), lane) for r in rules for lane in LANES))
+    log.info("Routing to queues: %s", ", ".join(queues))
+    spillover = RedisSpillover(spool, REDIS_URL, queues, high_water=QUEUE_HIGH_WATER, timeout=REDIS_TIMEOUT)
+    if spillover.spilling:
+        log.info("Replaying %d spooled bytes from %s", spool.pending_bytes, SPOOL_DIR)
+    threading.Thread(target=spillover.run, name="spool-drainer", daemon=True).start()
 
-    stream_loop(rconn, pg_conn)
+    stream_loop(rconn, db, trending, trending_index, spillover)
 
 if __name__ == "__main__":
     main()
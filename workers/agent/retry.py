@@ -0,0 +1,68 @@
+"""Delayed retries and dead-lettering for the agent worker.
+
+A failed message is parked in one Redis ZSET scored by its next-attempt time
+(exponential backoff with full jitter), so it never goes back to the head of
+a live queue. ``promote_due`` moves due members back to the tail of the queue
+they came from in batches, atomically, so any number of workers can run it.
+After ``max_attempts`` the message goes to the dead-letter list instead.
+"""
+
+import json
+import random
+import time
+
+# Members are "<queue>\n<payload>"; each due one is RPUSHed back onto <queue>
+_PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+  local sep = string.find(member, '\\n', 1, true)
+  redis.call('RPUSH', string.sub(member, 1, sep - 1), string.sub(member, sep + 1))
+  redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+
+class RetryScheduler:
+    def __init__(self, r, retry_key: str, dead_key: str, max_attempts: int = 5,
+                 base_delay: float = 2.0, max_delay: float = 600.0, batch: int = 100):
+        self.r = r
+        self.retry_key = retry_key
+        self.dead_key = dead_key
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch = batch
+        self._promote = r.register_script(_PROMOTE_SCRIPT)
+        self.stats = {"retried": 0, "dead": 0, "promoted": 0}
+
+    def backoff(self, attempts: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+
+    def fail(self, queue: str, items, error: Exception, now: float = None):
+        """Schedules each failed item for retry, or dead-letters it once it is out of attempts."""
+        now = time.time() if now is None else now
+        pipe = self.r.pipeline(transaction=False)
+        for data in items:
+            attempts = data.get("_attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                pipe.rpush(self.dead_key, json.dumps({
+                    "queue": queue, "attempts": attempts, "error": repr(error)[:500],
+                    "failed_at": now, "payload": data}).encode("utf-8"))
+                self.stats["dead"] += 1
+                continue
+            data = dict(data, _attempts=attempts)
+            member = queue.encode("utf-8") + b"\n" + json.dumps(data).encode("utf-8")
+            pipe.zadd(self.retry_key, {member: now + self.backoff(attempts)})
+            self.stats["retried"] += 1
+        pipe.execute()
+
+    def promote_due(self, now: float = None) -> int:
+        """Moves up to ``batch`` due retries per round trip back onto their queues."""
+        now = time.time() if now is None else now
+        moved = total = self._promote(keys=[self.retry_key], args=[now, self.batch])
+        while moved == self.batch:
+            moved = self._promote(keys=[self.retry_key], args=[now, self.batch])
+            total += moved
+        self.stats["promoted"] += total
+        return total
@@ -0,0 +1,231 @@
+"""Batched, cached model stage for the agent worker.
+
+Texts are normalised (RT prefix, URLs, mentions, case and whitespace dropped)
+and hashed; outputs are cached by that hash in an in-process LRU and,
+optionally, a Redis tier shared by every worker. Texts that still miss are
+compared by 64-bit SimHash against recent texts and the rest of the batch, so
+near-duplicates (same tweet, different link or emoji) reuse one output.
+Whatever is left goes to the model in batches of ``batch_size``.
+
+A model is any object with ``generate(texts: List[str]) -> List[str]``.
+"""
+
+import hashlib
+import importlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+RT_RE = re.compile(r"^rt @\w+:\s*")
+URL_RE = re.compile(r"(?:https?://|www\.)\S+")
+MENTION_RE = re.compile(r"@\w+")
+NON_WORD_RE = re.compile(r"[^\w#]+")
+WORD_RE = re.compile(r"[\w#]+")
+
+
+def normalize(text: str) -> str:
+    text = RT_RE.sub("", (text or "").lower())
+    text = MENTION_RE.sub(" ", URL_RE.sub(" ", text))
+    return " ".join(NON_WORD_RE.sub(" ", text).split())
+
+
+def text_key(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(normalized: str) -> int:
+    """64-bit SimHash over word unigrams and bigrams."""
+    words = WORD_RE.findall(normalized)
+    features = words + [a + " " + b for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    votes = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        for bit in range(64):
+            votes[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if votes[bit] > 0)
+
+
+class SimHashIndex:
+    """
+    Recent fingerprints, split into max_distance + 1 bands: two hashes within
+    max_distance bits must agree on at least one band, so a lookup only
+    compares the candidates sharing one.
+    """
+
+    def __init__(self, capacity: int = 20000, max_distance: int = 6):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._width = 64 // (max_distance + 1)
+        self._shifts = [i * self._width for i in range(max_distance)] + [max_distance * self._width]
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self._bands: List[Dict[int, set]] = [{} for _ in self._shifts]
+
+    def _band_values(self, h: int):
+        # The last band takes the leftover high bits
+        mask = (1 << self._width) - 1
+        return [(h >> s) & mask for s in self._shifts[:-1]] + [h >> self._shifts[-1]]
+
+    def find(self, h: int) -> Optional[str]:
+        for band, value in zip(self._bands, self._band_values(h)):
+            for candidate in band.get(value, ()):
+                if bin(candidate ^ h).count("1") <= self.max_distance:
+                    return self._entries[candidate]
+        return None
+
+    def add(self, h: int, key: str):
+        if h in self._entries:
+            self._entries.move_to_end(h)
+            return
+        self._entries[h] = key
+        for band, value in zip(self._bands, self._band_values(h)):
+            band.setdefault(value, set()).add(h)
+        if len(self._entries) > self.capacity:
+            old, _ = self._entries.popitem(last=False)
+            for band, value in zip(self._bands, self._band_values(old)):
+                members = band.get(value)
+                members.discard(old)
+                if not members:
+                    del band[value]
+
+
+class LRUCache:
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FakeModel:
+    """Deterministic stand-in: same text, same output. Counts calls and can sleep
+    ``call_latency + item_latency * len(batch)`` to mimic a real endpoint."""
+
+    def __init__(self, call_latency: float = 0.0, item_latency: float = 0.0):
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.calls = 0
+        self.items = 0
+
+    def generate(self, texts: List[str]) -> List[str]:
+        self.calls += 1
+        self.items += len(texts)
+        if self.call_latency or self.item_latency:
+            time.sleep(self.call_latency + self.item_latency * len(texts))
+        return [f"summary:{hashlib.sha1(t.encode('utf-8')).hexdigest()[:12]}:{' '.join(t.split()[:8])}"
+                for t in texts]
+
+
+def load_model(spec: str):
+    """``fake`` or ``package.module:factory`` (called with no arguments)."""
+    if spec == "fake":
+        return FakeModel()
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr or "Model")()
+
+
+class ProcessingStage:
+    def __init__(self, model, batch_size: int = 32, lru_size: int = 10000, redis=None,
+                 redis_prefix: str = "phx:agent:out", redis_ttl: int = 86400,
+                 near_dup_distance: int = 6, near_dup_capacity: int = 20000):
+        self.model = model
+        self.batch_size = batch_size
+        self.lru = LRUCache(lru_size)
+        self.redis = redis
+        self.redis_prefix = redis_prefix
+        self.redis_ttl = redis_ttl
+        self.near_dups = SimHashIndex(near_dup_capacity, near_dup_distance) if near_dup_distance >= 0 else None
+        self.stats = {"items": 0, "lru_hits": 0, "redis_hits": 0, "batch_dups": 0,
+                      "near_dups": 0, "model_items": 0, "model_calls": 0}
+
+    def _rkey(self, key: str) -> str:
+        return f"{self.redis_prefix}:{key}"
+
+    def run(self, texts: List[str]) -> List[str]:
+        """One output per input text, in order."""
+        stats = self.stats
+        stats["items"] += len(texts)
+        keys = [text_key(normalize(t)) for t in texts]
+        first_text: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            first_text.setdefault(key, text)
+        stats["batch_dups"] += len(keys) - len(first_text)
+
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        for key in first_text:
+            value = self.lru.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        stats["lru_hits"] += len(found)
+
+        if missing and self.redis is not None:
+            values = self.redis.mget([self._rkey(k) for k in missing])
+            still = []
+            for key, value in zip(missing, values):
+                if value is None:
+                    still.append(key)
+                    continue
+                value = value.decode("utf-8") if isinstance(value, bytes) else value
+                found[key] = value
+                self.lru.put(key, value)
+            stats["redis_hits"] += len(missing) - len(still)
+            missing = still
+
+        # Near-duplicates reuse a recent output, or ride along with one in this batch
+        alias: Dict[str, str] = {}
+        to_generate: List[str] = []
+        batch_index = SimHashIndex(len(missing) + 1, self.near_dups.max_distance) if self.near_dups else None
+        for key in missing:
+            if batch_index is not None:
+                h = simhash(normalize(first_text[key]))
+                rep = self.near_dups.find(h)
+                value = self.lru.get(rep) if rep is not None else None
+                if value is not None:
+                    found[key] = value
+                    alias[key] = rep
+                    continue
+                rep = batch_index.find(h)
+                if rep is not None:
+                    alias[key] = rep
+                    continue
+                batch_index.add(h, key)
+                self.near_dups.add(h, key)
+            to_generate.append(key)
+        stats["near_dups"] += len(alias)
+
+        fresh: Dict[str, str] = {}
+        for i in range(0, len(to_generate), self.batch_size):
+            chunk = to_generate[i:i + self.batch_size]
+            outputs = self.model.generate([first_text[k] for k in chunk])
+            stats["model_calls"] += 1
+            stats["model_items"] += len(chunk)
+            fresh.update(zip(chunk, outputs))
+        for key, rep in alias.items():
+            fresh[key] = found.get(key) or fresh[rep]
+        for key, value in fresh.items():
+            found[key] = value
+            self.lru.put(key, value)
+        if fresh and self.redis is not None:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in fresh.items():
+                pipe.set(self._rkey(key), value.encode("utf-8"), ex=self.redis_ttl)
+            pipe.execute()
+        return [found[k] for k in keys]
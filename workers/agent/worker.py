@@ -1,21 +1,203 @@
-import os, time, json
+import os, re, sys, time, json, logging
 import redis
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from phx_common import diagnostics, logs
+
+log = logging.getLogger("agent")
+# Per-message lines; sampled by PHX_LOG_SAMPLE (1% by default)
+hot_log = logging.getLogger("agent.hot")
+
 REDIS_URL = os.getenv("REDIS_URL","redis://localhost:6379/0")
 QUEUE = os.getenv("QUEUE","x_stream")
+NS = os.getenv("X_NS","phx")
+# Comma-separated rule tags to consume ({NS}:queue:{tag}); empty = the untagged QUEUE
+TAGS = [t.strip() for t in os.getenv("X_TAGS","").split(",") if t.strip()]
+
+# Priority lanes, highest first; the ingestor picks one from the engagement score
+LANES = ("hot", "warm", "cold")
+# Share of pops each lane goes first for, e.g. "hot:8,warm:3,cold:1"
+LANE_WEIGHTS = dict((k, int(v)) for k, v in (p.split(":") for p in os.getenv("LANE_WEIGHTS","hot:8,warm:3,cold:1").split(",")))
+# A lane whose oldest item has waited this long is served first (starvation protection)
+LANE_MAX_WAIT = float(os.getenv("LANE_MAX_WAIT","30"))
+LANE_REPORT_SECONDS = float(os.getenv("LANE_REPORT_SECONDS","10"))
+# Model stage: "fake" or "package.module:factory"; empty = log only
+AGENT_MODEL = os.getenv("AGENT_MODEL","").strip()
+AGENT_BATCH = int(os.getenv("AGENT_BATCH","32"))
+# Failed messages: backoff base/cap in seconds, attempts before the dead-letter list
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS","5"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS","2"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS","600"))
+RETRY_POLL_SECONDS = float(os.getenv("RETRY_POLL_SECONDS","1"))
+
+def queues_for(tags, ns=NS, default=QUEUE):
+    # Same sanitising as the ingestor's queue_for_tag
+    return [f"{ns}:queue:{re.sub(r'[^A-Za-z0-9_.-]+', '_', t.lower())}" for t in tags] or [default]
+
+def lane_key(queue, lane):
+    # Same layout as the ingestor's lane_key: the cold lane is the plain queue
+    return queue if lane == "cold" else f"{queue}:{lane}"
+
+def decode(payload):
+    try:
+        return json.loads(payload)
+    except Exception:
+        return {"raw": payload.decode("utf-8","ignore")}
+
+def process(data):
+    hot_log.info("processing: %s", data.get("id") or data.get("text") or "event")
+    # TODO: summarize/repurpose/post
+
+def batch_processor(stage, report_every=1000):
+    """handle_batch for run(): one model stage pass per popped batch."""
+    next_report = [report_every]
+
+    def handle_batch(items):
+        outputs = stage.run([d.get("text") or "" for d in items])
+        for data, output in zip(items, outputs):
+            hot_log.info("processed: %s -> %s", data.get("id") or "event", output[:80])
+        if stage.stats["items"] >= next_report[0]:
+            next_report[0] += report_every
+            st = stage.stats
+            log.info(f"stage items={st['items']} model_items={st['model_items']} "
+                     f"model_calls={st['model_calls']} lru_hits={st['lru_hits']} redis_hits={st['redis_hits']} "
+                     f"batch_dups={st['batch_dups']} near_dups={st['near_dups']}")
+    return handle_batch
+
+class LaneScheduler:
+    """
+    Chooses the BLPOP key order for each pop. Lanes take turns going first by
+    smooth weighted round robin, so cold items keep moving under a hot backlog,
+    and any lane whose head has waited longer than ``max_wait`` jumps the queue.
+    Tracks per-lane lag (now - ingested_at) for the periodic report.
+    """
+
+    def __init__(self, r, queues, weights=LANE_WEIGHTS, max_wait=LANE_MAX_WAIT, report_every=LANE_REPORT_SECONDS):
+        self.r = r
+        self.keys = {lane: [lane_key(q, lane) for q in queues] for lane in LANES}
+        self.lane_of = {key: lane for lane, keys in self.keys.items() for key in keys}
+        self.weights = {lane: max(0, weights.get(lane, 1)) for lane in LANES}
+        self.max_wait = max_wait
+        self.report_every = report_every
+        self._credit = {lane: 0 for lane in LANES}
+        self._starved = []
+        self._next_report = time.time() + report_every
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {lane: {"count": 0, "lag_sum": 0.0, "lag_max": 0.0} for lane in LANES}
+
+    def _pick(self):
+        total = sum(self.weights.values()) or 1
+        for lane in LANES:
+            self._credit[lane] += self.weights[lane]
+        lane = max(LANES, key=lambda l: self._credit[l])
+        self._credit[lane] -= total
+        return lane
+
+    def order(self):
+        first = self._pick()
+        lanes = self._starved + [first] + [l for l in LANES if l != first and l not in self._starved]
+        return [key for lane in lanes for key in self.keys[lane]]
+
+    def record(self, key, data, now=None):
+        now = time.time() if now is None else now
+        ingested_at = data.get("ingested_at") if isinstance(data, dict) else None
+        if ingested_at:
+            s = self.stats[self.lane_of.get(key, "cold")]
+            lag = now - ingested_at
+            s["count"] += 1
+            s["lag_sum"] += lag
+            s["lag_max"] = max(s["lag_max"], lag)
+        self.maybe_refresh(now)
+
+    def maybe_refresh(self, now=None):
+        now = time.time() if now is None else now
+        if now >= self._next_report:
+            self.refresh(now)
+
+    def refresh(self, now=None):
+        """Checks queue depth and head age per lane, updates starvation, logs the report."""
+        now = time.time() if now is None else now
+        self._next_report = now + self.report_every
+        pipe = self.r.pipeline(transaction=False)
+        for lane in LANES:
+            for key in self.keys[lane]:
+                pipe.llen(key)
+                pipe.lindex(key, 0)
+        replies = iter(pipe.execute())
+        starved, parts = [], []
+        for lane in LANES:
+            depth, head_age = 0, 0.0
+            for _ in self.keys[lane]:
+                depth += next(replies)
+                head = next(replies)
+                if head is not None:
+                    ingested_at = decode(head).get("ingested_at")
+                    if ingested_at:
+                        head_age = max(head_age, now - ingested_at)
+            if head_age > self.max_wait:
+                starved.append(lane)
+            s = self.stats[lane]
+            avg = s["lag_sum"] / s["count"] if s["count"] else 0.0
+            parts.append(f"{lane} depth={depth} head_age={head_age:.1f}s popped={s['count']} "
+                         f"lag_avg={avg:.2f}s lag_max={s['lag_max']:.2f}s")
+        if starved != self._starved and starved:
+            log.warning(f"lanes starved past {self.max_wait:.0f}s, serving first: {', '.join(starved)}")
+        self._starved = starved
+        log.info("lanes " + " | ".join(parts))
+        self._reset_stats()
+
+def run(r, queue=QUEUE, handle=process, handle_batch=None, batch_size=1, retries=None):
+    """``queue`` may be one key or a list; each is read through its priority lanes.
+    With ``handle_batch``, each BLPOP is topped up to ``batch_size`` from the same
+    key and handed over as one list. Handler errors go to ``retries`` (a
+    RetryScheduler), which also puts due retries back on their queues."""
+    queues = [queue] if isinstance(queue, str) else list(queue)
+    lanes = LaneScheduler(r, queues)
+    log.info(f"listening on {', '.join(queues)} (lanes {', '.join(LANES)})")
+    next_promote = 0.0
+    while True:
+        if retries is not None and time.time() >= next_promote:
+            next_promote = time.time() + RETRY_POLL_SECONDS
+            try:
+                retries.promote_due()
+            except redis.RedisError as e:
+                log.warning(f"retry promotion failed: {e}")
+        msg = r.blpop(lanes.order(), timeout=5 if retries is None else max(1, int(RETRY_POLL_SECONDS)))
+        if msg:
+            key, payload = msg
+            payloads = [payload]
+            if handle_batch is not None and batch_size > 1:
+                payloads += r.lpop(key, batch_size - 1) or []
+            key = key.decode() if isinstance(key, bytes) else key
+            items = [decode(p) for p in payloads]
+            for data in items:
+                lanes.record(key, data)
+            try:
+                if handle_batch is not None:
+                    handle_batch(items)
+                else:
+                    handle(items[0])
+            except Exception as e:
+                if retries is None:
+                    raise
+                log.warning(f"{len(items)} message(s) from {key} failed: {e!r}")
+                retries.fail(key, items, e)
+        else:
+            lanes.maybe_refresh()
+            time.sleep(0.5)
 
-r = redis.from_url(REDIS_URL)
-
-print(f"[agent] listening on {QUEUE}")
-while True:
-    msg = r.blpop(QUEUE, timeout=5)
-    if msg:
-        _, payload = msg
-        try:
-            data = json.loads(payload)
-        except Exception:
-            data = {"raw": payload.decode("utf-8","ignore")}
-        print("[agent] processing:", data.get("id") or data.get("text") or "event")
-        # TODO: summarize/repurpose/post
+if __name__ == "__main__":
+    from retry import RetryScheduler
+    logs.setup("agent")
+    diagnostics.start("agent")
+    r = redis.from_url(REDIS_URL)
+    retries = RetryScheduler(r, f"{NS}:agent:retry", f"{NS}:agent:dead", max_attempts=RETRY_MAX_ATTEMPTS,
+                             base_delay=RETRY_BASE_SECONDS, max_delay=RETRY_MAX_SECONDS)
+    if AGENT_MODEL:
+        from stage import ProcessingStage, load_model
+        stage = ProcessingStage(load_model(AGENT_MODEL), batch_size=AGENT_BATCH, redis=r, redis_prefix=f"{NS}:agent:out")
+        run(r, queue=queues_for(TAGS), handle_batch=batch_processor(stage), batch_size=AGENT_BATCH, retries=retries)
     else:
-        time.sleep(0.5)
+        run(r, queue=queues_for(TAGS), retries=retries)